@@ -1,7 +1,26 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import CustomUser, Product, Cart, Order, Report, ConsumptionRecord
-from datetime import datetime
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .forms import ProductImportUploadForm
+from .models import CustomUser, Product, Cart, Order, OrderLine, Report, ConsumptionRecord, DailyProductConsumption, DailyUserConsumption, Notification, ProductImport, StockLevel, StockMovement, DemandForecast, Job
+from . import events, exports, imports, jobs, notifications, reorder
+
+# إجراءات تصدير الصفوف المحددة كملف مبثوث (انظر exports.py)؛ to_rows يحول الاستعلام المحدد إلى استعلام التصدير
+def export_actions(name, to_rows=lambda queryset: queryset):
+    actions = []
+    for fmt in exports.formats():
+        def action(modeladmin, request, queryset, fmt=fmt):
+            return exports.response(request, exports.EXPORTS[name], fmt, to_rows(queryset))
+        action.__name__ = f'export_{fmt}'
+        action.short_description = f"تصدير المحدد ({fmt.upper()})"
+        actions.append(action)
+    return actions
 
 # تخصيص لوحة تحكم CustomUser
 @admin.register(CustomUser)
@@ -21,6 +40,46 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'quantity', 'category', 'created_at', 'image')
     search_fields = ('name', 'description', 'category')
     list_filter = ('category', 'created_at')
+    change_list_template = 'admin/inventory/product/change_list.html'
+    actions = ['generate_thumbnails']
+
+    def generate_thumbnails(self, request, queryset):
+        job, _ = jobs.enqueue('generate_thumbnails', {'product_ids': list(queryset.values_list('pk', flat=True))}, request.user)
+        self.message_user(request, f"تمت جدولة توليد الصور المصغرة (المهمة #{job.pk}).")
+    generate_thumbnails.short_description = "إعادة توليد الصور المصغرة للمنتجات المحددة"
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='inventory_product_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """رفع ملف منتجات وجدولة استيراده (الصور من روابط فقط)؛ الملف نفسه بعد انقطاع يستأنف من آخر دفعة."""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ProductImportUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                fmt = imports.detect_format(upload.name)
+            except imports.ImportFailed as exc:
+                form.add_error('file', str(exc))
+            else:
+                digest = imports.checksum(upload)
+                name = default_storage.save(f'imports/{upload.name}', upload)
+                record = imports.start(name, digest, fmt, uploaded=True)
+                if record.source != name: # استئناف عملية سابقة لنفس المحتوى بملفها المحفوظ
+                    default_storage.delete(name)
+                # الملف الكبير يتجاوز مهلة العامل، فيُستورد في مهمة بالخلفية (jobs.py)
+                job, _ = jobs.enqueue('import_products', {'import_id': record.pk}, request.user)
+                self.message_user(request, f"تمت جدولة الاستيراد (المهمة #{job.pk})؛ تابع تقدمه في هذه الصفحة أو في لوحة المهام.")
+                return redirect('admin:inventory_productimport_change', record.pk)
+        return TemplateResponse(request, 'admin/inventory/product/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "استيراد منتجات",
+            'form': form,
+        })
 
 # تسجيل Cart في لوحة تحكم المدير
 @admin.register(Cart)
@@ -29,47 +88,48 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'product__name')
     list_filter = ('created_at',)
 
+# بنود الطلب تظهر داخل صفحة الطلب
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    raw_id_fields = ('product',)
+
 # تسجيل Order في لوحة تحكم المدير
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'product', 'quantity', 'status', 'created_at', 'approved_at')
+    list_display = ('id', 'user', 'items_summary', 'status', 'created_at', 'approved_at')
     list_filter = ('status', 'created_at', 'user')
-    search_fields = ('user__username', 'product__name')
-    raw_id_fields = ('user', 'product')
-    actions = ['approve_orders', 'reject_orders']
+    search_fields = ('user__username', 'lines__product__name')
+    raw_id_fields = ('user',)
+    inlines = [OrderLineInline]
+    actions = ['approve_orders', 'reject_orders',
+               *export_actions('orders', lambda queryset: OrderLine.objects.filter(order__in=queryset))]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').prefetch_related('lines__product')
+
+    def items_summary(self, order):
+        return '، '.join(str(line) for line in order.lines.all())
+    items_summary.short_description = "البنود"
 
     def approve_orders(self, request, queryset):
-        for order in queryset:
-            if order.status == 'Pending':
-                if order.quantity > order.product.quantity:
-                    self.message_user(request, f'لا يمكن الموافقة على الطلب #{order.id} لمنتج {order.product.name} لأن الكمية المطلوبة ({order.quantity}) أكبر من المتاح ({order.product.quantity}).', level='error')
-                    continue
-
-                order.status = 'Approved'
-                order.approved_at = datetime.now()
-                order.product.quantity -= order.quantity
-                order.product.save()
-                order.save()
-                Report.objects.create(
-                    user=order.user,
-                    month=datetime.now().strftime('%Y-%m'),
-                    product=order.product,
-                    consumed=order.quantity,
-                    remaining=order.product.quantity
-                )
-                ConsumptionRecord.objects.create(
-                    user=order.user,
-                    product=order.product,
-                    quantity=order.quantity
-                )
-        self.message_user(request, "تمت الموافقة على الطلبات المحددة (مع التحقق من المخزون).")
+        # تُنفذ في مهمة بالخلفية (دفعات بفحص مخزون مرة لكل منتج)؛ النتيجة ونقص المخزون في لوحة المهام
+        order_ids = list(queryset.filter(status='Pending').values_list('pk', flat=True))
+        if not order_ids:
+            self.message_user(request, "لا توجد طلبات معلقة بين المحددة.", level=messages.WARNING)
+            return
+        job, _ = jobs.enqueue('approve_orders', {'order_ids': order_ids}, request.user)
+        self.message_user(request, f"تمت جدولة الموافقة على {len(order_ids)} طلب (المهمة #{job.pk}).")
     approve_orders.short_description = "الموافقة على الطلبات المحددة"
 
     def reject_orders(self, request, queryset):
-        for order in queryset:
-            if order.status == 'Pending':
+        with transaction.atomic():
+            orders = list(queryset.filter(status='Pending').select_related('user').prefetch_related('lines__product'))
+            Order.objects.filter(pk__in=[order.pk for order in orders], status='Pending').update(status='Rejected')
+            for order in orders:
                 order.status = 'Rejected'
-                order.save()
+            notifications.enqueue([notifications.order_rejected(order) for order in orders])
+            events.order_status_changed(orders)
         self.message_user(request, "تم رفض الطلبات المحددة.")
     reject_orders.short_description = "رفض الطلبات المحددة"
 
@@ -79,6 +139,7 @@ class ReportAdmin(admin.ModelAdmin):
     list_display = ('user', 'month', 'product', 'consumed', 'remaining', 'created_at')
     search_fields = ('user__username', 'product__name', 'month')
     list_filter = ('month', 'created_at')
+    actions = export_actions('reports')
 
 # تسجيل ConsumptionRecord في لوحة تحكم المدير
 @admin.register(ConsumptionRecord)
@@ -86,3 +147,120 @@ class ConsumptionRecordAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'quantity', 'consumed_at')
     list_filter = ('consumed_at', 'user', 'product')
     search_fields = ('user__username', 'product__name')
+    actions = export_actions('consumption_records')
+
+# تسجيل جداول تجميع الاستهلاك اليومية (للقراءة؛ تُحدّث تلقائياً عند الموافقة)
+@admin.register(DailyProductConsumption)
+class DailyProductConsumptionAdmin(admin.ModelAdmin):
+    list_display = ('day', 'product', 'quantity')
+    list_filter = ('day',)
+    search_fields = ('product__name',)
+    list_select_related = ('product',)
+
+@admin.register(DailyUserConsumption)
+class DailyUserConsumptionAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'product', 'quantity')
+    list_filter = ('day',)
+    search_fields = ('user__username', 'product__name')
+    list_select_related = ('user', 'product')
+
+# دفتر حركات المخزون (للقراءة فقط؛ يُكتب تلقائياً مع كل تغيير في الكميات)
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'product', 'kind', 'delta', 'order', 'user', 'note')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'note')
+    list_select_related = ('product', 'order', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+# حدود إعادة الطلب لكل منتج (المعدل وأيام التغطية محسوبة في reorder.py؛ يُعدل الحد ومدة التوريد فقط)
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ('product', 'threshold', 'reorder_point', 'lead_time_days', 'velocity', 'days_of_cover', 'is_low', 'alerted_at')
+    list_filter = ('is_low',)
+    search_fields = ('product__name',)
+    list_select_related = ('product',)
+    fields = ('product', 'reorder_point', 'lead_time_days', 'velocity', 'threshold', 'days_of_cover', 'is_low',
+              'low_since', 'alerted_at')
+    readonly_fields = ('product', 'velocity', 'threshold', 'days_of_cover', 'is_low', 'low_since', 'alerted_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # الحد الجديد يُطبق فوراً على علامة الانخفاض
+        reorder.update({obj.product_id: obj.product.quantity})
+
+# نتيجة آخر تنبؤ بالطلب (للقراءة؛ يكتبها أمر forecast_demand)
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ('product', 'month', 'quantity', 'method', 'error', 'created_at')
+    list_filter = ('month', 'method')
+    search_fields = ('product__name',)
+    list_select_related = ('product',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# المهام في الخلفية (ينفذها أمر run_workers؛ تُنشأ من لوحة المدير وإجراءات هذه اللوحة)
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'total', 'user', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('idempotency_key', 'user__username')
+    list_select_related = ('user',)
+    readonly_fields = [field.name for field in Job._meta.fields]
+    actions = ['cancel_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def cancel_jobs(self, request, queryset):
+        cancelled = sum(jobs.cancel(pk) for pk in queryset.filter(status__in=('Pending', 'Running')).values_list('pk', flat=True))
+        self.message_user(request, f"تم طلب إلغاء {cancelled} مهمة (الجارية تتوقف عند تقريرها التالي عن التقدم).")
+    cancel_jobs.short_description = "إلغاء المهام المحددة"
+
+# الصندوق الصادر للإشعارات (يرسله أمر send_notifications)
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('recipient', 'subject')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_notifications']
+
+    def retry_notifications(self, request, queryset):
+        updated = queryset.exclude(status='Sent').update(status='Pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"أُعيدت جدولة {updated} إشعار.")
+    retry_notifications.short_description = "إعادة محاولة إرسال الإشعارات المحددة"
+
+# عمليات استيراد المنتجات (للمتابعة؛ تُنشأ من أمر import_products أو من صفحة الاستيراد)
+@admin.register(ProductImport)
+class ProductImportAdmin(admin.ModelAdmin):
+    list_display = ('source', 'format', 'status', 'rows_done', 'created', 'updated', 'failed', 'started_at', 'finished_at')
+    list_filter = ('status', 'format')
+    readonly_fields = [field.name for field in ProductImport._meta.fields]
+    actions = ['resume_imports']
+
+    def has_add_permission(self, request):
+        return False
+
+    def resume_imports(self, request, queryset):
+        records = list(queryset.filter(uploaded=True).exclude(status='Done'))
+        for record in records:
+            jobs.enqueue('import_products', {'import_id': record.pk}, request.user)
+        self.message_user(request, f"تمت جدولة استئناف {len(records)} عملية مرفوعة غير مكتملة "
+                                   "(عمليات الأمر تُستأنف بإعادة تشغيله).")
+    resume_imports.short_description = "استئناف الاستيراد من آخر دفعة محفوظة"
@@ -0,0 +1,93 @@
+"""
+تحليلات الاستهلاك من جداول التجميع اليومية (DailyProductConsumption و DailyUserConsumption).
+الجداول تُحدّث تراكمياً داخل معاملة الموافقة، واستعلامات لوحة التحكم تقرأ نطاق أيام
+فلا تتأثر كلفتها بعدد سجلات الاستهلاك.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, When, Value, F, Q, Sum, PositiveIntegerField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ConsumptionRecord, DailyProductConsumption, DailyUserConsumption
+
+# عدد المفاتيح في كل تحديث جماعي (يبقي عدد متغيرات SQL تحت حدود SQLite)
+UPSERT_CHUNK = 500
+
+
+def _increment(model, day, increments, key_fields):
+    """يضيف increments ({مفتاح: كمية}) إلى عمود quantity لصفوف اليوم، وينشئ الناقص منها."""
+    keys = list(increments)
+    for i in range(0, len(keys), UPSERT_CHUNK):
+        chunk = keys[i:i + UPSERT_CHUNK]
+        lookups = [dict(zip(key_fields, key)) for key in chunk]
+        model.objects.bulk_create([model(day=day, **lookup) for lookup in lookups], ignore_conflicts=True)
+        match = Q()
+        for lookup in lookups:
+            match |= Q(**lookup)
+        model.objects.filter(match, day=day).update(quantity=F('quantity') + Case(
+            *[When(**lookup, then=Value(increments[key])) for key, lookup in zip(chunk, lookups)],
+            output_field=PositiveIntegerField(),
+        ))
+
+
+def record_consumption(day, consumed):
+    """
+    يضيف استهلاك يوم واحد إلى جداول التجميع.
+    consumed: {(user_id, product_id): الكمية}. يجب استدعاؤها داخل معاملة الموافقة نفسها.
+    """
+    per_product = {}
+    for (_, product_id), quantity in consumed.items():
+        per_product[(product_id,)] = per_product.get((product_id,), 0) + quantity
+    _increment(DailyProductConsumption, day, per_product, ('product_id',))
+    _increment(DailyUserConsumption, day, consumed, ('user_id', 'product_id'))
+
+
+def top_products(start, end, limit=5):
+    """المنتجات الأكثر استهلاكاً بين يومي start و end (شاملة)."""
+    return (DailyProductConsumption.objects.filter(day__gte=start, day__lte=end)
+            .values('product__name').annotate(total_consumed=Sum('quantity'))
+            .order_by('-total_consumed')[:limit])
+
+
+def user_product_totals(start, end):
+    """إجمالي استهلاك كل مستخدم لكل منتج بين يومي start و end (شاملة)."""
+    return (DailyUserConsumption.objects.filter(day__gte=start, day__lte=end)
+            .values('product__name', 'user__username').annotate(total_consumed=Sum('quantity'))
+            .order_by('-total_consumed'))
+
+
+def rebuild(start, end, batch_size=2000):
+    """
+    يعيد بناء جداول التجميع للأيام بين start و end (شاملة) من ConsumptionRecord.
+    بعد حذف صفوف النطاق يُحسب كل جدول بتجميع واحد في قاعدة البيانات (كل مفتاح يظهر مرة واحدة)،
+    فتُقرأ الصفوف وتُدرج على دفعات بـ bulk_create دون مسار التحديث التراكمي. يعيد عدد صفوف (مستخدم، منتج، يوم).
+    """
+    tz = timezone.get_current_timezone()
+    records = ConsumptionRecord.objects.filter(
+        consumed_at__gte=timezone.make_aware(datetime.combine(start, time.min), tz),
+        consumed_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+    DailyProductConsumption.objects.filter(day__gte=start, day__lte=end).delete()
+    DailyUserConsumption.objects.filter(day__gte=start, day__lte=end).delete()
+
+    daily = records.order_by().annotate(day=TruncDate('consumed_at', tzinfo=tz))
+    _insert(DailyProductConsumption, daily.values('day', 'product_id'), batch_size)
+    return _insert(DailyUserConsumption, daily.values('day', 'user_id', 'product_id'), batch_size)
+
+
+def _insert(model, keys, batch_size):
+    rows = keys.annotate(total=Sum('quantity')).iterator(chunk_size=batch_size)
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(model(quantity=row.pop('total'), **row))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
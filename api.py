@@ -0,0 +1,209 @@
+"""
+واجهة JSON للقراءة فقط (الإصدار v1) لأجهزة الأقسام التي تستعلم دورياً: الكتالوج، طلبات المستخدم، والسلة.
+
+- ترقيم بالمؤشر (pagination.keyset_page): ?cursor=...&limit=...
+- اختيار الحقول: ?fields=id,name,quantity
+- ETag قوي لكل استجابة محسوب من بصمة رخيصة (رقم إصدار الكتالوج، تجميع واحد على الطلبات، أو أزواج المعرف والكمية لعناصر السلة)،
+  وLast-Modified للطلبات من أحدث created_at/approved_at. الطلب المشروط المطابق يأخذ 304 قبل أي قراءة أو تحويل للبيانات.
+  ETag هو المرجع (يغطي كذلك تغير الحالة إلى "مرفوض" الذي لا يغير أي تاريخ)، فيُفضّل If-None-Match على If-Modified-Since.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch, Q
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from . import catalogue
+from .models import Product, Order, OrderLine, Cart
+from .pagination import keyset_page, InvalidCursor
+
+PAGE_SIZE = getattr(settings, 'INVENTORY_API_PAGE_SIZE', 50)
+MAX_PAGE_SIZE = getattr(settings, 'INVENTORY_API_MAX_PAGE_SIZE', 200)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _image_url(product):
+    return product.image.url if product.image else None
+
+
+class ApiResource:
+    """
+    وصف مورد واحد: الحقول المتاحة (اسم ← دالة تحويل)، الاستعلام، الترتيب،
+    ودالة البصمة التي تعيد (نص يدخل في ETag، آخر تعديل أو None).
+    """
+
+    def __init__(self, name, fields, queryset, ordering, fingerprint):
+        self.name = name
+        self.fields = fields
+        self.queryset = queryset
+        self.ordering = ordering
+        self.fingerprint = fingerprint
+
+
+def _products_fingerprint(request):
+    # رقم إصدار الكتالوج يتغير مع كل تعديل على المنتجات أو كمياتها، ويُقرأ من الذاكرة المؤقتة بلا استعلام
+    return catalogue.get_version(), None
+
+
+def _orders_fingerprint(request):
+    stats = Order.objects.filter(user=request.user).aggregate(
+        count=Count('id'),
+        pending=Count('id', filter=Q(status='Pending')),
+        approved=Count('id', filter=Q(status='Approved')),
+        created=Max('created_at'),
+        decided=Max('approved_at'),
+    )
+    last_modified = max(filter(None, (stats['created'], stats['decided'])), default=None)
+    return sorted(stats.items()), last_modified
+
+
+def _cart_fingerprint(request):
+    # أزواج (المعرف، الكمية) لكل عنصر: التجميعات (العدد، المجموع، الأحدث) لا تتغير إذا نُقلت كمية بين عنصرين
+    rows = list(Cart.objects.filter(user=request.user).order_by('pk').values_list('pk', 'quantity'))
+    # الكمية المتاحة لكل منتج جزء من التمثيل، فإصدار الكتالوج جزء من البصمة
+    return (rows, catalogue.get_version()), None
+
+
+RESOURCES = {
+    'products': ApiResource(
+        'products',
+        {
+            'id': lambda p: p.pk,
+            'name': lambda p: p.name,
+            'description': lambda p: p.description,
+            'category': lambda p: p.category,
+            'quantity': lambda p: p.quantity,
+            'image': _image_url,
+            'created_at': lambda p: _iso(p.created_at),
+        },
+        lambda request: (Product.objects.filter(category=request.GET['category'])
+                         if request.GET.get('category') else Product.objects.all()),
+        ('name', 'id'),
+        _products_fingerprint,
+    ),
+    'orders': ApiResource(
+        'orders',
+        {
+            'id': lambda o: o.pk,
+            'status': lambda o: o.status,
+            'created_at': lambda o: _iso(o.created_at),
+            'approved_at': lambda o: _iso(o.approved_at),
+            'lines': lambda o: [
+                {'product_id': line.product_id, 'product': line.product.name, 'quantity': line.quantity}
+                for line in o.lines.all()
+            ],
+        },
+        lambda request: Order.objects.filter(user=request.user).prefetch_related(
+            Prefetch('lines', queryset=OrderLine.objects.select_related('product').order_by('pk'))),
+        ('-created_at', '-id'),
+        _orders_fingerprint,
+    ),
+    'cart': ApiResource(
+        'cart',
+        {
+            'id': lambda c: c.pk,
+            'product_id': lambda c: c.product_id,
+            'product': lambda c: c.product.name,
+            'quantity': lambda c: c.quantity,
+            'available': lambda c: c.product.quantity,
+            'created_at': lambda c: _iso(c.created_at),
+        },
+        lambda request: Cart.objects.filter(user=request.user).select_related('product'),
+        ('created_at', 'id'),
+        _cart_fingerprint,
+    ),
+}
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _validators(request, resource):
+    """(ETag، Last-Modified) للطلب الحالي، محسوبة مرة واحدة لكل طلب."""
+    cached = getattr(request, '_api_validators', None)
+    if cached is None:
+        seed, last_modified = resource.fingerprint(request)
+        user_id = request.user.pk if resource.name != 'products' else ''
+        params = sorted((key, value) for key, value in request.GET.lists())
+        raw = f'v1:{resource.name}:{user_id}:{seed}:{params}'
+        cached = request._api_validators = (hashlib.sha1(raw.encode('utf-8')).hexdigest(), last_modified)
+    return cached
+
+
+def endpoint(resource):
+    """يحول دالة عرض إلى نقطة API: GET/HEAD فقط، مستخدم مسجل وموافق عليه، ثم تحقق شرطي بـ ETag/Last-Modified."""
+    def decorator(view):
+        conditional = condition(
+            etag_func=lambda request: _validators(request, resource)[0],
+            last_modified_func=lambda request: _validators(request, resource)[1],
+        )(view)
+
+        @wraps(view)
+        @require_safe
+        def wrapper(request):
+            user = request.user
+            if not user.is_authenticated:
+                return _error('يجب تسجيل الدخول.', 401)
+            if not (user.is_approved or user.is_admin):
+                return _error('الحساب بانتظار الموافقة.', 403)
+            response = conditional(request)
+            # الاستجابة خاصة بالمستخدم، والعميل يعيد التحقق في كل مرة (ويأخذ 304 إن لم يتغير شيء)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _list(request, resource):
+    fields = request.GET.get('fields')
+    fields = [f for f in fields.split(',') if f] if fields else list(resource.fields)
+    unknown = [f for f in fields if f not in resource.fields]
+    if unknown:
+        return _error(f'حقول غير معروفة: {", ".join(unknown)}', 400)
+    try:
+        limit = min(MAX_PAGE_SIZE, max(1, int(request.GET.get('limit', PAGE_SIZE))))
+    except ValueError:
+        return _error('قيمة limit غير صالحة.', 400)
+    try:
+        items, next_cursor = keyset_page(resource.queryset(request), resource.ordering,
+                                         cursor=request.GET.get('cursor'), page_size=limit)
+    except InvalidCursor:
+        return _error('مؤشر غير صالح.', 400)
+
+    getters = [(name, resource.fields[name]) for name in fields]
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+    return JsonResponse({
+        'results': [{name: getter(item) for name, getter in getters} for item in items],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@endpoint(RESOURCES['products'])
+def products(request):
+    """كتالوج المنتجات (?category= للتصفية)."""
+    return _list(request, RESOURCES['products'])
+
+
+@endpoint(RESOURCES['orders'])
+def orders(request):
+    """طلبات المستخدم الحالي مع بنودها، الأحدث أولاً."""
+    return _list(request, RESOURCES['orders'])
+
+
+@endpoint(RESOURCES['cart'])
+def cart(request):
+    """عناصر سلة المستخدم الحالي مع الكمية المتاحة لكل منتج."""
+    return _list(request, RESOURCES['cart'])
@@ -0,0 +1,54 @@
+"""
+مسار سريع للمستخدم المسجل: CachedModelBackend يقرأ المستخدم (ومعه is_admin و is_approved) من الذاكرة المؤقتة
+بدلاً من استعلام CustomUser في كل طلب. مع الجلسات في الذاكرة المؤقتة (SESSION_ENGINE = cached_db)
+لا يحتاج الطلب المسجل أي استعلام قبل أن يبدأ العرض.
+
+النسخة المخزنة تُحذف عند أي حفظ أو حذف للمستخدم (إشارات signals.py): الموافقة والرفض من لوحة المدير،
+التعديل من لوحة Django، وتحديث last_login عند الدخول. الحذف يتكرر بعد نجاح المعاملة حتى لا يبقى
+في الذاكرة ما قرأه طلب متزامن قبل الحفظ. التعديل بـ QuerySet.update على المستخدمين لا يرسل إشارات،
+فيجب أن يتبعه invalidate.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_ALIAS = getattr(settings, 'INVENTORY_USER_CACHE', 'default')
+TIMEOUT = getattr(settings, 'INVENTORY_USER_CACHE_TIMEOUT', 300)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f'inventory:user:{user_id}'
+
+
+def invalidate(user_id):
+    """يحذف نسخة المستخدم المخزنة الآن وبعد نجاح المعاملة الحالية."""
+    _cache().delete(_key(user_id))
+    transaction.on_commit(lambda: _cache().delete(_key(user_id)))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend مع get_user/aget_user من الذاكرة المؤقتة (التحقق من كلمة المرور كما هو)."""
+
+    def get_user(self, user_id):
+        cache = _cache()
+        user = cache.get(_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(_key(user_id), user, TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id):
+        cache = _cache()
+        user = await cache.aget(_key(user_id))
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(_key(user_id), user, TIMEOUT)
+        return user
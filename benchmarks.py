@@ -0,0 +1,940 @@
+"""
+سيناريوهات قياس الأداء التي يشغلها أمر manage.py benchmark.
+كل سيناريو يعمل على قاعدة بيانات اختبار مؤقتة، ويعيد قاموساً من الأرقام يُطبع بصيغة JSON
+حتى يمكن مقارنة النتائج بين الإصدارات.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connection, models
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .models import CustomUser, Product, Order, OrderLine, Report, ConsumptionRecord
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """يسجل دالة كسيناريو قياس باسم name. الدالة تستقبل size وتعيد قاموساً."""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def summarize(samples):
+    """ملخص زمني (بالمللي ثانية) لقائمة أزمنة بالثواني."""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(pick(0.50), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """ينفذ func ويعيد (النتيجة، الزمن بالثواني)."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def seed_orders(size, products=20, users=50, quantity=1, lines=1):
+    """ينشئ منتجات ومستخدمين وطلبات معلقة (lines بنود لكل طلب) بعمليات جماعية ويعيد معرفات الطلبات."""
+    product_objs = Product.objects.bulk_create(
+        [Product(name=f'bench-product-{i}', quantity=size * lines * quantity) for i in range(products)])
+    user_objs = CustomUser.objects.bulk_create(
+        [CustomUser(username=f'bench-user-{i}', is_approved=True) for i in range(users)])
+    orders = Order.objects.bulk_create([Order(user=user_objs[i % users]) for i in range(size)])
+    OrderLine.objects.bulk_create([
+        OrderLine(order=order, product=product_objs[(i + j) % products], quantity=quantity)
+        for i, order in enumerate(orders) for j in range(lines)
+    ], batch_size=2000)
+    return [order.pk for order in orders]
+
+
+@scenario('approvals')
+def approvals(size=500):
+    """زمن الموافقة على طلب واحد ودفعات من الطلبات، مع تجميع التقارير الشهرية وبدونه."""
+    from . import stock
+
+    result = {}
+    for rollup in (True, False):
+        with override_settings(INVENTORY_REPORT_ROLLUP=rollup):
+            order_ids = seed_orders(size)
+            single = [timed(stock.approve_order, order_id)[1] for order_id in order_ids[:size // 2]]
+            rest = order_ids[size // 2:]
+            batches = [timed(stock.approve_orders, rest[i:i + 50])[1] for i in range(0, len(rest), 50)]
+            Order.objects.all().delete()
+            Product.objects.all().delete()
+            CustomUser.objects.all().delete()
+        key = 'rollup' if rollup else 'no_rollup'
+        result[key] = {
+            'single_approval': summarize(single),
+            'batch_of_50': summarize(batches),
+            'approvals_per_sec': round(len(rest) / sum(batches), 1),
+        }
+
+    # طلبات متعددة البنود: الموافقة على طلب من 10 بنود مقابل 10 طلبات من بند واحد
+    for lines in (1, 10):
+        order_ids = seed_orders(size // lines, lines=lines)
+        samples = [timed(stock.approve_order, order_id)[1] for order_id in order_ids]
+        result[f'order_of_{lines}_lines'] = {
+            'approval': summarize(samples),
+            'lines_per_sec': round(len(samples) * lines / sum(samples), 1),
+        }
+        Order.objects.all().delete()
+        Product.objects.all().delete()
+        CustomUser.objects.all().delete()
+    return result
+
+
+def _hot_queries(user, product):
+    """الاستعلامات المتكررة في العروض ولوحة المدير (نفس ما يغطيه HotPathIndexTests)."""
+    since = timezone.now() - timedelta(days=30)
+    return {
+        'order_tracking': lambda: list(Order.objects.filter(user=user).order_by('-created_at')[:50]),
+        'pending_orders': lambda: list(Order.objects.filter(status='Pending').order_by('-created_at')[:50]),
+        'orders_section': lambda: list(Order.objects.order_by('-created_at', '-id')[:26]),
+        'consumption_section': lambda: list(ConsumptionRecord.objects.order_by('-consumed_at', '-id')[:26]),
+        'product_consumption_30d': lambda: ConsumptionRecord.objects.filter(
+            product=product, consumed_at__gte=since).count(),
+        'category_filter': lambda: list(Product.objects.filter(category='consumables')[:50]),
+        'low_stock': lambda: list(Product.objects.filter(quantity__lte=5).order_by('quantity', 'name')[:10]),
+    }
+
+
+def _run_queries(queries, repeat):
+    return {name: summarize([timed(query)[1] for _ in range(repeat)]) for name, query in queries.items()}
+
+
+@scenario('indexes')
+def indexes(size=1_000_000, repeat=20):
+    """زمن الاستعلامات المتكررة على size صف من الطلبات وسجلات الاستهلاك، بدون الفهارس المركبة ثم معها."""
+    products = Product.objects.bulk_create([
+        Product(name=f'bench-product-{i:05d}', quantity=i % 50,
+                category='consumables' if i % 2 else 'medical_tools')
+        for i in range(2000)
+    ])
+    users = CustomUser.objects.bulk_create(
+        [CustomUser(username=f'bench-user-{i}', is_approved=True) for i in range(500)])
+    statuses = ['Pending', 'Approved', 'Approved', 'Rejected']
+    for start in range(0, size, 10_000):
+        rows = range(start, min(size, start + 10_000))
+        orders = Order.objects.bulk_create([
+            Order(user=users[i % len(users)], status=statuses[i % len(statuses)]) for i in rows
+        ])
+        OrderLine.objects.bulk_create([
+            OrderLine(order=order, product=products[i % len(products)], quantity=1) for i, order in zip(rows, orders)
+        ])
+        ConsumptionRecord.objects.bulk_create([
+            ConsumptionRecord(user=users[i % len(users)], product=products[i % len(products)], quantity=1)
+            for i in rows
+        ])
+    if connection.vendor == 'sqlite':
+        # توزيع التواريخ على سنتين حتى تكون نطاقات التاريخ واقعية (auto_now_add يمنع ضبطها عند الإنشاء)
+        with connection.cursor() as cursor:
+            for table, column in (('inventory_order', 'created_at'), ('inventory_consumptionrecord', 'consumed_at')):
+                cursor.execute(f"UPDATE {table} SET {column} = datetime('now', '-' || (id % 730) || ' days')")
+
+    queries = _hot_queries(users[0], products[0])
+    models = [Product, Order, Report, ConsumptionRecord]
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    without = _run_queries(queries, repeat)
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    with_indexes = _run_queries(queries, repeat)
+
+    return {
+        'rows': size,
+        'without_indexes': without,
+        'with_indexes': with_indexes,
+        'speedup_p50': {
+            name: round(without[name]['p50_ms'] / max(with_indexes[name]['p50_ms'], 0.001), 1) for name in queries
+        },
+    }
+
+
+@scenario('search')
+def product_search(size=500_000, repeat=50):
+    """زمن البحث النصي في size منتج، مقارنة بالبحث القديم name__icontains."""
+    import random
+    from . import search
+
+    rng = random.Random(7)
+    letters = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+    # مفردات مولدة (5000 كلمة) حتى تكون نسبة المطابقة لكل كلمة قريبة من فهرس حقيقي
+    vocabulary = list({''.join(rng.choice(letters) for _ in range(rng.randint(4, 7))) for _ in range(5000)})
+    for start in range(0, size, 10_000):
+        Product.objects.bulk_create([
+            Product(name=f'{rng.choice(vocabulary)} {rng.choice(vocabulary)} {i}',
+                    description=' '.join(rng.choice(vocabulary) for _ in range(12)),
+                    category=rng.choice(['medical_tools', 'consumables']))
+            for i in range(start, min(size, start + 10_000))
+        ])
+    backend = search.get_backend()
+    _, index_seconds = timed(backend.rebuild)
+
+    queries = [rng.choice(vocabulary) for _ in range(20)]
+    queries += [word[:3] for word in queries[:5]] # بحث بالبادئة
+    queries += [f'{rng.choice(vocabulary)} {rng.choice(vocabulary)}' for _ in range(5)]
+    return {
+        'products': size,
+        'backend': type(backend).__name__,
+        'index_build_sec': round(index_seconds, 2),
+        'search': summarize([timed(lambda: list(backend.search(Product.objects.all(), q)[:24]))[1]
+                             for _ in range(max(1, repeat // 10)) for q in queries]),
+        'icontains': summarize([timed(lambda: list(Product.objects.filter(name__icontains=q)[:24]))[1]
+                                for q in queries]),
+    }
+
+
+def _session_cookie(user):
+    """ترويسة Cookie لجلسة مسجلة للمستخدم، لاستدعاء التطبيق مباشرة دون Client."""
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    return f"sessionid={client.cookies['sessionid'].value}".encode()
+
+
+def _asgi_scope(path, cookie, index=0, query=b''):
+    """نطاق طلب GET لتطبيق ASGI (كما يبنيه خادم ASGI)."""
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie)],
+        'client': ('127.0.0.1', 10000 + index % 50000), 'server': ('testserver', 80),
+    }
+
+
+@scenario('sse')
+def sse_subscribers(size=5000, broadcasts=20):
+    """
+    size اتصال بث أحداث خامل متزامن على حلقة أحداث واحدة (عامل ASGI واحد) عبر تطبيق ASGI نفسه:
+    زمن فتح الاتصالات، الذاكرة لكل اتصال، وزمن وصول حدث واحد لكل المشتركين.
+    """
+    import asyncio
+    import resource
+
+    from django.core.asgi import get_asgi_application
+    from django.urls import reverse
+    from . import events
+
+    admin = CustomUser.objects.create_user(username='bench-admin', is_admin=True, is_approved=True)
+    cookie = _session_cookie(admin)
+    path = reverse('inventory:order_events')
+    application = get_asgi_application()
+    broker = events.get_broker()
+
+    async def run():
+        received = [0] * size
+        first_chunk = asyncio.Event()
+        disconnect = asyncio.Event()
+        arrivals = {}
+
+        async def subscriber(index):
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.body' and b'event: bench' in message.get('body', b''):
+                    received[index] += 1
+                    arrivals.setdefault(received[index], []).append(time.perf_counter())
+
+            await application(_asgi_scope(path, cookie, index), receive, send)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscriber(i)) for i in range(size)]
+        while broker.subscriber_count() < size:
+            await asyncio.sleep(0.05)
+        connect_seconds = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        latencies = []
+        for n in range(1, broadcasts + 1):
+            sent_at = time.perf_counter()
+            broker.publish(events.ADMINS, {'type': 'bench', 'n': n})
+            while len(arrivals.get(n, ())) < size:
+                await asyncio.sleep(0.001)
+            latencies.append(max(arrivals[n]) - sent_at)
+
+        disconnect.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {
+            'subscribers': size,
+            'connect_sec': round(connect_seconds, 2),
+            'rss_per_subscriber_kb': round(max(0, rss_after - rss_before) / size, 1),
+            'fanout_to_all': summarize(latencies),
+            'subscribers_after_disconnect': broker.subscriber_count(),
+        }
+
+    return asyncio.run(run())
+
+
+@scenario('asgi')
+def asgi_vs_wsgi(size=1000, concurrency=100, products=500):
+    """
+    نفس الصفحات (لوحة المستخدم، السلة، تتبع الطلبات، قسم من لوحة المدير) عبر WSGIHandler بـ concurrency خيط
+    (مثل خادم WSGI متعدد الخيوط) وعبر ASGIHandler بـ concurrency طلب متزامن على حلقة أحداث واحدة.
+    كل وضع يرسل size طلباً لكل صفحة بحلقة مغلقة (كل عامل يرسل طلبه التالي بعد انتهاء السابق):
+    الطلبات في الثانية وزمن الاستجابة (p50/p99) لكل صفحة.
+    """
+    import asyncio
+    import io
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.core.asgi import get_asgi_application
+    from django.core.cache import cache
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import reverse
+    from .models import Cart
+
+    catalogue_items = Product.objects.bulk_create(
+        [Product(name=f'bench-product-{i:05d}', quantity=100) for i in range(products)])
+    user = CustomUser.objects.create_user(username='bench-user', is_approved=True)
+    admin = CustomUser.objects.create_user(username='bench-admin', is_admin=True, is_approved=True)
+    Cart.objects.bulk_create([Cart(user=user, product=p, quantity=1) for p in catalogue_items[:20]])
+    orders = Order.objects.bulk_create([Order(user=user) for _ in range(50)])
+    OrderLine.objects.bulk_create([
+        OrderLine(order=order, product=catalogue_items[(i + j) % products], quantity=1)
+        for i, order in enumerate(orders) for j in range(3)
+    ])
+    user_cookie, admin_cookie = _session_cookie(user), _session_cookie(admin)
+    pages = {
+        'user_dashboard': (reverse('inventory:user_dashboard'), user_cookie),
+        'cart': (reverse('inventory:cart'), user_cookie),
+        'order_tracking': (reverse('inventory:order_tracking_view'), user_cookie),
+        'dashboard_section': (reverse('inventory:admin_dashboard_section', args=['orders']), admin_cookie),
+    }
+
+    def wsgi_run(path, cookie):
+        application = get_wsgi_application()
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie.decode(),
+            'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr, 'wsgi.multithread': True,
+        }
+        remaining = iter(range(size))
+        latencies = []
+
+        def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                body = application(dict(environ, **{'wsgi.input': io.BytesIO()}), lambda status, headers: None)
+                b''.join(body)
+                body.close()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        return latencies, time.perf_counter() - started
+
+    def asgi_run(path, cookie):
+        application = get_asgi_application()
+
+        async def run():
+            remaining = iter(range(size))
+            latencies = []
+
+            async def request(index):
+                messages = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+
+                async def receive():
+                    # بعد جسم الطلب يبقى الاتصال مفتوحاً حتى يلغي Django الانتظار عند انتهاء الاستجابة
+                    for message in messages:
+                        return message
+                    await asyncio.Event().wait()
+
+                async def send(message):
+                    pass
+
+                await application(_asgi_scope(path, cookie, index), receive, send)
+
+            async def worker():
+                for index in remaining:
+                    started = time.perf_counter()
+                    await request(index)
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return latencies, time.perf_counter() - started
+
+        return asyncio.run(run())
+
+    result = {'requests_per_page': size, 'concurrency': concurrency}
+    for name, (path, cookie) in pages.items():
+        result[name] = {}
+        for mode, run in (('wsgi', wsgi_run), ('asgi', asgi_run)):
+            cache.clear()
+            latencies, elapsed = run(path, cookie)
+            summary = summarize(latencies)
+            result[name][mode] = {
+                'requests_per_sec': round(len(latencies) / elapsed, 1),
+                'p50_ms': summary['p50_ms'],
+                'p99_ms': summary['p99_ms'],
+            }
+    return result
+
+
+class _UrlCase:
+    """
+    طلب لرابط في سيناريو urls: المستخدم، الطريقة، ومولّد (args, data) يُستدعى قبل كل طلب خارج القياس
+    (للروابط التي تغير البيانات، كالموافقة على طلب، يولد كائناً جديداً في كل مرة).
+    """
+
+    def __init__(self, name, user=None, method='get', prepare=None, args=(), data=None, login_each=False):
+        self.name = name
+        self.user = user
+        self.method = method
+        self.prepare = prepare or (lambda: (args, data or {}))
+        self.login_each = login_each
+
+
+def _url_cases(admin, user, product):
+    """حالات القياس لكل اسم رابط في urls.py: {الاسم: [(التسمية، _UrlCase) ...] أو سبب التخطي}."""
+    import itertools
+
+    from .dashboard import SECTIONS
+    from .exports import EXPORTS
+
+    counter = itertools.count()
+    hot_products = list(Product.objects.order_by('pk').values_list('pk', flat=True)[:3])
+
+    def pending_order():
+        order = Order.objects.create(user=user)
+        OrderLine.objects.bulk_create([OrderLine(order=order, product_id=pk, quantity=1) for pk in hot_products])
+        return order.pk
+
+    def pending_user():
+        return CustomUser.objects.create(username=f'bench-pending-{next(counter)}').pk
+
+    def pending_job():
+        from . import jobs
+        return jobs.enqueue('rebuild_reports', user=admin)[0].pk
+
+    return {
+        'login': [('get', _UrlCase('login')),
+                  ('post', _UrlCase('login', method='post',
+                                    data={'username': user.username, 'password': 'password'}))],
+        'register': [('get', _UrlCase('register'))],
+        'logout': [('get', _UrlCase('logout', user, login_each=True))],
+        'user_dashboard': [('get', _UrlCase('user_dashboard', user)),
+                           ('search', _UrlCase('user_dashboard', user, data={'q': 'قفازات'})),
+                           ('category', _UrlCase('user_dashboard', user, data={'category': 'consumables'}))],
+        'place_order': [('get', _UrlCase('place_order', user, args=[product.pk]))],
+        'cart': [('get', _UrlCase('cart', user))],
+        'order_tracking_view': [('get', _UrlCase('order_tracking_view', user))],
+        'order_events': 'بث لا ينتهي؛ انظر سيناريو sse',
+        'admin_dashboard': [('get', _UrlCase('admin_dashboard', admin))],
+        'admin_dashboard_section': [(section, _UrlCase('admin_dashboard_section', admin, args=[section]))
+                                    for section in SECTIONS],
+        'user_approve': [('get', _UrlCase('user_approve', admin, prepare=lambda: ([pending_user()], {})))],
+        'user_reject': [('get', _UrlCase('user_reject', admin, prepare=lambda: ([pending_user()], {})))],
+        'approve_order': [('get', _UrlCase('approve_order', admin, prepare=lambda: ([pending_order()], {})))],
+        'approve_orders_bulk': [('post_20', _UrlCase(
+            'approve_orders_bulk', admin, method='post',
+            prepare=lambda: ((), {'order_ids': [pending_order() for _ in range(20)]})))],
+        'reject_order': [('get', _UrlCase('reject_order', admin, prepare=lambda: ([pending_order()], {})))],
+        'export_data': [(f'{name}.csv', _UrlCase('export_data', admin, args=[name, 'csv'])) for name in EXPORTS]
+                       + [('post_orders.csv', _UrlCase('export_data', admin, method='post', args=['orders', 'csv']))],
+        'start_job': [('post', _UrlCase('start_job', admin, method='post', args=['rebuild_reports']))],
+        'cancel_job': [('post', _UrlCase('cancel_job', admin, method='post', prepare=lambda: ([pending_job()], {})))],
+        'download_job': 'قراءة ملف من التخزين؛ زمنه يتبع حجم التصدير (انظر export_data)',
+        'add_product': [('get', _UrlCase('add_product', admin))],
+        'edit_product': [('get', _UrlCase('edit_product', admin, args=[product.pk]))],
+        # POST يحذف المنتج من البيانات المولدة، فتُقاس صفحة التأكيد فقط
+        'delete_product': [('get', _UrlCase('delete_product', admin, args=[product.pk]))],
+        'api_products': [('get', _UrlCase('api_products', user))],
+        'api_orders': [('get', _UrlCase('api_orders', user))],
+        'api_cart': [('get', _UrlCase('api_cart', user))],
+        'user_profile_view': [('get', _UrlCase('user_profile_view', user))],
+        'admin_profile_view': [('get', _UrlCase('admin_profile_view', admin))],
+        'metrics': [('get', _UrlCase('metrics'))],
+    }
+
+
+def _measure_url(case, repeat):
+    """repeat طلباً بعد طلب إحماء: زمن الاستجابة، عدد الاستعلامات، والذاكرة القصوى (tracemalloc) في طلب إضافي."""
+    import tracemalloc
+
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    client = Client()
+
+    def prepare():
+        # البيانات والجلسة تُجهز قبل بدء المؤقت وتسجيل الاستعلامات
+        args, data = case.prepare()
+        if case.user is not None and (case.login_each or 'sessionid' not in client.cookies):
+            client.force_login(case.user)
+        return args, data
+
+    def request(args, data):
+        return getattr(client, case.method)(reverse(f'inventory:{case.name}', args=args), data)
+
+    def consume(response):
+        # المحتوى المبثوث يُقرأ كاملاً (دون تجميعه) حتى يدخل زمن توليده في القياس
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    latencies, queries, statuses = [], [], set()
+    for attempt in range(repeat + 1):
+        args, data = prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request(args, data)
+            consume(response)
+            elapsed = time.perf_counter() - started
+        statuses.add(response.status_code)
+        if attempt: # الطلب الأول يملأ ذاكرات التخزين والقوالب
+            latencies.append(elapsed)
+            queries.append(len(captured))
+
+    args, data = prepare()
+    tracemalloc.start()
+    try:
+        consume(request(args, data))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': case.method.upper(),
+        'status': sorted(statuses),
+        'latency': summarize(latencies),
+        'queries': statistics.median_low(queries),
+        'queries_max': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+@scenario('urls')
+def url_suite(size=20_000, repeat=20):
+    """
+    كل رابط في urls.py عبر Client الاختبار على بيانات مولدة بحجم size (انظر seeding.plan):
+    زمن الاستجابة (p50/p95/p99)، عدد الاستعلامات، والذاكرة القصوى لكل رابط وكل حالة منه.
+    الرابط الجديد بلا حالة قياس يظهر في skipped حتى لا يغيب عن التقرير.
+    """
+    from django.core.cache import cache
+    from . import seeding, urls
+
+    counts, seed_seconds = timed(seeding.seed, size)
+    admin = CustomUser.objects.get(username=seeding.ADMIN_USERNAME)
+    # المستخدم الأكثر طلبات، والمنتج الأكثر طلباً: أثقل صفحات في البيانات المولدة
+    user = CustomUser.objects.get(pk=Order.objects.values('user').annotate(n=models.Count('id'))
+                                  .order_by('-n').values('user')[:1])
+    product = Product.objects.get(pk=OrderLine.objects.values('product').annotate(n=models.Count('id'))
+                                  .order_by('-n').values('product')[:1])
+    cache.clear()
+
+    cases = _url_cases(admin, user, product)
+    results, skipped = {}, {}
+    for pattern in urls.urlpatterns:
+        variants = cases.get(pattern.name, 'لا توجد حالة قياس لهذا الرابط')
+        if isinstance(variants, str):
+            skipped[pattern.name] = variants
+            continue
+        for label, case in variants:
+            try:
+                results[f'{pattern.name}[{label}]'] = _measure_url(case, repeat)
+            except Exception as exc: # خطأ في رابط واحد يُسجل ولا يوقف بقية القياس
+                results[f'{pattern.name}[{label}]'] = {'error': f'{type(exc).__name__}: {exc}'}
+    return {
+        'dataset': {**counts, 'seed_sec': round(seed_seconds, 1)},
+        'repeat': repeat,
+        'urls': results,
+        'skipped': skipped,
+    }
+
+
+@contextmanager
+def _sqlite_file(path, options, pragmas):
+    """
+    يوجه الاتصال الافتراضي مؤقتاً إلى قاعدة SQLite في الملف path بخيارات options وضبط pragmas، ويهجرها.
+    قاعدة الاختبار في الذاكرة لا تمثل أقفال الملف و fsync، فسيناريو sqlite يعمل على ملف حقيقي.
+    """
+    from django.core.management import call_command
+    from django.db import connections
+    from . import database
+
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    saved, previous = dict(settings_dict), connections[DEFAULT_DB_ALIAS]
+    saved_pragmas = database.PRAGMAS
+    settings_dict.update(NAME=path, OPTIONS=options)
+    database.PRAGMAS = pragmas
+    connections[DEFAULT_DB_ALIAS] = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        call_command('migrate', verbosity=0)
+        yield
+    finally:
+        connections[DEFAULT_DB_ALIAS].close()
+        database.PRAGMAS = saved_pragmas
+        settings_dict.clear()
+        settings_dict.update(saved)
+        connections[DEFAULT_DB_ALIAS] = previous
+
+
+@scenario('sqlite')
+def sqlite_tuning(size=3000, threads=8):
+    """
+    حمل مختلط متزامن على ملف SQLite من threads خيطاً (كخادم WSGI متعدد الخيوط): 50% قراءة
+    (تتبع الطلبات والكتالوج)، 30% إضافة للسلة، 20% موافقة على طلب؛ size عملية في المجموع.
+    يقارن الإعداد الافتراضي (BEGIN مؤجل، بلا PRAGMAS، اتصال جديد لكل طلب) بإعداد database.py
+    مع الاتصال الدائم وبدونه: العمليات في الثانية، أخطاء القفل التي وصلت للمستخدم، وزمن كل نوع.
+    """
+    import queue
+    import random
+    import shutil
+    import tempfile
+    import threading
+    from collections import Counter
+
+    from django.db import OperationalError
+    from . import cart, database, stock
+
+    modes = {
+        'default': ({}, {}, False),
+        'tuned_no_reuse': ({'transaction_mode': 'IMMEDIATE', 'timeout': 20}, database.PRAGMAS, False),
+        'tuned': ({'transaction_mode': 'IMMEDIATE', 'timeout': 20}, database.PRAGMAS, True),
+    }
+    approvals = size // 5
+    result = {'operations': size, 'threads': threads}
+    directory = tempfile.mkdtemp()
+    try:
+        for mode, (options, pragmas, reuse) in modes.items():
+            with _sqlite_file(f'{directory}/{mode}.sqlite3', options, pragmas):
+                pending = queue.SimpleQueue()
+                for order_id in seed_orders(approvals, products=50, users=threads, quantity=1, lines=2):
+                    pending.put(order_id)
+                users = list(CustomUser.objects.order_by('pk'))
+                products = list(Product.objects.order_by('pk'))
+                actual_pragmas = database.pragmas(connection) if pragmas else {}
+                connection.close()
+
+                latencies = {'read': [], 'cart': [], 'approve': []}
+                errors = Counter()
+                lock = threading.Lock()
+
+                def worker(index):
+                    rng = random.Random(index)
+                    user = users[index % len(users)]
+                    local = {name: [] for name in latencies}
+                    for _ in range(size // threads):
+                        kind = rng.choices(['read', 'cart', 'approve'], [50, 30, 20])[0]
+                        started = time.perf_counter()
+                        try:
+                            if kind == 'read':
+                                list(Order.objects.filter(user=user).order_by('-created_at')[:50])
+                                list(Product.objects.order_by('name')[:50])
+                            elif kind == 'cart':
+                                cart.add(user, rng.choice(products), 1)
+                            else:
+                                stock.approve_order(pending.get_nowait())
+                        except queue.Empty:
+                            continue
+                        except OperationalError as exc:
+                            with lock:
+                                errors['locked' if 'locked' in str(exc) else type(exc).__name__] += 1
+                            continue
+                        finally:
+                            if not reuse: # CONN_MAX_AGE=0: اتصال جديد لكل طلب
+                                connection.close()
+                        local[kind].append(time.perf_counter() - started)
+                    connection.close()
+                    with lock:
+                        for name, samples in local.items():
+                            latencies[name] += samples
+
+                workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+                started = time.perf_counter()
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+                writes = len(latencies['cart']) + len(latencies['approve'])
+                result[mode] = {
+                    'ops_per_sec': round(sum(map(len, latencies.values())) / elapsed, 1),
+                    'writes_per_sec': round(writes / elapsed, 1),
+                    'lock_errors': errors.get('locked', 0),
+                    'other_errors': sum(count for name, count in errors.items() if name != 'locked'),
+                    'pragmas': actual_pragmas,
+                    **{name: summarize(samples) for name, samples in latencies.items() if samples},
+                }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+
+@scenario('ledger')
+def stock_ledger(size=1_000_000, products=100, years=3, repeat=200):
+    """
+    كمية المخزون في تاريخ سابق من دفتر فيه size حركة موزعة على years سنوات لـ products منتجاً:
+    جمع كل حركات المنتج حتى التاريخ (replay) مقابل آخر لقطة + حركات ما بعدها (stock_at)،
+    قبل أخذ اللقطات اليومية وبعد ترقيق القديم منها إلى شهرية، وكميات كل المنتجات معاً (levels_at).
+    """
+    import random
+
+    from . import ledger
+    from .models import StockMovement, StockSnapshot
+
+    rng = random.Random(0)
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=365 * years)
+    span = (now - start).total_seconds()
+    product_ids = [p.pk for p in Product.objects.bulk_create(
+        [Product(name=f'bench-product-{i:05d}', quantity=0) for i in range(products)])]
+    kinds = [StockMovement.RECEIPT] + [StockMovement.CONSUMPTION] * 8 + [StockMovement.ADJUSTMENT]
+    for offset in range(0, size, 10_000):
+        rows = range(offset, min(size, offset + 10_000))
+        movements = []
+        for i in rows:
+            kind = rng.choice(kinds)
+            delta = {StockMovement.RECEIPT: 80, StockMovement.CONSUMPTION: -rng.randint(1, 10)}.get(kind, rng.randint(-5, 5))
+            movements.append(StockMovement(product_id=product_ids[i % products], kind=kind, delta=delta,
+                                           created_at=start + timedelta(seconds=span * i / size)))
+        StockMovement.objects.bulk_create(movements)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    points = [(rng.choice(product_ids), start + timedelta(seconds=rng.uniform(0, span))) for _ in range(repeat)]
+    levels_points = points[:max(1, repeat // 20)]
+
+    def measure():
+        replay, point = [], []
+        for product, when in points:
+            expected, elapsed = timed(ledger.replay_at, product, when)
+            replay.append(elapsed)
+            actual, elapsed = timed(ledger.stock_at, product, when)
+            point.append(elapsed)
+            assert actual == expected, (product, when, actual, expected)
+        levels = [timed(ledger.levels_at, when)[1] for _, when in levels_points]
+        return {'replay': summarize(replay), 'stock_at': summarize(point), 'levels_at_all': summarize(levels)}
+
+    without = measure()
+    taken, backfill_seconds = timed(ledger.backfill, start, now, timedelta(days=1))
+    daily_rows = StockSnapshot.objects.count()
+    deleted, compact_seconds = timed(ledger.compact, now - timedelta(days=ledger.RETAIN_DAYS))
+    _, snapshot_seconds = timed(ledger.take_snapshot)
+    with_snapshots = measure()
+
+    return {
+        'movements': size,
+        'products': products,
+        'years': years,
+        'snapshots': {
+            'daily_backfill': {'times': taken, 'rows': daily_rows, 'seconds': round(backfill_seconds, 2)},
+            'compact': {'deleted': deleted, 'remaining': StockSnapshot.objects.count(),
+                        'seconds': round(compact_seconds, 2)},
+            'take_snapshot_sec': round(snapshot_seconds, 3),
+        },
+        'without_snapshots': without,
+        'with_snapshots': with_snapshots,
+        'speedup_p50': {
+            'stock_at_vs_replay': round(without['replay']['p50_ms'] / max(with_snapshots['stock_at']['p50_ms'], 0.001), 1),
+            'levels_at': round(without['levels_at_all']['p50_ms'] / max(with_snapshots['levels_at_all']['p50_ms'], 0.001), 1),
+        },
+    }
+
+
+@scenario('reorder')
+def reorder_engine(size=10_000, days=60, repeat=50):
+    """
+    size منتجاً باستهلاك يومي متفرق على days يوماً: تهيئة المعدلات من جداول التجميع (مرة واحدة)،
+    تحديث كل المنتجات وإصدار التنبيهات (أمر check_stock)، قائمة المخزون المنخفض في لوحة المدير
+    من StockLevel مقابل حسابها من سجلات الاستهلاك مباشرة، وكلفة التحديث التراكمي في موافقة على 20 منتجاً.
+    """
+    import random
+
+    from django.db import transaction
+    from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum
+    from django.db.models.functions import Coalesce
+
+    from . import reorder
+    from .models import DailyProductConsumption, Notification
+
+    rng = random.Random(0)
+    now = timezone.now()
+    today = timezone.localdate(now)
+    admin = CustomUser.objects.create(username='bench-admin', is_admin=True, email='admin@example.com')
+    products = Product.objects.bulk_create([Product(name=f'bench-product-{i:06d}', quantity=rng.randint(0, 400))
+                                            for i in range(size)])
+    for offset in range(0, size, 1000):
+        daily, records = [], []
+        for product in products[offset:offset + 1000]:
+            rate = rng.choice([0, 0.5, 2, 5, 20])
+            for age in range(days):
+                if rate and rng.random() < 0.3:
+                    quantity = max(1, int(rng.expovariate(1 / rate)))
+                    daily.append(DailyProductConsumption(day=today - timedelta(days=age), product=product,
+                                                         quantity=quantity))
+                    records.append(ConsumptionRecord(user=admin, product=product, quantity=quantity))
+        DailyProductConsumption.objects.bulk_create(daily)
+        ConsumptionRecord.objects.bulk_create(records)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # توزيع تواريخ السجلات على الأيام (auto_now_add يمنع ضبطها عند الإنشاء)
+            cursor.execute(f"UPDATE inventory_consumptionrecord SET consumed_at = datetime('now', '-' || (id % {days}) || ' days')")
+
+    low, rebuild_seconds = timed(reorder.rebuild)
+    _, refresh_seconds = timed(reorder.refresh)
+    alerted, alert_seconds = timed(reorder.alert)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def from_history():
+        # المعدل متوسط بسيط لآخر 28 يوماً من السجلات، ثم المقارنة بالكمية لكل المنتجات
+        velocity = Coalesce(Sum('consumptionrecord__quantity', filter=Q(
+            consumptionrecord__consumed_at__gte=now - timedelta(days=28))), 0) / 28.0
+        return list(Product.objects.annotate(velocity=ExpressionWrapper(velocity, output_field=FloatField()))
+                    .filter(quantity__lte=F('velocity') * (reorder.LEAD_TIME_DAYS + reorder.SAFETY_DAYS))
+                    .order_by('quantity')[:10])
+
+    precomputed = [timed(lambda: list(reorder.low_stock()))[1] for _ in range(repeat)]
+    scanned = [timed(from_history)[1] for _ in range(max(1, repeat // 10))]
+
+    approvals = []
+    sample = products[:20]
+    for _ in range(repeat):
+        with transaction.atomic():
+            _, elapsed = timed(reorder.record_consumption, timezone.now(), {p.pk: 1 for p in sample},
+                               {p.pk: p.quantity for p in sample})
+        approvals.append(elapsed)
+
+    return {
+        'products': size,
+        'days': days,
+        'daily_rows': DailyProductConsumption.objects.count(),
+        'rebuild_sec': round(rebuild_seconds, 2),
+        'refresh_all_sec': round(refresh_seconds, 2),
+        'alert': {'products': alerted, 'messages': Notification.objects.count(), 'sec': round(alert_seconds, 2)},
+        'low_stock': low,
+        'panel_precomputed': summarize(precomputed),
+        'panel_from_history': summarize(scanned),
+        'approval_update_20_products': summarize(approvals),
+    }
+
+
+@scenario('forecast')
+def demand_forecast(size=50_000, months=36):
+    """
+    التنبؤ لـ size منتجاً من تقارير months شهراً (نحو 60% من الأشهر فيها استهلاك، ثلث المنتجات موسمية):
+    زمن القراءة والحساب والكتابة في forecasting.run، مقابل نفس الحساب منتجاً منتجاً (على عينة، مقدّراً للكل).
+    """
+    import random
+
+    from . import forecasting, reports
+    from .models import DemandForecast
+
+    if not forecasting.available():
+        return {'error': 'numpy غير مثبتة'}
+    rng = random.Random(0)
+    current = forecasting.month_index(reports.month_key())
+    user = CustomUser.objects.create(username='bench-user')
+    for offset in range(0, size, 2000):
+        products = Product.objects.bulk_create([Product(name=f'bench-product-{i:06d}', quantity=rng.randint(0, 300))
+                                                for i in range(offset, min(size, offset + 2000))])
+        rows = []
+        for product in products:
+            base, peak = rng.choice([1, 5, 20, 80]), rng.random() < 1 / 3
+            for age in range(1, months + 1):
+                month = current - age
+                if rng.random() < 0.6:
+                    consumed = base * (3 if peak and month % 12 in (0, 1) else 1) + rng.randint(0, base)
+                    rows.append(Report(user=user, product=product, month=forecasting.month_key(month),
+                                       consumed=consumed, remaining=0))
+        Report.objects.bulk_create(rows, batch_size=5000)
+
+    products, timings = forecasting.run(history_months=months)
+    seasonal = DemandForecast.objects.filter(method=DemandForecast.SEASONAL, month=reports.month_key()).count()
+
+    # نفس الحساب بحلقة على المنتجات (مصفوفة صف واحد لكل منتج)
+    first = current - months
+    _, history = forecasting.load(first, current - 1)
+    sample = min(1000, len(history))
+    _, looped = timed(lambda: [forecasting.fit(history[i:i + 1], first) for i in range(sample)])
+
+    return {
+        'products': products,
+        'report_rows': Report.objects.count(),
+        'seasonal_products': seasonal,
+        'load_sec': round(timings['load'], 2),
+        'fit_sec': round(timings['fit'], 3),
+        'write_sec': round(timings['write'], 2),
+        'per_product_loop_sec_estimated': round(looped / sample * products, 1),
+        'fit_speedup': round(looped / sample * products / max(timings['fit'], 1e-6), 1),
+    }
+
+
+@scenario('jobs')
+def background_jobs(size=2000, small_jobs=200):
+    """
+    الموافقة الجماعية على size طلباً: زمن الطلب قبل (الموافقة داخله) وبعد (جدولة مهمة فقط)، وزمن تنفيذ المهمة؛
+    ثم كلفة الطابور نفسه (حجز وتقدم وإنهاء) لكل مهمة على small_jobs مهمة صغيرة مقابل تنفيذها مباشرة.
+    """
+    from . import jobs, stock
+    from .models import Job
+
+    order_ids = seed_orders(size)
+    _, inline = timed(stock.approve_orders, order_ids[:size // 2])
+    rest = order_ids[size // 2:]
+    (job, _), enqueue = timed(jobs.enqueue, 'approve_orders', {'order_ids': rest})
+    _, worker = timed(jobs.work)
+    job.refresh_from_db()
+
+    Order.objects.all().delete()
+    Product.objects.all().delete()
+    CustomUser.objects.all().delete()
+    order_ids = seed_orders(small_jobs * 10)
+    batches = [order_ids[i:i + 10] for i in range(0, len(order_ids), 10)]
+    direct = [timed(stock.approve_orders, batch)[1] for batch in batches[:small_jobs // 2]]
+    for batch in batches[small_jobs // 2:]:
+        jobs.enqueue('approve_orders', {'order_ids': batch})
+    _, queued = timed(jobs.work)
+    return {
+        'orders': len(rest),
+        'request_inline_ms': round(inline * 1000, 1),
+        'request_enqueue_ms': round(enqueue * 1000, 2),
+        'worker_sec': round(worker, 2),
+        'job_status': job.status,
+        'approved': job.result.get('approved'),
+        'small_jobs': small_jobs // 2,
+        'direct_per_batch_ms': round(sum(direct) / len(direct) * 1000, 2),
+        'queued_per_job_ms': round(queued / (small_jobs - small_jobs // 2) * 1000, 2),
+        'done_jobs': Job.objects.filter(status='Done').count(),
+    }
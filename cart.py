@@ -0,0 +1,92 @@
+"""
+خدمة سلة التسوق: تعديل السلة وتأكيد الطلب يتمان كفرق (diff) واحد داخل معاملة واحدة،
+بقراءة واحدة (select_related للمنتج) ثم كتابة جماعية: bulk_update للكميات، حذف واحد،
+وbulk_create لبنود الطلب. عدد الاستعلامات ثابت مهما كان عدد عناصر السلة.
+"""
+
+from django.db import transaction
+from django.db.models import F
+
+from . import events
+from .models import Cart, Order, OrderLine
+
+
+class CartUpdate:
+    """نتيجة تطبيق تعديلات السلة."""
+
+    def __init__(self, updated=(), removed=(), unavailable=()):
+        self.updated = list(updated)
+        self.removed = list(removed)
+        self.unavailable = list(unavailable) # عناصر طُلب لها أكثر من المتاح فلم تتغير
+
+
+class Checkout:
+    """نتيجة تأكيد الطلب: الطلب المنشأ، أو العناصر التي تتجاوز المخزون (ولا يُنشأ شيء حينها)."""
+
+    def __init__(self, order=None, shortages=()):
+        self.order = order
+        self.shortages = list(shortages)
+
+    @property
+    def empty(self):
+        return self.order is None and not self.shortages
+
+
+def items(user):
+    """عناصر سلة المستخدم مع منتجاتها باستعلام واحد."""
+    return Cart.objects.filter(user=user).select_related('product').order_by('created_at', 'pk')
+
+
+def add(user, product, quantity):
+    """يضيف quantity من المنتج إلى السلة أو يزيد كمية العنصر الموجود (بتحديث F بلا قراءة وكتابة)."""
+    item, created = Cart.objects.get_or_create(user=user, product=product, defaults={'quantity': quantity})
+    if not created:
+        Cart.objects.filter(pk=item.pk).update(quantity=F('quantity') + quantity)
+    return item
+
+
+def update(user, quantities):
+    """
+    يطبق الكميات الجديدة {معرف عنصر السلة: الكمية} دفعة واحدة.
+    الكمية 0 أو أقل تحذف العنصر، والكمية الأكبر من المتاح تُترك وتُعاد في unavailable.
+    """
+    result = CartUpdate()
+    if not quantities:
+        return result
+    with transaction.atomic():
+        for item in items(user).select_for_update().filter(pk__in=quantities):
+            quantity = quantities[item.pk]
+            if quantity <= 0:
+                result.removed.append(item)
+            elif quantity > item.product.quantity:
+                result.unavailable.append(item)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                result.updated.append(item)
+        if result.updated:
+            Cart.objects.bulk_update(result.updated, ['quantity'])
+        if result.removed:
+            Cart.objects.filter(pk__in=[item.pk for item in result.removed]).delete()
+    return result
+
+
+def checkout(user):
+    """
+    يحول السلة كلها إلى طلب معلق واحد (بند لكل عنصر) ويفرغها.
+    التحقق من المخزون يتم على كميات المنتجات المقروءة في نفس الاستعلام (والمقفلة حتى نهاية المعاملة)؛
+    إن تجاوز أي عنصر المتاح لا يُنشأ أي طلب. الخصم من المخزون يتم لاحقاً عند الموافقة (stock.py).
+    """
+    with transaction.atomic():
+        lines = list(items(user).select_for_update())
+        if not lines:
+            return Checkout()
+        shortages = [item for item in lines if item.quantity > item.product.quantity]
+        if shortages:
+            return Checkout(shortages=shortages)
+        order = Order.objects.create(user=user, status='Pending')
+        order_lines = OrderLine.objects.bulk_create([
+            OrderLine(order=order, product=item.product, quantity=item.quantity) for item in lines
+        ])
+        events.order_created(order, order_lines)
+        Cart.objects.filter(pk__in=[item.pk for item in lines]).delete()
+    return Checkout(order=order)
@@ -0,0 +1,169 @@
+"""
+ذاكرة تخزين مؤقت لصفحات كتالوج المنتجات في لوحة المستخدم.
+المفتاح (الفئة، البحث، الصفحة) مسبوق برقم إصدار عام للكتالوج يزداد عند أي تعديل على المنتجات
+أو على كمياتها، فتصبح كل الصفحات القديمة غير مستخدمة دون الحاجة لحذفها واحدة واحدة.
+يعمل مع أي واجهة cache في Django تدعم add/incr (locmem، file، Redis...).
+عدادات الإصابة والإخفاق (stats) تُنشر على metrics/ باسم inventory_catalogue_{hits,misses}_total.
+"""
+
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import transaction
+
+VERSION_KEY = 'inventory:catalogue:version'
+HITS_KEY = 'inventory:catalogue:hits'
+MISSES_KEY = 'inventory:catalogue:misses'
+
+CACHE_ALIAS = getattr(settings, 'INVENTORY_CATALOGUE_CACHE', 'default')
+TIMEOUT = getattr(settings, 'INVENTORY_CATALOGUE_TIMEOUT', 300)
+PAGE_SIZE = getattr(settings, 'INVENTORY_CATALOGUE_PAGE_SIZE', 24)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # المفتاح غير موجود (أول استخدام أو أُخرج من الذاكرة)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+async def _acount(key):
+    cache = _cache()
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            pass
+
+
+def get_version():
+    """رقم الإصدار الحالي للكتالوج."""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # قيمة مبنية على الوقت حتى لا يعود إصدار قديم إذا أُخرج المفتاح من الذاكرة
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_version():
+    """نسخة get_version للعروض غير المتزامنة."""
+    cache = _cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump():
+    """يزيد رقم الإصدار فتُهمل كل الصفحات المخزنة."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_on_commit():
+    """يزيد الإصدار بعد نجاح المعاملة الحالية (حتى لا تُخزن بيانات لم تُلتزم بعد تحت الإصدار الجديد)."""
+    transaction.on_commit(bump)
+
+
+def _key(version, category, query, page):
+    digest = hashlib.sha1(f'{category}\x00{query}\x00{page}'.encode('utf-8')).hexdigest()
+    return f'inventory:catalogue:{version}:{digest}'
+
+
+class _Counted:
+    """بديل خفيف لقائمة النتائج يكفي Paginator لحساب عدد الصفحات من العدد المخزن."""
+
+    def __init__(self, total):
+        self.total = total
+
+    def count(self):
+        return self.total
+
+
+def _cached_page(cached):
+    return Page(cached['items'], cached['number'], Paginator(_Counted(cached['count']), PAGE_SIZE))
+
+
+def get_page(queryset_factory, category, query, page):
+    """
+    يعيد صفحة Page من الكتالوج من الذاكرة المؤقتة أو بتنفيذ queryset_factory() عند عدم وجودها.
+    queryset_factory تبني الاستعلام (مع التصفية والبحث) ولا تُستدعى عند الإصابة.
+    تُخزن عناصر الصفحة والعدد الكلي فقط، لا الاستعلام نفسه (تخزينه يعني تحميل الجدول كاملاً).
+    """
+    cache = _cache()
+    key = _key(get_version(), category, query, page)
+    cached = cache.get(key)
+    if cached is not None:
+        _count(HITS_KEY)
+        return _cached_page(cached)
+
+    _count(MISSES_KEY)
+    paginator = Paginator(queryset_factory(), PAGE_SIZE)
+    page_obj = paginator.get_page(page)
+    page_obj.object_list = list(page_obj.object_list)
+    cache.set(key, {'items': page_obj.object_list, 'number': page_obj.number, 'count': paginator.count}, TIMEOUT)
+    return page_obj
+
+
+async def aget_page(queryset_factory, category, query, page):
+    """
+    نسخة get_page للعروض غير المتزامنة: الذاكرة المؤقتة بواجهاتها غير المتزامنة، والعدّ والجلب بـ acount و async for.
+    queryset_factory تُستدعى في خيط (sync_to_async) لأن البحث قد ينفذ استعلاماً مباشراً عند بناء الاستعلام.
+    """
+    cache = _cache()
+    key = _key(await aget_version(), category, query, page)
+    cached = await cache.aget(key)
+    if cached is not None:
+        await _acount(HITS_KEY)
+        return _cached_page(cached)
+
+    await _acount(MISSES_KEY)
+    queryset = await sync_to_async(queryset_factory)()
+    paginator = Paginator(_Counted(await queryset.acount()), PAGE_SIZE)
+    try:
+        number = paginator.validate_number(page)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    bottom = (number - 1) * PAGE_SIZE
+    items = [product async for product in queryset[bottom:bottom + PAGE_SIZE]]
+    await cache.aset(key, {'items': items, 'number': number, 'count': paginator.count}, TIMEOUT)
+    return Page(items, number, paginator)
+
+
+def stats():
+    """عدادات الإصابة والإخفاق ونسبة الإصابة."""
+    cache = _cache()
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        'version': cache.get(VERSION_KEY),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,64 @@
+"""
+أقسام لوحة تحكم المدير.
+كل قسم يُجلب بشكل مستقل وبصفحات صغيرة عبر admin_dashboard_section بدلاً من تحميل كل الجداول في صفحة واحدة.
+"""
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .models import CustomUser, Product, Order, OrderLine, Report, ConsumptionRecord, Job
+
+# عدد الصفوف في كل صفحة من صفحات الأقسام
+PAGE_SIZE = getattr(settings, 'ADMIN_DASHBOARD_PAGE_SIZE', 25)
+
+
+class DashboardSection:
+    """تعريف قسم: الاستعلام، أعمدة الترتيب (تنتهي بحقل فريد) وقالب الصفوف."""
+
+    def __init__(self, queryset, ordering, template):
+        self._queryset = queryset
+        self.ordering = ordering
+        self.template = template
+
+    def get_queryset(self):
+        return self._queryset()
+
+
+SECTIONS = {
+    'pending_users': DashboardSection(
+        lambda: CustomUser.objects.filter(is_admin=False, is_approved=False).only('id', 'username', 'email', 'date_joined'),
+        ('-date_joined', '-id'),
+        'inventory/sections/pending_users.html',
+    ),
+    'products': DashboardSection(
+        lambda: Product.objects.only('id', 'name', 'quantity'),
+        ('name', 'id'),
+        'inventory/sections/products.html',
+    ),
+    'orders': DashboardSection(
+        # select_related يجلب اسم المستخدم، وبنود الصفحة كلها مع أسماء منتجاتها باستعلام واحد إضافي
+        lambda: Order.objects.select_related('user').only('id', 'status', 'created_at', 'user__username')
+        .prefetch_related(Prefetch('lines', queryset=OrderLine.objects.select_related('product').only(
+            'id', 'order_id', 'quantity', 'product__name').order_by('pk'))),
+        ('-created_at', '-id'),
+        'inventory/sections/orders.html',
+    ),
+    'reports': DashboardSection(
+        lambda: Report.objects.select_related('user', 'product').only(
+            'id', 'month', 'consumed', 'remaining', 'created_at', 'user__username', 'product__name'),
+        ('-created_at', '-id'),
+        'inventory/sections/reports.html',
+    ),
+    'consumption_records': DashboardSection(
+        lambda: ConsumptionRecord.objects.select_related('user', 'product').only(
+            'id', 'quantity', 'consumed_at', 'user__username', 'product__name'),
+        ('-consumed_at', '-id'),
+        'inventory/sections/consumption_records.html',
+    ),
+    'jobs': DashboardSection(
+        lambda: Job.objects.select_related('user').only(
+            'id', 'kind', 'status', 'progress', 'total', 'message', 'result', 'error', 'created_at', 'user__username'),
+        ('-created_at', '-id'),
+        'inventory/sections/jobs.html',
+    ),
+}
@@ -0,0 +1,48 @@
+"""
+ضبط SQLite للإنتاج: تُطبق PRAGMAS على كل اتصال جديد (إشارة connection_created في signals.py).
+
+- journal_mode=WAL: القراءة لا تحجب الكتابة ولا العكس، والكتابة تُلحق بملف WAL بدلاً من نسخ الصفحات.
+- synchronous=NORMAL: مع WAL لا يُنفذ fsync عند كل commit بل عند نقل WAL إلى القاعدة (checkpoint)؛
+  القاعدة لا تتلف، وانقطاع الكهرباء (لا تعطل العملية) قد يُفقد آخر المعاملات.
+- busy_timeout: الاتصال ينتظر تحرر القفل بدلاً من الفشل فوراً بـ "database is locked".
+- cache_size و mmap_size و temp_store: ذاكرة صفحات أكبر، وقراءة الملف عبر mmap، والجداول المؤقتة في الذاكرة.
+
+بقية الضبط في إعداد DATABASES (project/settings.py):
+- OPTIONS['transaction_mode'] = 'IMMEDIATE': كل transaction.atomic يبدأ بـ BEGIN IMMEDIATE فيأخذ قفل الكتابة
+  من أوله. مع BEGIN العادي تبدأ المعاملة قارئة، ومعاملتان قارئتان تحاولان الكتابة معاً تفشل إحداهما
+  فوراً دون انتظار busy_timeout (SQLite لا ينتظر حين يكون الانتظار نفسه قفلاً متبادلاً).
+- CONN_MAX_AGE: الاتصال يبقى مفتوحاً بين الطلبات فلا يُعاد فتح الملف وتطبيق PRAGMAS في كل طلب.
+
+أمر manage.py benchmark sqlite يقيس الفرق تحت حمل قراءة وكتابة متزامن.
+"""
+
+from django.conf import settings
+
+PRAGMAS = getattr(settings, 'INVENTORY_SQLITE_PRAGMAS', {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,       # بالمللي ثانية
+    'cache_size': -64000,       # القيمة السالبة بالكيلوبايت (64MB)
+    'mmap_size': 268435456,     # 256MB
+    'temp_store': 'memory',
+})
+
+
+def configure(connection):
+    """يطبق PRAGMAS على اتصال SQLite جديد (ولا يفعل شيئاً لقواعد البيانات الأخرى)."""
+    if connection.vendor != 'sqlite' or not PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def pragmas(connection):
+    """القيم الفعلية لـ PRAGMAS على الاتصال (للتحقق والقياس)."""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone() # بعض القيم (mmap_size) لا تُعاد لقاعدة في الذاكرة
+            values[name] = row[0] if row else None
+    return values
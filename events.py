@@ -0,0 +1,149 @@
+"""
+نشر أحداث الطلبات (طلب جديد، تغير حالة) للمشتركين عبر بث الأحداث (Server-Sent Events).
+الناشرون (السلة، خدمة المخزون، الرفض) ينشرون بعد نجاح المعاملة فقط، والمشتركون هم اتصالات order_events.
+
+القنوات: "user:<id>" لطلبات مستخدم واحد، و"admins" لكل الطلبات (لوحة المدير).
+الوسيط (broker) قابل للاستبدال بالإعداد INVENTORY_EVENT_BROKER؛ الافتراضي InProcessBroker يعمل داخل العملية
+فقط، فعند تشغيل أكثر من عملية ASGI يلزم وسيط مشترك (مثلاً Redis pub/sub) بنفس الواجهة.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ADMINS = 'admins'
+# أقصى عدد أحداث تنتظر مشتركاً بطيئاً قبل إسقاط الأقدم
+QUEUE_SIZE = getattr(settings, 'INVENTORY_EVENT_QUEUE_SIZE', 100)
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """اشتراك واحد في مجموعة قنوات: يُقرأ بـ await subscription.get() ويُغلق بـ close()."""
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        """يُستدعى داخل حلقة الأحداث الخاصة بالاشتراك."""
+        if self.queue.full():
+            self.queue.get_nowait() # المشترك البطيء يفقد الأقدم بدلاً من نمو الذاكرة
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """الواجهة المشتركة للوسطاء."""
+
+    def subscribe(self, channels):
+        """ينشئ Subscription (يُستدعى من داخل حلقة أحداث)."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, channel, event):
+        """ينشر الحدث (قاموس قابل للتحويل إلى JSON) لكل مشتركي القناة. آمن من أي خيط."""
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """وسيط داخل العملية: قوائم انتظار asyncio لكل مشترك، والنشر من الخيوط المتزامنة عبر call_soon_threadsafe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channel, event):
+        event = dict(event, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if subscription.loop is running:
+                subscription.deliver(event)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._channels.values() for s in subscribers})
+
+
+_broker = None
+
+
+def get_broker():
+    """يعيد الوسيط المهيأ (مرة واحدة لكل عملية)."""
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'INVENTORY_EVENT_BROKER', None)
+        _broker = import_string(path)() if path else InProcessBroker()
+    return _broker
+
+
+def publish_on_commit(channel, event):
+    """ينشر الحدث بعد نجاح المعاملة الحالية (ولا ينشر شيئاً إذا أُلغيت)."""
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def order_created(order, lines=None):
+    """طلب معلق جديد: يصل للمدراء ولصاحب الطلب."""
+    event = {
+        'type': 'order.created',
+        'order_id': order.pk,
+        'user': order.user.username,
+        'status': order.status,
+        'lines': len(lines) if lines is not None else order.lines.count(),
+    }
+    publish_on_commit(ADMINS, event)
+    publish_on_commit(user_channel(order.user_id), event)
+
+
+def order_status_changed(orders):
+    """تغيرت حالة الطلبات (موافقة أو رفض)."""
+    for order in orders:
+        event = {'type': 'order.status', 'order_id': order.pk, 'status': order.status}
+        publish_on_commit(ADMINS, event)
+        publish_on_commit(user_channel(order.user_id), event)
+
+
+def format_sse(event):
+    """يحول الحدث إلى إطار SSE نصي."""
+    return f"id: {event.get('id', '')}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
@@ -0,0 +1,191 @@
+"""
+تصدير التقارير وسجلات الاستهلاك وبنود الطلبات كملف CSV (وXLSX إذا كانت مكتبة openpyxl مثبتة).
+
+الصفوف تُقرأ بـ values_list(...).iterator(chunk_size=...) بترتيب المفتاح الأساسي (بلا فرز على الجدول كله)،
+وتُكتب على دفعات في StreamingHttpResponse، فالذاكرة ثابتة مهما كبر السجل ويبدأ إرسال البيانات فوراً.
+تحت ASGI يُغلف المولّد بمولّد غير متزامن حتى لا يجمع Django الاستجابة كلها في الذاكرة قبل إرسالها.
+"""
+
+import csv
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Order, OrderLine, Report, ConsumptionRecord
+
+try:
+    import openpyxl
+except ImportError: # XLSX اختياري
+    openpyxl = None
+
+# عدد الصفوف التي تُجلب من قاعدة البيانات في كل دفعة
+CHUNK_SIZE = getattr(settings, 'INVENTORY_EXPORT_CHUNK_SIZE', 2000)
+# عدد الصفوف في كل جزء يُرسل للعميل (أجزاء صغيرة جداً تكثر كلفة الإرسال)
+ROWS_PER_CHUNK = getattr(settings, 'INVENTORY_EXPORT_ROWS_PER_CHUNK', 500)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# بدايات تجعل برامج الجداول تنفذ الخلية كمعادلة
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _text(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+class Export:
+    """
+    تعريف تصدير: الأعمدة [(العنوان، مسار الحقل)]، الاستعلام الافتراضي،
+    ودوال تحويل اختيارية لبعض الحقول (التواريخ، الحالة...).
+    """
+
+    def __init__(self, name, columns, queryset, formatters=None):
+        self.name = name
+        self.columns = columns
+        self._queryset = queryset
+        self.formatters = formatters or {}
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def get_queryset(self):
+        return self._queryset()
+
+    def rows(self, queryset=None):
+        """صفوف التصدير (قوائم قيم منسقة) من queryset أو الاستعلام الافتراضي."""
+        queryset = self.get_queryset() if queryset is None else queryset
+        fields = [field for _, field in self.columns]
+        convert = [self.formatters.get(field, _text) for field in fields]
+        values = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+        for row in values:
+            yield [func(value) for func, value in zip(convert, row)]
+
+    def filename(self, fmt):
+        return f'{self.name}-{timezone.localdate():%Y%m%d}.{fmt}'
+
+
+_STATUS = dict(Order.STATUS_CHOICES)
+
+EXPORTS = {
+    'reports': Export(
+        'reports',
+        [('المعرف', 'id'), ('الشهر', 'month'), ('المستخدم', 'user__username'), ('المنتج', 'product__name'),
+         ('المستهلك', 'consumed'), ('المتبقي', 'remaining'), ('تاريخ التقرير', 'created_at')],
+        lambda: Report.objects.all(),
+        {'created_at': _datetime},
+    ),
+    'consumption_records': Export(
+        'consumption_records',
+        [('المعرف', 'id'), ('المستخدم', 'user__username'), ('المنتج', 'product__name'),
+         ('الكمية', 'quantity'), ('تاريخ الاستهلاك', 'consumed_at')],
+        lambda: ConsumptionRecord.objects.all(),
+        {'consumed_at': _datetime},
+    ),
+    # صف لكل بند طلب، مع بيانات رأس الطلب
+    'orders': Export(
+        'orders',
+        [('رقم الطلب', 'order_id'), ('المستخدم', 'order__user__username'), ('الحالة', 'order__status'),
+         ('تاريخ الطلب', 'order__created_at'), ('تاريخ الموافقة', 'order__approved_at'),
+         ('المنتج', 'product__name'), ('الكمية', 'quantity')],
+        lambda: OrderLine.objects.all(),
+        {'order__status': lambda value: _STATUS.get(value, value),
+         'order__created_at': _datetime, 'order__approved_at': _datetime},
+    ),
+}
+
+
+def formats():
+    """الصيغ المتاحة في هذا التثبيت."""
+    return ('csv', 'xlsx') if openpyxl is not None else ('csv',)
+
+
+class _Echo:
+    """ملف وهمي يعيد ما يُكتب فيه، حتى يُستخدم csv.writer لتوليد الأسطر دون تخزينها."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(export, queryset=None):
+    """أجزاء ملف CSV بترميز UTF-8 مع BOM (حتى يقرأ Excel النص العربي بشكل صحيح)."""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(export.headers)
+    lines = []
+    for row in export.rows(queryset):
+        lines.append(writer.writerow(row))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def _achunks(chunks):
+    # كل دفعة تُقرأ في نفس الخيط (thread_sensitive) لأن مؤشر قاعدة البيانات مفتوح عبر الدفعات
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def csv_response(request, export, queryset=None):
+    chunks = csv_chunks(export, queryset)
+    if isinstance(request, ASGIRequest):
+        chunks = _achunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{export.filename("csv")}"'
+    return response
+
+
+def xlsx_response(request, export, queryset=None):
+    """
+    XLSX ملف مضغوط لا يُكتب جدوله المركزي إلا في النهاية، فلا يمكن بثه أثناء القراءة؛
+    بدلاً من ذلك يكتب openpyxl في وضع write_only الصفوف إلى ملف مؤقت (ذاكرة ثابتة) ثم يُرسل الملف.
+    """
+    output = tempfile.TemporaryFile()
+    write(export, 'xlsx', output, queryset)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=export.filename('xlsx'), content_type=XLSX_CONTENT_TYPE)
+
+
+def write(export, fmt, output, queryset=None, progress=None):
+    """
+    يكتب التصدير كاملاً في الملف الثنائي output (لمهام التصدير في الخلفية، انظر jobs.py).
+    progress(عدد الصفوف المكتوبة) يُستدعى بعد كل CHUNK_SIZE صف.
+    """
+    rows = export.rows(queryset)
+    if progress:
+        def counted(rows):
+            for number, row in enumerate(rows, 1):
+                yield row
+                if number % CHUNK_SIZE == 0:
+                    progress(number)
+        rows = counted(rows)
+    if fmt == 'xlsx':
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(export.name)
+        sheet.append(export.headers)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(output)
+        return
+    writer = csv.writer(_Echo())
+    output.write(('\ufeff' + writer.writerow(export.headers)).encode('utf-8'))
+    for row in rows:
+        output.write(writer.writerow(row).encode('utf-8'))
+
+
+def response(request, export, fmt, queryset=None):
+    """استجابة التنزيل بالصيغة fmt ('csv' أو 'xlsx')."""
+    if fmt == 'xlsx':
+        return xlsx_response(request, export, queryset)
+    return csv_response(request, export, queryset)
@@ -0,0 +1,174 @@
+"""
+التنبؤ بالاستهلاك الشهري لكل منتج من تقارير Report، لتخطيط المشتريات (أمر forecast_demand).
+
+- التاريخ يُقرأ بقراءة واحدة مجمعة في قاعدة البيانات (منتج، شهر، مجموع الاستهلاك لكل المستخدمين)
+  ويُحوّل إلى مصفوفة NumPy (منتج × شهر)؛ الشهر الحالي غير المكتمل لا يدخل التاريخ.
+- كل الحسابات عمليات مصفوفات على كل المنتجات معاً (بلا حلقة على المنتجات):
+  المتوسط المتحرك لآخر WINDOW أشهر، والموسمي = متوسط آخر 12 شهراً × مؤشر الشهر من السنوات الكاملة
+  (يحتاج 24 شهراً على الأقل، وإلا يساوي المتوسط المتحرك).
+- لكل منتج تُختار الطريقة الأقل خطأً (متوسط الخطأ المطلق لتنبؤات شهر مقدماً) على آخر HOLDOUT شهراً
+  من تاريخه، ثم يُتنبأ بـ HORIZON أشهر بدءاً من الشهر الحالي وتُستبدل نتيجة التشغيل السابق في DemandForecast.
+
+NumPy اختياري: بدونه لا يعمل التنبؤ (available() تعيد False ويرفض الأمر التشغيل).
+"""
+
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import reports
+from .models import DemandForecast, Report
+
+try:
+    import numpy as np
+except ImportError: # التنبؤ اختياري
+    np = None
+
+# عدد الأشهر المكتملة التي تُقرأ من التاريخ، وعدد الأشهر المتنبأ بها
+HISTORY_MONTHS = getattr(settings, 'INVENTORY_FORECAST_HISTORY_MONTHS', 36)
+HORIZON = getattr(settings, 'INVENTORY_FORECAST_HORIZON', 3)
+# نافذة المتوسط المتحرك، وأشهر المقارنة بين الطريقتين (سنة كاملة حتى تظهر المواسم)
+WINDOW = getattr(settings, 'INVENTORY_FORECAST_WINDOW', 3)
+HOLDOUT = 12
+
+BATCH_SIZE = 5000
+
+
+def available():
+    return np is not None
+
+
+def month_index(month):
+    """الشهر YYYY-MM كعدد أشهر منذ بداية التقويم (للحساب على الأشهر كأعداد)."""
+    year, number = month.split('-')
+    return int(year) * 12 + int(number) - 1
+
+
+def month_key(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def load(first, last):
+    """
+    (معرفات المنتجات، مصفوفة الاستهلاك) للأشهر من first إلى last (أرقام month_index، شاملة).
+    صف لكل منتج له تقرير في الفترة، والشهر بلا تقرير صفر.
+    """
+    rows = list(Report.objects.filter(month__gte=month_key(first), month__lte=month_key(last)).order_by()
+                .values('product_id', 'month').annotate(total=Sum('consumed'))
+                .values_list('product_id', 'month', 'total'))
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, last - first + 1))
+    products, months, totals = (np.asarray(column) for column in zip(*rows))
+    product_ids, row = np.unique(products, return_inverse=True)
+    # الأشهر المختلفة قليلة، فتُحوّل نصوصها مرة واحدة لكل شهر لا لكل صف
+    labels, column = np.unique(months, return_inverse=True)
+    column = np.array([month_index(label) - first for label in labels])[column]
+    history = np.zeros((len(product_ids), last - first + 1))
+    history[row, column] = totals
+    return product_ids, history
+
+
+def moving_average(history, horizon):
+    """متوسط آخر WINDOW أشهر لكل منتج، مكرراً لكل أشهر الأفق."""
+    level = history[:, -WINDOW:].mean(axis=1, keepdims=True)
+    return np.repeat(level, horizon, axis=1)
+
+
+def seasonal(history, first, horizon):
+    """
+    متوسط آخر 12 شهراً × مؤشر الشهر التقويمي (متوسطه في السنوات الكاملة الأخيرة ÷ المتوسط العام).
+    first رقم الشهر الأول في history.
+    """
+    months = history.shape[1]
+    years = months // 12
+    if years < 2:
+        return moving_average(history, horizon)
+    recent = history[:, months - years * 12:]
+    start = (first + months - years * 12) % 12 # الشهر التقويمي لأول عمود في recent
+    by_month = recent.reshape(len(history), years, 12).mean(axis=1)
+    overall = by_month.mean(axis=1, keepdims=True)
+    index = np.divide(by_month, overall, out=np.ones_like(by_month), where=overall > 0)
+    level = history[:, -12:].mean(axis=1, keepdims=True)
+    targets = (first + months + np.arange(horizon) - start) % 12
+    return level * index[:, targets]
+
+
+def backtest(history, first, method):
+    """
+    متوسط الخطأ المطلق لكل منتج لتنبؤات شهر واحد مقدماً في آخر HOLDOUT أشهر، كل منها من التاريخ قبله فقط
+    (الحلقة على الأشهر، وكل خطوة على كل المنتجات معاً).
+    """
+    months = history.shape[1]
+    errors = [np.abs(method(history[:, :t], first, 1)[:, 0] - history[:, t])
+              for t in range(max(1, months - HOLDOUT), months)]
+    return np.mean(errors, axis=0) if errors else np.zeros(len(history))
+
+
+def fit(history, first, horizon=HORIZON):
+    """
+    (التنبؤات [منتج × أفق]، هل الطريقة موسمية [منتج]، متوسط الخطأ [منتج]) لكل المنتجات معاً.
+    التعادل (ومنه التاريخ القصير الذي لا موسمية فيه) يختار المتوسط المتحرك.
+    """
+    average_error = backtest(history, first, lambda h, f, n: moving_average(h, n))
+    seasonal_error = backtest(history, first, seasonal)
+    use_seasonal = seasonal_error < average_error
+    forecast = np.where(use_seasonal[:, None], seasonal(history, first, horizon), moving_average(history, horizon))
+    return forecast, use_seasonal, np.where(use_seasonal, seasonal_error, average_error)
+
+
+def _insert(rows, batch_size):
+    """
+    يدرج الصفوف بجملة INSERT واحدة مُعادة بـ executemany على دفعات: إنشاء كائن نموذج لكل صف
+    مع bulk_create يأخذ أضعاف زمن الحساب نفسه لمئات آلاف الصفوف.
+    """
+    fields = [DemandForecast._meta.get_field(name) for name in ('product', 'month', 'quantity', 'method', 'error', 'created_at')]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(DemandForecast._meta.db_table), ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)))
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+
+
+def run(now=None, history_months=HISTORY_MONTHS, horizon=HORIZON, batch_size=BATCH_SIZE):
+    """
+    يتنبأ لكل المنتجات ويستبدل جدول DemandForecast. يعيد (عدد المنتجات، أزمنة المراحل بالثواني).
+    """
+    if not available():
+        raise RuntimeError('التنبؤ يحتاج مكتبة numpy.')
+    current = month_index(reports.month_key(now))
+    first = current - history_months
+    timings = {}
+    started = time.perf_counter()
+    product_ids, history = load(first, current - 1)
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    forecast, use_seasonal, error = fit(history, first, horizon)
+    forecast = np.maximum(forecast, 0).round(2)
+    timings['fit'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    methods = np.where(use_seasonal, DemandForecast.SEASONAL, DemandForecast.MOVING_AVERAGE).tolist()
+    months = [month_key(current + step) for step in range(horizon)]
+    created_at = DemandForecast._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+    rows = ((product_id, month, quantity, method, error, created_at)
+            for product_id, row, method, error in zip(product_ids.tolist(), forecast.tolist(), methods,
+                                                      error.round(2).tolist())
+            for month, quantity in zip(months, row))
+    with transaction.atomic():
+        DemandForecast.objects.all().delete()
+        _insert(rows, batch_size)
+    timings['write'] = time.perf_counter() - started
+    return len(product_ids), timings
+
+
+def top(month=None, limit=10):
+    """أعلى المنتجات طلباً متوقعاً في الشهر (الحالي افتراضياً) مع كمياتها الحالية."""
+    return (DemandForecast.objects.filter(month=month or reports.month_key()).select_related('product')
+            .only('quantity', 'method', 'product__name', 'product__quantity').order_by('-quantity')[:limit])
@@ -4,6 +4,7 @@
 
 from django import forms
 from .models import CustomUser, Product # تم استيراد CustomUser و Product
+from . import images
 
 # نموذج تسجيل مستخدم جديد
 class RegisterForm(forms.Form): # تم التغيير إلى forms.Form لأنه لا يتصل مباشرة بنموذج
@@ -44,4 +45,16 @@ class ProductForm(forms.ModelForm):
             'quantity': 'الكمية المتاحة',
             'image': 'صورة المنتج',
             'category': 'الفئة',
-        }
\ No newline at end of file
+        }
+
+    def save(self, commit=True):
+        product = super().save(commit=commit)
+        if commit and 'image' in self.changed_data:
+            # توليد الصور المصغرة عند رفع صورة جديدة (أو مسحها عند حذف الصورة)
+            product.thumbnails = images.generate(product.image.name) if product.image else {}
+            product.save(update_fields=['thumbnails'])
+        return product
+
+# رفع ملف منتجات للاستيراد الجماعي من لوحة Django (انظر imports.py)
+class ProductImportUploadForm(forms.Form):
+    file = forms.FileField(label="الملف", help_text="CSV أو JSON أو JSON Lines بالأعمدة: name, description, quantity, category, image (رابط).")
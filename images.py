@@ -0,0 +1,78 @@
+"""
+توليد الصور المصغرة لصور المنتجات.
+لكل صورة تُولد نسخ بعرض ثابت (INVENTORY_THUMBNAIL_SIZES) بصيغتي WebP وJPEG بجانب الأصل في المجلد thumbs/،
+واسم كل ملف يحوي بصمة محتواه فيمكن تخزينه في المتصفح بلا انتهاء، ولا يُعاد رفع ملف موجود.
+أسماء الملفات تُحفظ في Product.thumbnails بالشكل {"200": {"webp": "...", "jpeg": "...", "width": 200}}،
+و width هو العرض الفعلي للنسخة (أقل من المقاس للصور الطولية أو الصغيرة) وهو ما يُعلن في srcset.
+"""
+
+import hashlib
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+SIZES = tuple(getattr(settings, 'INVENTORY_THUMBNAIL_SIZES', (70, 140, 200, 400)))
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+QUALITY = getattr(settings, 'INVENTORY_THUMBNAIL_QUALITY', 80)
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def generate(name, storage=default_storage):
+    """
+    يولد الصور المصغرة للصورة المخزنة باسم name ويعيد قاموس أسمائها.
+    الصور الأصغر من المقاس المطلوب لا تُكبّر.
+    """
+    with storage.open(name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    thumbnails = {}
+    for size in SIZES:
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        variants = {'width': image.width}
+        for extension, fmt in FORMATS:
+            data = _encode(image, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = posixpath.join(directory, 'thumbs', f'{stem}.{size}.{digest}.{extension}')
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(data))
+            variants[extension] = path
+        thumbnails[str(size)] = variants
+    return thumbnails
+
+
+def _candidates(thumbnails, extension):
+    """(العرض الفعلي، الاسم) لنسخ الصيغة مرتبة بالعرض، نسخة واحدة لكل عرض (الصورة الصغيرة تتكرر بنفس العرض)."""
+    candidates = {}
+    for size, variants in sorted(thumbnails.items(), key=lambda item: int(item[0])):
+        if extension in variants:
+            # النسخ المولدة قبل حفظ العرض الفعلي تُعلن بالمقاس المطلوب
+            candidates.setdefault(variants.get('width', int(size)), variants[extension])
+    return sorted(candidates.items())
+
+
+def srcset(thumbnails, extension, storage=default_storage):
+    """قيمة السمة srcset لصيغة معينة ("url 200w, url 400w") بالعرض الفعلي لكل نسخة."""
+    return ', '.join(f'{storage.url(path)} {width}w' for width, path in _candidates(thumbnails, extension))
+
+
+def closest(thumbnails, width, extension='jpeg', storage=default_storage):
+    """رابط أصغر صورة مصغرة لا يقل عرضها عن width (أو الأكبر المتاح)، للمتصفحات التي تتجاهل srcset."""
+    candidates = _candidates(thumbnails, extension)
+    if not candidates:
+        return None
+    return storage.url(next((path for actual, path in candidates if actual >= width), candidates[-1][1]))
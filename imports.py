@@ -0,0 +1,302 @@
+"""
+استيراد المنتجات جماعياً من CSV أو JSON (مصفوفة) أو JSON Lines، لأمر import_products والرفع من لوحة Django.
+
+- الملف يُقرأ صفاً صفاً (لا يُحمّل كاملاً في الذاكرة) ويُعالج على دفعات بحجم CHUNK_SIZE.
+- كل صف يُتحقق منه بقواعد ProductForm، ثم تُكتب الدفعة بـ bulk_create(update_conflicts=True)
+  على القيد الفريد (الفئة، الاسم): المنتج الموجود تُحدّث بياناته والجديد يُنشأ، باستعلام واحد.
+- الصور (رابط http/https، أو مسار محلي للأمر فقط) تُجلب في مجموعة خيوط قبل كتابة الدفعة،
+  وتُحفظ باسم مبني على بصمة محتواها فلا يتكرر الملف عند إعادة الاستيراد. الصور المصغرة يولدها
+  أمر generate_thumbnails لاحقاً (المنتج بصورة جديدة تُفرّغ صوره المصغرة).
+- كل دفعة في معاملة واحدة مع تحديث ProductImport.rows_done، فالاستئناف بعد انقطاع يتخطى
+  الصفوف المحفوظة ويكمل من أول دفعة لم تُحفظ.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import catalogue, ledger, reorder, search
+from .forms import ProductForm
+from .models import Product, ProductImport, StockMovement
+
+CHUNK_SIZE = getattr(settings, 'INVENTORY_IMPORT_CHUNK_SIZE', 1000)
+IMAGE_WORKERS = getattr(settings, 'INVENTORY_IMPORT_IMAGE_WORKERS', 8)
+IMAGE_TIMEOUT = getattr(settings, 'INVENTORY_IMPORT_IMAGE_TIMEOUT', 15)
+MAX_IMAGE_BYTES = getattr(settings, 'INVENTORY_IMPORT_MAX_IMAGE_BYTES', 10 * 1024 * 1024)
+# عدد الأخطاء المحفوظة في ProductImport.errors (البقية تُعد فقط)
+MAX_ERRORS = 100
+
+FORMATS = ('csv', 'json', 'jsonl')
+_EXTENSIONS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class ImportFailed(Exception):
+    """ملف لا يمكن قراءته (صيغة غير معروفة أو JSON تالف)."""
+
+
+class ProductImportForm(forms.Form):
+    """
+    قواعد حقول ProductForm للصف الواحد، دون الصورة (تُجلب من رابط).
+    المنتج يُتحقق منه بـ full_clean دون القيد الفريد (الفئة، الاسم): يحله الـ upsert، وفحصه استعلام لكل صف.
+    """
+
+    field_names = ['name', 'description', 'quantity', 'category']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields.update(forms.fields_for_model(Product, fields=self.field_names, labels=ProductForm.Meta.labels))
+        self.instance = None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        product = Product(**{name: cleaned_data[name] for name in self.field_names})
+        excluded = [field.name for field in Product._meta.fields if field.name not in self.field_names]
+        try:
+            product.full_clean(exclude=excluded, validate_unique=False, validate_constraints=False)
+        except ValidationError as exc:
+            self.add_error(None, exc)
+        else:
+            self.instance = product
+        return cleaned_data
+
+
+def detect_format(name):
+    fmt = _EXTENSIONS.get(os.path.splitext(name)[1].lower())
+    if fmt is None:
+        raise ImportFailed(f'صيغة غير معروفة للملف {name} (المتاح: {", ".join(FORMATS)}).')
+    return fmt
+
+
+def checksum(stream):
+    """بصمة SHA-256 لمحتوى الملف (تُقرأ على أجزاء) ثم يعاد المؤشر للبداية."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def _json_array(text, block_size=1 << 16):
+    """عناصر مصفوفة JSON من ملف نصي دون تحميله كاملاً (raw_decode على مخزن مؤقت ينمو عند الحاجة)."""
+    decoder = json.JSONDecoder()
+    buffer = text.read(block_size).lstrip()
+    if not buffer.startswith('['):
+        raise ImportFailed('ملف JSON يجب أن يكون مصفوفة من الكائنات.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except ValueError:
+            more = text.read(block_size)
+            if not more:
+                raise ImportFailed('ملف JSON غير مكتمل أو تالف.')
+            buffer += more
+            continue
+        yield row
+        buffer = buffer[end:]
+
+
+def read_rows(stream, fmt):
+    """صفوف الملف (قواميس) من تدفق ثنائي، واحداً واحداً."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    elif fmt == 'json':
+        yield from _json_array(text)
+    else:
+        for number, line in enumerate(text, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    raise ImportFailed(f'سطر JSON تالف رقم {number}.') from exc
+
+
+def fetch_image(source, base_dir=None, storage=default_storage):
+    """
+    يجلب صورة من رابط أو (إن أُعطي base_dir) من ملف محلي نسبي إليه، يتحقق أنها صورة،
+    ويحفظها في products/ باسم بصمتها، ويعيد اسمها في التخزين.
+    """
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=IMAGE_TIMEOUT) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    elif base_dir is not None:
+        with open(os.path.join(base_dir, source), 'rb') as fh:
+            data = fh.read(MAX_IMAGE_BYTES + 1)
+    else:
+        raise ValueError('الصور المقبولة روابط http/https فقط.')
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError('حجم الصورة أكبر من المسموح.')
+    with Image.open(io.BytesIO(data)) as image:
+        extension = (image.format or 'jpeg').lower()
+        image.verify()
+    name = f'products/{hashlib.sha256(data).hexdigest()[:20]}.{extension}'
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return name
+
+
+class _Chunk:
+    """صفوف دفعة واحدة بعد التحقق: المنتجات، ومصادر صورها، والأخطاء."""
+
+    def __init__(self):
+        self.products = {} # (الفئة، الاسم) -> Product؛ الصف الأخير يفوز عند التكرار داخل الدفعة
+        self.images = {}   # (الفئة، الاسم) -> مصدر الصورة
+        self.errors = []
+        self.rows = 0
+
+
+def _validate(chunk, number, row):
+    chunk.rows += 1
+    if not isinstance(row, dict):
+        chunk.errors.append({'row': number, 'errors': 'الصف ليس كائناً.'})
+        return
+    data = {key: str(value).strip() for key, value in row.items() if key and value is not None}
+    form = ProductImportForm(data)
+    if not form.is_valid():
+        chunk.errors.append({'row': number, 'errors': form.errors.get_json_data()})
+        return
+    product = form.instance
+    key = (product.category, product.name)
+    chunk.products[key] = product
+    chunk.images.pop(key, None)
+    if data.get('image'):
+        chunk.images[key] = data['image']
+
+
+def _write(job, chunk, pool, base_dir):
+    """يجلب صور الدفعة ثم يكتبها مع نقطة الاستئناف في معاملة واحدة."""
+    keys = list(chunk.images)
+    for key, result in zip(keys, pool.map(_safe_fetch, [(chunk.images[key], base_dir) for key in keys])):
+        name, error = result
+        if error:
+            chunk.errors.append({'row': None, 'errors': f'صورة المنتج {key[1]}: {error}'})
+        else:
+            chunk.products[key].image = name
+            chunk.products[key].thumbnails = {}
+
+    with transaction.atomic():
+        existing = {}
+        if chunk.products:
+            names = {name for _, name in chunk.products}
+            existing = {(category, name): quantity for category, name, quantity
+                        in Product.objects.filter(name__in=names).values_list('category', 'name', 'quantity')}
+        with_image = [p for p in chunk.products.values() if p.image]
+        without_image = [p for p in chunk.products.values() if not p.image]
+        written = []
+        # المنتج بلا صورة في الملف يحتفظ بصورته الحالية، فلكل مجموعة حقول تحديث مختلفة
+        for products, fields in ((with_image, ['description', 'quantity', 'image', 'thumbnails']),
+                                 (without_image, ['description', 'quantity'])):
+            if products:
+                written += Product.objects.bulk_create(
+                    products, update_conflicts=True, unique_fields=['category', 'name'], update_fields=fields)
+        if any(product.pk is None for product in written):
+            # قواعد لا تعيد المعرفات مع ON CONFLICT
+            keys = {(p.category, p.name) for p in written}
+            written = [p for p in Product.objects.filter(name__in={name for _, name in keys}) if (p.category, p.name) in keys]
+        # bulk_create لا يرسل إشارات post_save، ففهرس البحث وذاكرة الكتالوج يُحدثان هنا
+        search.get_backend().index(written)
+        catalogue.bump_on_commit()
+        # وكذلك حركات المخزون (استلام للمنتج الجديد، وتعديل بفرق الكمية للموجود) ومستويات إعادة الطلب
+        ledger.record([
+            ledger.movement(p, p.quantity - existing[(p.category, p.name)], StockMovement.ADJUSTMENT,
+                            note=f'استيراد #{job.pk}')
+            if (p.category, p.name) in existing else
+            ledger.movement(p, p.quantity, StockMovement.RECEIPT, note=f'استيراد #{job.pk}')
+            for p in written
+        ])
+        reorder.update({p.pk: p.quantity for p in written})
+
+        created = sum(1 for key in chunk.products if key not in existing)
+        job.rows_done += chunk.rows
+        job.created += created
+        job.updated += len(chunk.products) - created
+        job.failed += sum(1 for error in chunk.errors if error['row'] is not None)
+        job.errors = (job.errors + chunk.errors)[:MAX_ERRORS]
+        job.save(update_fields=['rows_done', 'created', 'updated', 'failed', 'errors'])
+
+
+def _safe_fetch(args):
+    source, base_dir = args
+    try:
+        return fetch_image(source, base_dir), None
+    except Exception as exc: # الصورة المعطوبة لا تمنع استيراد المنتج
+        return None, f'{type(exc).__name__}: {exc}'
+
+
+def run(job, stream, base_dir=None, chunk_size=CHUNK_SIZE, workers=IMAGE_WORKERS, progress=None):
+    """
+    ينفذ الاستيراد job من التدفق الثنائي stream، متخطياً job.rows_done صفاً محفوظاً من قبل.
+    base_dir يسمح بالصور المحلية (للأمر فقط). progress(job, rows_per_second) يُستدعى بعد كل دفعة.
+    """
+    started = time.perf_counter()
+    processed = 0
+    try:
+        rows = read_rows(stream, job.format)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            chunk = _Chunk()
+            for number, row in enumerate(rows, 1):
+                if number <= job.rows_done:
+                    continue
+                _validate(chunk, number, row)
+                if chunk.rows >= chunk_size:
+                    _write(job, chunk, pool, base_dir)
+                    processed += chunk.rows
+                    chunk = _Chunk()
+                    if progress:
+                        progress(job, processed / (time.perf_counter() - started))
+            if chunk.rows:
+                _write(job, chunk, pool, base_dir)
+                processed += chunk.rows
+                if progress:
+                    progress(job, processed / (time.perf_counter() - started))
+    except ImportFailed as exc:
+        job.status = 'Failed'
+        job.errors = (job.errors + [{'row': None, 'errors': str(exc)}])[:MAX_ERRORS]
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'errors', 'finished_at'])
+        raise
+    job.status = 'Done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return job
+
+
+def start(source, digest, fmt, uploaded=False, restart=False):
+    """
+    يعيد عملية استيراد غير مكتملة لنفس المحتوى (للاستئناف) أو ينشئ عملية جديدة.
+    restart=True يبدأ من الصف الأول دائماً.
+    """
+    if not restart:
+        job = ProductImport.objects.filter(checksum=digest, format=fmt).exclude(status='Done').first()
+        if job is not None:
+            job.status = 'Running'
+            job.save(update_fields=['status'])
+            return job
+    return ProductImport.objects.create(source=source, checksum=digest, format=fmt, uploaded=uploaded)
+
+
+def open_source(job):
+    """يفتح ملف العملية (من التخزين إن كان مرفوعاً، وإلا من مساره) كتدفق ثنائي."""
+    return default_storage.open(job.source, 'rb') if job.uploaded else open(job.source, 'rb')
@@ -0,0 +1,268 @@
+"""
+قياس كل طلب في الإنتاج: الزمن الكلي، زمن قاعدة البيانات وعدد الاستعلامات، الاستعلامات المكررة (N+1)،
+وزمن رسم القوالب، موسومة باسم الرابط (inventory:admin_dashboard ...).
+
+- InstrumentationMiddleware يقيس الزمن الكلي وعدد الطلبات لكل طلب (كلفة ثابتة صغيرة)،
+  والتفاصيل (الاستعلامات والقوالب) لنسبة SAMPLE_RATE من الطلبات فقط.
+- الاستعلامات تُلتقط بغلاف execute_wrapper يُركّب على كل اتصال عند إنشائه (signals.py)؛
+  خارج طلب مختار للعينة لا يفعل الغلاف شيئاً سوى قراءة ContextVar، والحالة تنتقل مع الطلب
+  إلى خيوط sync_to_async فتُحسب استعلامات العروض غير المتزامنة أيضاً.
+- زمن القوالب تقيسه واجهة القوالب InstrumentedTemplates (بديل DjangoTemplates في إعداد TEMPLATES).
+- النتائج تُعرض بصيغة Prometheus النصية على metrics/ (للعناوين المحلية فقط) مع عدادات ذاكرة الكتالوج، وكل طلب في العينة
+  يُكتب كسطر JSON في سجل inventory.instrumentation (WARNING عند اكتشاف N+1 أو تجاوز SLOW_MS).
+
+المقاييس تُجمع في ذاكرة العملية؛ مع عدة عمليات يُقرأ كل منها على حدة (كل عامل بمنفذه أو بعنوان مختلف).
+الاستجابات المبثوثة (التصدير، SSE) يُقاس زمنها حتى إنشاء الاستجابة لا حتى آخر بايت.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# نسبة الطلبات التي تُلتقط استعلاماتها وقوالبها (0 يوقف التفاصيل، 1 لكل الطلبات)
+SAMPLE_RATE = getattr(settings, 'INVENTORY_METRICS_SAMPLE_RATE', 0.1)
+# عدد تكرارات نفس جملة SQL في طلب واحد التي تُعد نمط N+1
+DUPLICATE_THRESHOLD = getattr(settings, 'INVENTORY_METRICS_DUPLICATE_THRESHOLD', 5)
+# الطلب الأبطأ من هذا (بالمللي ثانية) يُسجل كتحذير
+SLOW_MS = getattr(settings, 'INVENTORY_METRICS_SLOW_MS', 1000)
+# العناوين المسموح لها بقراءة metrics/
+ALLOWED_IPS = getattr(settings, 'INVENTORY_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_METRICS = {
+    'inventory_requests_total': ('counter', 'عدد الطلبات حسب الرابط والطريقة والحالة.'),
+    'inventory_request_duration_seconds': ('histogram', 'الزمن الكلي للطلب حتى إنشاء الاستجابة.'),
+    'inventory_sampled_requests_total': ('counter', 'الطلبات المختارة للعينة (مقام متوسطات قاعدة البيانات والقوالب).'),
+    'inventory_db_queries': ('histogram', 'عدد الاستعلامات في الطلب (للعينة).'),
+    'inventory_db_duration_seconds_total': ('counter', 'مجموع زمن قاعدة البيانات (للعينة).'),
+    'inventory_template_duration_seconds_total': ('counter', 'مجموع زمن رسم القوالب (للعينة).'),
+    'inventory_duplicate_query_requests_total': ('counter', 'طلبات فيها جملة SQL مكررة DUPLICATE_THRESHOLD مرة أو أكثر (N+1).'),
+}
+
+_current = ContextVar('inventory_request_stats', default=None)
+
+
+class RequestStats:
+    """تفاصيل طلب واحد في العينة: الاستعلامات (جملة SQL ← عدد التكرار) وأزمنة قاعدة البيانات والقوالب."""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self):
+        """الجمل المكررة DUPLICATE_THRESHOLD مرة أو أكثر، الأكثر تكراراً أولاً."""
+        return [(sql, count) for sql, count in self.queries.most_common() if count >= DUPLICATE_THRESHOLD]
+
+
+class Registry:
+    """عدادات ومدرجات تكرارية في ذاكرة العملية، تُعرض بصيغة Prometheus النصية."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}   # (الاسم، الوسوم) -> قيمة
+        self._histograms = {} # (الاسم، الوسوم) -> (الحدود، [عدد كل حد..., المجموع، العدد])
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = (buckets, [0] * len(buckets) + [0, 0])
+            state = self._histograms[key][1]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        lines = []
+        for name, (kind, help_text) in _METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            if kind == 'counter':
+                lines += [f'{name}{_labels(labels)} {_number(value)}'
+                          for (metric, labels), value in counters if metric == name]
+                continue
+            for (metric, labels), (buckets, state) in histograms:
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, state):
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {count}')
+                lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {state[-1]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(state[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    """غلاف execute_wrapper: يحسب الجملة وزمنها إن كان الطلب الحالي في العينة."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries[sql] += 1
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """
+    DjangoTemplates مع قياس زمن الرسم في طلبات العينة. يُقاس القالب الذي يطلبه العرض
+    (بما فيه ما يضمنه من قوالب)، فلا يُحسب الزمن مرتين.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def _record(request, response, elapsed, stats):
+    view = _view_name(request)
+    registry.inc('inventory_requests_total', {'view': view, 'method': request.method,
+                                              'status': response.status_code})
+    registry.observe('inventory_request_duration_seconds', {'view': view}, elapsed, DURATION_BUCKETS)
+    if stats is None:
+        return
+
+    duplicates = stats.duplicates()
+    registry.inc('inventory_sampled_requests_total', {'view': view})
+    registry.observe('inventory_db_queries', {'view': view}, stats.query_count, QUERY_BUCKETS)
+    registry.inc('inventory_db_duration_seconds_total', {'view': view}, stats.db_seconds)
+    registry.inc('inventory_template_duration_seconds_total', {'view': view}, stats.template_seconds)
+    if duplicates:
+        registry.inc('inventory_duplicate_query_requests_total', {'view': view})
+
+    line = {
+        'view': view, 'method': request.method, 'path': request.path, 'status': response.status_code,
+        'duration_ms': round(elapsed * 1000, 2), 'db_ms': round(stats.db_seconds * 1000, 2),
+        'queries': stats.query_count, 'template_ms': round(stats.template_seconds * 1000, 2),
+    }
+    if duplicates:
+        sql, count = duplicates[0]
+        line['duplicate_queries'] = {'count': count, 'sql': sql[:300], 'statements': len(duplicates)}
+    level = logging.WARNING if duplicates or elapsed * 1000 >= SLOW_MS else logging.INFO
+    logger.log(level, json.dumps(line, ensure_ascii=False))
+
+
+class InstrumentationMiddleware:
+    """يقيس كل طلب ويختار عينة للتفاصيل. يوضع أول MIDDLEWARE حتى يشمل زمن بقية الوسطاء."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _begin(self):
+        stats = RequestStats() if SAMPLE_RATE and random.random() < SAMPLE_RATE else None
+        return stats, _current.set(stats), time.perf_counter()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, started = self._begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, time.perf_counter() - started, stats)
+        return response
+
+
+def _catalogue_metrics():
+    """عدادات ذاكرة الكتالوج (catalogue.stats) محفوظة في الذاكرة المؤقتة لا في registry، فتُقرأ عند العرض."""
+    from . import catalogue
+
+    stats = catalogue.stats()
+    lines = []
+    for name, key, help_text in (
+        ('inventory_catalogue_hits_total', 'hits', 'صفحات الكتالوج المقروءة من الذاكرة المؤقتة.'),
+        ('inventory_catalogue_misses_total', 'misses', 'صفحات الكتالوج المبنية من قاعدة البيانات.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {stats[key]}']
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """المقاييس بصيغة Prometheus النصية، للعناوين في ALLOWED_IPS فقط (وإلا 404 حتى لا يُكشف الرابط)."""
+    if request.META.get('REMOTE_ADDR') not in ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(registry.render() + _catalogue_metrics(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
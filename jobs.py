@@ -0,0 +1,330 @@
+"""
+طابور المهام في الخلفية (جدول Job) للعمليات الثقيلة التي كانت تُنفذ داخل طلب المدير فتتجاوز مهلة العامل:
+الموافقة الجماعية، الاستيراد من اللوحة، التصدير، الصور المصغرة، وإعادة بناء التقارير والتحليلات.
+
+- enqueue يكتب صف Job ويعود فوراً؛ أمر run_workers ينفذ المهام بمجموعة خيوط أو عمليات.
+  لا وسيط خارجي: قاعدة البيانات نفسها هي الطابور.
+- الحجز تحديث مشروط على (الحالة، عدد المحاولات) فلا يحجز عاملان المهمة نفسها، ومعه مهلة LEASE
+  تُجدد مع كل تقرير تقدم. المهمة التي توقف عاملها (انهيار، إعادة تشغيل) تُستعاد بعد انتهاء المهلة
+  حتى MAX_ATTEMPTS محاولات. الخطأ داخل المعالج يُنهي المهمة بالفشل دون إعادة.
+- idempotency_key فريد: نفس المفتاح (إعادة إرسال النموذج نفسه) يعيد المهمة الموجودة ولا ينشئ أخرى.
+- الإلغاء: المنتظرة تُلغى فوراً، والجارية تتوقف عند أول تقرير تقدم بعده؛ ما كُتب قبله من دفعات يبقى
+  (المعالجات تكتب على دفعات في معاملات قصيرة).
+
+المعالج دالة handler(params, progress) تعيد قاموس النتيجة (JSON)، وفيه 'summary' نص يظهر في لوحة المدير.
+"""
+
+import logging
+import secrets
+import tempfile
+import time
+from datetime import date, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from . import analytics, catalogue, exports, forecasting, images, imports, reports, stock
+from .models import ConsumptionRecord, Job, Product, ProductImport
+
+logger = logging.getLogger(__name__)
+
+# مهلة حجز المهمة بالثواني: المهمة الجارية التي لم تبلغ عن تقدم خلالها تُعد متوقفة وتُستعاد
+LEASE = getattr(settings, 'INVENTORY_JOB_LEASE', 300)
+MAX_ATTEMPTS = getattr(settings, 'INVENTORY_JOB_MAX_ATTEMPTS', 3)
+# عدد العمال الافتراضي لأمر run_workers، ومدة الاحتفاظ بالمهام المنتهية
+WORKERS = getattr(settings, 'INVENTORY_JOB_WORKERS', 2)
+RETAIN_DAYS = getattr(settings, 'INVENTORY_JOB_RETAIN_DAYS', 30)
+# تنفيذ المهمة في نفس العملية بعد التزام معاملة الطلب (للتطوير دون تشغيل run_workers)
+EAGER = getattr(settings, 'INVENTORY_JOBS_EAGER', False)
+
+# الطلبات في كل معاملة موافقة (تقرير تقدم وفرصة إلغاء بعد كل دفعة)
+APPROVAL_BATCH = 200
+THUMBNAIL_BATCH = 20
+
+HANDLERS = {}
+# المهام التي تُبدأ من أزرار الصيانة في لوحة المدير بلا معطيات
+MAINTENANCE = ('rebuild_reports', 'rebuild_analytics', 'generate_thumbnails', 'forecast_demand')
+
+
+class Cancelled(Exception):
+    """طُلب إلغاء المهمة أثناء تنفيذها (أو استعادها عامل آخر بعد انتهاء مهلة الحجز)."""
+
+
+def handler(kind):
+    """يسجل معالج نوع المهمة kind (من Job.KIND_CHOICES)."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def maintenance():
+    """[(النوع، الاسم)] لأزرار الصيانة المتاحة في هذا التثبيت (التنبؤ يحتاج numpy)."""
+    labels = dict(Job.KIND_CHOICES)
+    return [(kind, labels[kind]) for kind in MAINTENANCE if kind != 'forecast_demand' or forecasting.available()]
+
+
+def enqueue(kind, params=None, user=None, key=None):
+    """
+    يضيف مهمة ويعيد (المهمة، هل أُنشئت). مع key الموجود مسبقاً تُعاد المهمة نفسها أياً كانت حالتها.
+    داخل معاملة، لا يراها العمال إلا بعد التزامها.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'نوع مهمة غير معروف: {kind}')
+    if key:
+        existing = Job.objects.filter(idempotency_key=key).first()
+        if existing is not None:
+            return existing, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(kind=kind, params=params or {}, user=user, idempotency_key=key or None)
+    except IntegrityError: # طلبان متزامنان بنفس المفتاح
+        return Job.objects.get(idempotency_key=key), False
+    if EAGER:
+        transaction.on_commit(partial(_run_now, job.pk))
+    return job, True
+
+
+def _run_now(pk):
+    job = _claim_one(Job.objects.filter(pk=pk).first(), timezone.now())
+    if job is not None:
+        execute(job)
+
+
+def cancel(pk):
+    """يلغي المهمة المنتظرة فوراً ويطلب إيقاف الجارية. يعيد False إن كانت قد انتهت."""
+    if Job.objects.filter(pk=pk, status='Pending').update(
+            status='Cancelled', cancel_requested=True, finished_at=timezone.now()):
+        return True
+    return bool(Job.objects.filter(pk=pk, status='Running').update(cancel_requested=True))
+
+
+def _claim_one(job, now):
+    """يحجز المهمة job (منتظرة، أو جارية انتهت مهلتها) إن لم يسبقه عامل آخر، ويعيدها محدثة أو None."""
+    if job is None or job.status not in ('Pending', 'Running'):
+        return None
+    current = Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+    if job.status == 'Running':
+        if job.locked_until and job.locked_until >= now:
+            return None
+        if job.cancel_requested or job.attempts >= MAX_ATTEMPTS:
+            # العامل توقف أثناء تنفيذها: لا تُعاد بعد طلب الإلغاء أو استنفاد المحاولات
+            current.update(status='Cancelled' if job.cancel_requested else 'Failed', finished_at=now, locked_until=None,
+                           error='' if job.cancel_requested else 'توقف العامل أثناء التنفيذ في كل المحاولات.')
+            return None
+    if not current.update(status='Running', attempts=job.attempts + 1, locked_until=now + timedelta(seconds=LEASE),
+                          started_at=now):
+        return None
+    return Job.objects.get(pk=job.pk)
+
+
+def claim(now=None):
+    """يحجز أقدم مهمة مستحقة ويعيدها، أو None إن لم توجد."""
+    now = now or timezone.now()
+    due = (Job.objects.filter(Q(status='Pending') | Q(status='Running', locked_until__lt=now))
+           .order_by('created_at', 'pk').only('pk', 'status', 'attempts', 'locked_until', 'cancel_requested'))
+    for job in due[:10]:
+        claimed = _claim_one(job, now)
+        if claimed is not None:
+            return claimed
+    return None
+
+
+class Progress:
+    """يُمرر للمعالج: progress(المنجز، الإجمالي، الرسالة) يسجل التقدم ويجدد الحجز ويتحقق من طلب الإلغاء."""
+
+    def __init__(self, job):
+        self.job = job
+        self.total = None
+
+    def __call__(self, done, total=None, message=''):
+        if total is not None:
+            self.total = total
+        fields = {'progress': done, 'locked_until': timezone.now() + timedelta(seconds=LEASE)}
+        if total is not None:
+            fields['total'] = total
+        if message:
+            fields['message'] = message[:200]
+        # الشرط على attempts يكشف استعادة المهمة من عامل آخر بعد انتهاء مهلة حجزها
+        running = Job.objects.filter(pk=self.job.pk, status='Running', attempts=self.job.attempts)
+        if running.filter(cancel_requested=False).update(**fields):
+            return
+        # طلب إلغاء: المنجز حتى الآن محفوظ فعلاً، فيُسجل قبل التوقف
+        running.update(progress=done)
+        raise Cancelled
+
+
+def execute(job):
+    """ينفذ مهمة محجوزة ويسجل نهايتها (اكتملت، فشلت، أو أُلغيت)."""
+    progress = Progress(job)
+    fields = {}
+    try:
+        result = HANDLERS[job.kind](job.params, progress)
+    except Cancelled:
+        fields['status'] = 'Cancelled'
+    except Exception as exc:
+        logger.exception('فشلت المهمة #%s (%s)', job.pk, job.kind)
+        fields.update(status='Failed', error=f'{type(exc).__name__}: {exc}')
+    else:
+        fields.update(status='Done', result=result or {}, message='')
+        if progress.total is not None:
+            fields['progress'] = progress.total
+    Job.objects.filter(pk=job.pk, status='Running', attempts=job.attempts).update(
+        finished_at=timezone.now(), locked_until=None, **fields)
+
+
+def work(loop=False, interval=2.0, stop=None):
+    """
+    ينفذ المهام المستحقة واحدة تلو الأخرى حتى ينفد الطابور، أو باستمرار مع loop حتى يُضبط الحدث stop.
+    يعيد عدد المهام المنفذة.
+    """
+    done = 0
+    while stop is None or not stop.is_set():
+        try:
+            job = claim()
+        except OperationalError as exc:
+            # عمال آخرون يكتبون في نفس اللحظة (SQLite): تُعاد المحاولة ولا يتوقف العامل
+            if 'locked' not in str(exc):
+                raise
+            time.sleep(0.05)
+            continue
+        if job is None:
+            if not loop:
+                break
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
+            continue
+        execute(job)
+        done += 1
+    return done
+
+
+def purge(before):
+    """يحذف المهام المنتهية قبل before مع ملفات التصدير التي أنتجتها. يعيد عدد المهام المحذوفة."""
+    finished = Job.objects.filter(status__in=('Done', 'Failed', 'Cancelled'), finished_at__lt=before)
+    exported = finished.filter(kind='export', status='Done').values_list('result', flat=True)
+    paths = [result.get('path') for result in exported]
+    deleted = finished.delete()[0]
+    # الملف بعد حذف مهمته لا يصل إليه رابط تنزيل، فيُحذف معها بدلاً من أن يتراكم في التخزين
+    for path in filter(None, paths):
+        default_storage.delete(path)
+    return deleted
+
+
+@handler('approve_orders')
+def approve_orders(params, progress):
+    order_ids = list(dict.fromkeys(params['order_ids']))
+    approved, shortages = 0, []
+    progress(0, len(order_ids))
+    for start in range(0, len(order_ids), APPROVAL_BATCH):
+        for result in stock.approve_orders(order_ids[start:start + APPROVAL_BATCH]):
+            if result.approved:
+                approved += 1
+            elif result.outcome == stock.INSUFFICIENT_STOCK:
+                shortages.append(result.shortage_message())
+        # كل دفعة تُلتزم في معاملتها، فالتقدم (والتحقق من الإلغاء) بعدها
+        progress(min(start + APPROVAL_BATCH, len(order_ids)))
+    return {'approved': approved, 'shortages': shortages[:20],
+            'summary': f'تمت الموافقة على {approved} من {len(order_ids)} طلب.'}
+
+
+@handler('import_products')
+def import_products(params, progress):
+    record = ProductImport.objects.get(pk=params['import_id'])
+
+    def report(record, rate):
+        progress(record.rows_done, message=f'{record.created} جديد، {record.updated} محدث، {record.failed} مرفوض')
+
+    # الإلغاء يترك العملية غير مكتملة فيستأنفها رفع الملف نفسه من آخر دفعة محفوظة
+    with imports.open_source(record) as stream:
+        imports.run(record, stream, progress=report)
+    return {'import_id': record.pk,
+            'summary': f'{record.created} جديد، {record.updated} محدث، {record.failed} مرفوض.'}
+
+
+@handler('export')
+def export(params, progress):
+    """يكتب ملف التصدير في التخزين الافتراضي (مجلد باسم عشوائي)؛ ينزّله المدير من رابط المهمة."""
+    spec = exports.EXPORTS[params['name']]
+    fmt = params['fmt']
+    queryset = spec.get_queryset()
+    total = queryset.count()
+    progress(0, total)
+    with tempfile.TemporaryFile() as output:
+        exports.write(spec, fmt, output, queryset, progress=lambda rows: progress(rows, total))
+        output.seek(0)
+        path = default_storage.save(f'exports/{secrets.token_hex(8)}/{spec.filename(fmt)}', File(output))
+    return {'path': path, 'filename': spec.filename(fmt), 'rows': total, 'summary': f'{total} صف.'}
+
+
+@handler('generate_thumbnails')
+def generate_thumbnails(params, progress):
+    """الصور المصغرة للمنتجات المحددة (product_ids) أو لكل منتج بصورة بلا صور مصغرة (أو كلها مع all)."""
+    products = Product.objects.exclude(image='').exclude(image__isnull=True)
+    if params.get('product_ids'):
+        products = products.filter(pk__in=params['product_ids'])
+    elif not params.get('all'):
+        products = products.filter(thumbnails={})
+    pending = list(products.order_by('pk').values_list('pk', 'image'))
+    done, failed = 0, 0
+    for number, (pk, name) in enumerate(pending):
+        if number % THUMBNAIL_BATCH == 0:
+            progress(number, len(pending))
+        try:
+            thumbnails = images.generate(name)
+        except Exception: # ملف مفقود أو تالف لا يوقف بقية المنتجات
+            logger.warning('تعذر توليد الصور المصغرة للمنتج #%s', pk, exc_info=True)
+            failed += 1
+            continue
+        # update بدلاً من save حتى لا يُعاد فهرسة البحث لكل منتج
+        Product.objects.filter(pk=pk).update(thumbnails=thumbnails)
+        done += 1
+    if done:
+        catalogue.bump()
+    return {'done': done, 'failed': failed, 'summary': f'{done} من {len(pending)} منتج.'}
+
+
+@handler('rebuild_reports')
+def rebuild_reports(params, progress):
+    months = params.get('months') or [reports.month_key()]
+    written = 0
+    for number, month in enumerate(months):
+        progress(number, len(months), message=month)
+        with transaction.atomic():
+            written += reports.rebuild_month(month)
+    return {'written': written, 'summary': f'{"، ".join(months)}: {written} صف.'}
+
+
+@handler('rebuild_analytics')
+def rebuild_analytics(params, progress):
+    """يعيد بناء جداول التجميع اليومية للفترة start..end (الافتراضي كل سجلات الاستهلاك)، شهراً شهراً."""
+    bounds = ConsumptionRecord.objects.aggregate(first=Min('consumed_at'), last=Max('consumed_at'))
+    if bounds['first'] is None:
+        return {'written': 0, 'summary': 'لا توجد سجلات استهلاك.'}
+    start = date.fromisoformat(params['start']) if params.get('start') else timezone.localdate(bounds['first'])
+    end = date.fromisoformat(params['end']) if params.get('end') else timezone.localdate(bounds['last'])
+    total = (end - start).days + 1
+    written = 0
+    day = start
+    while day <= end:
+        # شهر في كل معاملة: تقرير تقدم وفرصة إلغاء بينها، ولا قفل طويل على الكتابة
+        last = min(end, (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1))
+        progress((day - start).days, total, message=f'{day:%Y-%m}')
+        with transaction.atomic():
+            written += analytics.rebuild(day, last)
+        day = last + timedelta(days=1)
+    return {'written': written, 'summary': f'{start} → {end}: {written} صف.'}
+
+
+@handler('forecast_demand')
+def forecast_demand(params, progress):
+    progress(0, 1)
+    products, timings = forecasting.run()
+    return {'products': products, 'summary': f'{products} منتج في {sum(timings.values()):.1f} ث.'}
@@ -0,0 +1,124 @@
+"""
+دفتر حركات المخزون (StockMovement) ولقطاته (StockSnapshot): كمية أي منتج في أي لحظة سابقة.
+
+- كل تغيير على Product.quantity يُسجل حركة بإشارة الفرق: الموافقات (stock.py)، الحفظ من العروض
+  ولوحة Django (إشارة post_save في signals.py)، والاستيراد الجماعي (imports.py). الحركات لا تُعدل ولا تُحذف.
+- اللقطة كمية المنتج عند وقت محدد، محسوبة من الدفتر نفسه (اللقطة السابقة + الحركات بعدها)،
+  يأخذها أمر snapshot_stock دورياً. الكمية في أي لحظة = آخر لقطة قبلها + مجموع الحركات بينهما،
+  فالقراءة تمسح حركات فترة واحدة بين لقطتين على الأكثر مهما طال السجل.
+- compact يرقق اللقطات القديمة إلى لقطة واحدة لكل شهر، فيبقى عددها محدوداً والمسح للتواريخ القديمة شهراً على الأكثر.
+- QuerySet.update على الكمية لا يمر بالدفتر؛ drift يكشف المنتجات التي لا يطابق دفترها كميتها الحالية.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+# اللقطات الأحدث من هذا (بالأيام) تبقى كلها، والأقدم تُرقق إلى لقطة شهرية (أمر snapshot_stock)
+RETAIN_DAYS = getattr(settings, 'INVENTORY_SNAPSHOT_RETAIN_DAYS', 90)
+
+# ما قبل أي حركة (للمنتج الذي لا لقطة له)
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def movement(product, delta, kind, user=None, order=None, note='', created_at=None):
+    """حركة غير محفوظة (لـ record)."""
+    return StockMovement(product_id=getattr(product, 'pk', product), delta=delta, kind=kind,
+                         user=user, order=order, note=note, created_at=created_at or timezone.now())
+
+
+def record(movements):
+    """يحفظ الحركات ذات الفرق غير الصفري بعملية جماعية واحدة."""
+    movements = [m for m in movements if m.delta]
+    if movements:
+        StockMovement.objects.bulk_create(movements, batch_size=2000)
+    return movements
+
+
+def levels_at(when, product_ids=None):
+    """
+    {معرف المنتج: الكمية} عند اللحظة when لكل المنتجات (أو product_ids) باستعلام واحد:
+    آخر لقطة لكل منتج قبل when، ومجموع حركاته بعد اللقطة حتى when (مسح نطاق على فهرس المنتج والتاريخ).
+    """
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=when).order_by('-taken_at')
+    moved = (StockMovement.objects.filter(product=OuterRef('pk'), created_at__gt=OuterRef('snapshot_at'),
+                                          created_at__lte=when)
+             .order_by().values('product').annotate(total=Sum('delta')).values('total'))
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    rows = (products.order_by()
+            .annotate(snapshot_at=Coalesce(Subquery(snapshots.values('taken_at')[:1]), Value(_EPOCH),
+                                           output_field=DateTimeField()),
+                      base=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+                      moved=Coalesce(Subquery(moved, output_field=IntegerField()), 0))
+            .values_list('pk', 'base', 'moved'))
+    return {pk: base + moved for pk, base, moved in rows}
+
+
+def stock_at(product, when):
+    """كمية منتج واحد عند اللحظة when: آخر لقطة ثم مجموع الحركات بعدها (استعلامان على الفهرسين)."""
+    pk = getattr(product, 'pk', product)
+    snapshot = (StockSnapshot.objects.filter(product_id=pk, taken_at__lte=when).order_by('-taken_at')
+                .values_list('taken_at', 'quantity').first())
+    since, base = snapshot or (_EPOCH, 0)
+    return base + StockMovement.objects.filter(product_id=pk, created_at__gt=since, created_at__lte=when).aggregate(
+        total=Coalesce(Sum('delta'), 0))['total']
+
+
+def replay_at(product, when):
+    """نفس stock_at بجمع كل الحركات منذ البداية دون لقطات (للتحقق والمقارنة في القياس)."""
+    pk = getattr(product, 'pk', product)
+    return StockMovement.objects.filter(product_id=pk, created_at__lte=when).aggregate(
+        total=Coalesce(Sum('delta'), 0))['total']
+
+
+def take_snapshot(at=None, batch_size=2000):
+    """يأخذ لقطة لكل المنتجات عند at (الافتراضي الآن) من الدفتر؛ اللقطة الموجودة لنفس الوقت تبقى. يعيد عددها."""
+    at = at or timezone.now()
+    levels = levels_at(at)
+    StockSnapshot.objects.bulk_create(
+        [StockSnapshot(product_id=pk, taken_at=at, quantity=quantity) for pk, quantity in levels.items()],
+        batch_size=batch_size, ignore_conflicts=True)
+    return len(levels)
+
+
+def backfill(start, end, every=timedelta(days=1)):
+    """لقطات من start إلى end كل every بالترتيب الزمني (كل لقطة تُحسب من السابقة). يعيد عدد الأوقات."""
+    taken = 0
+    at = start
+    while at <= end:
+        with transaction.atomic():
+            take_snapshot(at)
+        taken += 1
+        at += every
+    return taken
+
+
+def compact(before, batch_size=900):
+    """يحذف اللقطات الأقدم من before عدا أول لقطة لكل منتج في كل شهر. يعيد عدد المحذوف."""
+    rows = (StockSnapshot.objects.filter(taken_at__lt=before).order_by('product', 'taken_at')
+            .values_list('pk', 'product', 'taken_at'))
+    stale, kept = [], None
+    for pk, product, taken_at in rows.iterator(chunk_size=batch_size * 10):
+        local = timezone.localtime(taken_at)
+        month = (product, local.year, local.month)
+        if month == kept:
+            stale.append(pk)
+        kept = month
+    for start in range(0, len(stale), batch_size):
+        StockSnapshot.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+    return len(stale)
+
+
+def drift(product_ids=None):
+    """المنتجات التي لا يطابق دفترها كميتها الحالية: {المعرف: (حسب الدفتر، الكمية الحالية)}."""
+    now = timezone.now()
+    quantities = dict((Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids))
+                      .values_list('pk', 'quantity'))
+    return {pk: (level, quantities[pk]) for pk, level in levels_at(now, list(quantities)).items()
+            if level != quantities[pk]}
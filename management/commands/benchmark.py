@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases, setup_test_environment, teardown_test_environment
+
+from inventory.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'يشغل سيناريو قياس أداء على قاعدة بيانات اختبار مؤقتة ويطبع النتائج بصيغة JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS), help='اسم السيناريو.')
+        parser.add_argument('--size', type=int, help='حجم البيانات (يختلف معناه حسب السيناريو).')
+        parser.add_argument('--output', help='ملف لحفظ النتائج بدلاً من الطباعة.')
+
+    def handle(self, *args, **options):
+        kwargs = {'size': options['size']} if options['size'] else {}
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            result = SCENARIOS[options['scenario']](**kwargs)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = json.dumps({'scenario': options['scenario'], **kwargs, 'result': result}, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f'تم حفظ النتائج في {options["output"]}'))
+        else:
+            self.stdout.write(report)
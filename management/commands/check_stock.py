@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory import reorder
+
+
+class Command(BaseCommand):
+    help = ('يحدّث معدلات الاستهلاك وأيام التغطية لكل المنتجات ويرسل للمدراء تنبيهاً بالمنتجات التي انخفض '
+            'مخزونها منذ آخر تنبيه (يُشغّل دورياً، مثلاً كل ساعة من cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='يعيد حساب المعدلات من جداول التجميع اليومية (للتهيئة الأولى).')
+        parser.add_argument('--no-alert', action='store_true', help='التحديث فقط دون إرسال تنبيهات.')
+
+    def handle(self, *args, **options):
+        low = reorder.rebuild() if options['rebuild'] else reorder.refresh()
+        self.stdout.write(f'منتجات منخفضة المخزون: {low}.')
+        if not options['no_alert']:
+            alerted = reorder.alert()
+            self.stdout.write(self.style.SUCCESS(f'تم التنبيه عن {alerted} منتج جديد.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import forecasting
+
+
+class Command(BaseCommand):
+    help = 'يتنبأ بالاستهلاك الشهري لكل المنتجات من التقارير الشهرية ويستبدل جدول التنبؤات (يحتاج numpy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', type=int, default=forecasting.HISTORY_MONTHS,
+                            help='عدد الأشهر المكتملة التي تُقرأ من التاريخ.')
+        parser.add_argument('--horizon', type=int, default=forecasting.HORIZON,
+                            help='عدد الأشهر المتنبأ بها بدءاً من الشهر الحالي.')
+        parser.add_argument('--batch-size', type=int, default=forecasting.BATCH_SIZE, help='عدد صفوف التنبؤ في كل دفعة كتابة.')
+
+    def handle(self, *args, **options):
+        if not forecasting.available():
+            raise CommandError('التنبؤ يحتاج مكتبة numpy (pip install numpy).')
+        if options['history'] < 1 or options['horizon'] < 1:
+            raise CommandError('--history و --horizon يجب أن يكونا 1 أو أكثر.')
+        products, timings = forecasting.run(history_months=options['history'], horizon=options['horizon'],
+                                            batch_size=options['batch_size'])
+        times = '، '.join(f'{name} {seconds:.2f}ث' for name, seconds in timings.items())
+        self.stdout.write(self.style.SUCCESS(f'تم التنبؤ لـ {products} منتج ({times}).'))
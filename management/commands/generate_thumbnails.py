@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory import catalogue, images
+from inventory.models import Product
+
+
+def _init_worker():
+    # في أنظمة spawn تبدأ العملية بلا Django مهيأ
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _generate(job):
+    """يعمل داخل العملية الفرعية: يقرأ ويكتب الملفات فقط، ولا يلمس قاعدة البيانات."""
+    pk, name = job
+    try:
+        return pk, images.generate(name), None
+    except Exception as exc: # ملف مفقود أو تالف لا يوقف بقية الدفعة
+        return pk, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'يولد الصور المصغرة لصور المنتجات الموجودة بالتوازي (مجموعة عمليات).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='عدد العمليات (0 للتنفيذ في نفس العملية).')
+        parser.add_argument('--all', action='store_true', help='إعادة التوليد حتى للمنتجات التي لها صور مصغرة.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(thumbnails={})
+        jobs = list(products.values_list('pk', 'image'))
+        if not jobs:
+            self.stdout.write('لا توجد صور بحاجة لصور مصغرة.')
+            return
+
+        if options['workers'] > 0:
+            # الاتصال المفتوح لا يُشارك مع العمليات الفرعية
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                results = list(pool.map(_generate, jobs, chunksize=8))
+        else:
+            results = [_generate(job) for job in jobs]
+
+        done = 0
+        for pk, thumbnails, error in results:
+            if error:
+                self.stderr.write(f'المنتج #{pk}: {error}')
+                continue
+            # update بدلاً من save حتى لا يُعاد فهرسة البحث لكل منتج
+            Product.objects.filter(pk=pk).update(thumbnails=thumbnails)
+            done += 1
+        catalogue.bump()
+        self.stdout.write(self.style.SUCCESS(f'تم توليد الصور المصغرة لـ {done} من {len(jobs)} منتج.'))
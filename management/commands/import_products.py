@@ -0,0 +1,42 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import imports
+
+
+class Command(BaseCommand):
+    help = ('يستورد المنتجات من ملف CSV أو JSON أو JSON Lines (إضافة أو تحديث بالاسم والفئة) على دفعات، '
+            'ويستأنف تلقائياً عملية سابقة غير مكتملة لنفس الملف.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='مسار الملف. الأعمدة: name, description, quantity, category, image.')
+        parser.add_argument('--format', choices=imports.FORMATS, help='صيغة الملف (الافتراضي حسب الامتداد).')
+        parser.add_argument('--chunk-size', type=int, default=imports.CHUNK_SIZE, help='عدد الصفوف في كل دفعة (معاملة).')
+        parser.add_argument('--workers', type=int, default=imports.IMAGE_WORKERS, help='عدد خيوط جلب الصور.')
+        parser.add_argument('--images-dir', help='مجلد الصور المحلية (الافتراضي مجلد الملف).')
+        parser.add_argument('--restart', action='store_true', help='البدء من الصف الأول حتى لو وُجدت عملية غير مكتملة.')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        try:
+            fmt = options['format'] or imports.detect_format(path)
+            with open(path, 'rb') as stream:
+                job = imports.start(path, imports.checksum(stream), fmt, restart=options['restart'])
+                if job.rows_done:
+                    self.stdout.write(f'استئناف العملية #{job.pk} بعد {job.rows_done} صف محفوظ.')
+
+                def progress(job, rate):
+                    self.stdout.write(f'{job.rows_done} صف: {job.created} جديد، {job.updated} محدث، '
+                                      f'{job.failed} مرفوض ({rate:.0f} صف/ث)')
+
+                imports.run(job, stream, base_dir=options['images_dir'] or os.path.dirname(path),
+                            chunk_size=options['chunk_size'], workers=options['workers'], progress=progress)
+        except (OSError, imports.ImportFailed) as exc:
+            raise CommandError(str(exc))
+
+        for error in job.errors:
+            self.stderr.write(f"الصف {error['row'] or '-'}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'اكتمل الاستيراد #{job.pk}: {job.created} جديد، {job.updated} محدث، {job.failed} مرفوض. '
+            'لتوليد الصور المصغرة للصور الجديدة: manage.py generate_thumbnails'))
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min, Max
+from django.utils import timezone
+
+from inventory import analytics
+from inventory.models import ConsumptionRecord
+
+
+class Command(BaseCommand):
+    help = 'يعيد بناء جداول تجميع الاستهلاك اليومية من سجلات الاستهلاك (للتعبئة الأولية أو بعد تعديل يدوي).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='أول يوم بصيغة YYYY-MM-DD (الافتراضي: أقدم سجل).')
+        parser.add_argument('--end', help='آخر يوم بصيغة YYYY-MM-DD (الافتراضي: أحدث سجل).')
+        parser.add_argument('--batch-size', type=int, default=2000, help='عدد الصفوف في كل دفعة.')
+
+    def handle(self, *args, **options):
+        bounds = ConsumptionRecord.objects.aggregate(first=Min('consumed_at'), last=Max('consumed_at'))
+        if bounds['first'] is None:
+            self.stdout.write('لا توجد سجلات استهلاك.')
+            return
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate(bounds['first'])
+            end = date.fromisoformat(options['end']) if options['end'] else timezone.localdate(bounds['last'])
+        except ValueError:
+            raise CommandError('صيغة التاريخ غير صحيحة (المتوقع YYYY-MM-DD).')
+
+        with transaction.atomic():
+            written = analytics.rebuild(start, end, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{start} → {end}: تمت كتابة {written} صف.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory import reports
+
+
+class Command(BaseCommand):
+    help = 'يعيد بناء التقارير الشهرية (Report) لشهر أو أكثر من سجلات الاستهلاك.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('months', nargs='*', help='الأشهر بصيغة YYYY-MM (الافتراضي: الشهر الحالي).')
+        parser.add_argument('--batch-size', type=int, default=2000, help='عدد الصفوف في كل دفعة قراءة/كتابة.')
+
+    def handle(self, *args, **options):
+        months = options['months'] or [reports.month_key()]
+        for month in months:
+            try:
+                reports.month_bounds(month)
+            except ValueError:
+                raise CommandError(f'صيغة الشهر غير صحيحة: {month} (المتوقع YYYY-MM).')
+            with transaction.atomic():
+                written = reports.rebuild_month(month, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{month}: تمت كتابة {written} صف.'))
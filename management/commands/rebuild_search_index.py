@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory import search
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = 'يعيد بناء فهرس البحث في المنتجات بالكامل.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'تمت فهرسة {Product.objects.count()} منتج.'))
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from inventory import jobs
+
+
+def _init_worker():
+    # في أنظمة spawn تبدأ العملية بلا Django مهيأ
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _process_worker(loop, interval):
+    """عامل في عملية فرعية (بلا حدث إيقاف: Ctrl+C يصلها مباشرة، ومهمتها الجارية تُستعاد بعد مهلة الحجز)."""
+    return jobs.work(loop, interval)
+
+
+def _thread_worker(loop, interval, stop):
+    try:
+        return jobs.work(loop, interval, stop)
+    finally:
+        # كل خيط يفتح اتصاله الخاص بقاعدة البيانات
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('ينفذ المهام في الخلفية (الموافقة الجماعية، الاستيراد، التصدير، الصور المصغرة، إعادة البناء) '
+            'بمجموعة خيوط أو عمليات: حتى ينفد الطابور، أو باستمرار مع --loop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=jobs.WORKERS, help='عدد المهام التي تُنفذ في وقت واحد.')
+        parser.add_argument('--processes', action='store_true',
+                            help='عمليات منفصلة بدلاً من الخيوط (للمهام التي تشغل المعالج، كالصور المصغرة والتنبؤ).')
+        parser.add_argument('--loop', action='store_true', help='الاستمرار في العمل وانتظار مهام جديدة.')
+        parser.add_argument('--interval', type=float, default=2.0, help='ثوانٍ الانتظار عندما لا توجد مهام (مع --loop).')
+        parser.add_argument('--retain-days', type=int, default=jobs.RETAIN_DAYS,
+                            help='حذف المهام المنتهية الأقدم من هذا عند البدء (0 يوقف الحذف).')
+
+    def handle(self, *args, **options):
+        if options['retain_days']:
+            deleted = jobs.purge(timezone.now() - timedelta(days=options['retain_days']))
+            if deleted:
+                self.stdout.write(f'تم حذف {deleted} مهمة منتهية قديمة.')
+
+        workers = max(1, options['workers'])
+        loop, interval = options['loop'], options['interval']
+        if options['processes']:
+            # الاتصال المفتوح لا يُشارك مع العمليات الفرعية
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [pool.submit(_process_worker, loop, interval) for _ in range(workers)]
+                done = sum(future.result() for future in futures)
+        else:
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_thread_worker, loop, interval, stop) for _ in range(workers)]
+                try:
+                    done = sum(future.result() for future in futures)
+                except KeyboardInterrupt:
+                    self.stdout.write('إيقاف بعد انتهاء المهام الجارية...')
+                    stop.set()
+                    done = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f'تم تنفيذ {done} مهمة.'))
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import seeding
+
+
+class Command(BaseCommand):
+    help = ('يولد بيانات تجريبية واقعية (مستخدمين، منتجات، سلال، طلبات، سجل استهلاك) بحجم إجمالي تقريبي '
+            '--size صف، ثم يعيد بناء التجميع والتقارير وفهرس البحث.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10_000, help='الحجم الإجمالي التقريبي بالصفوف (1000 إلى 10000000).')
+        parser.add_argument('--users', type=int, help='عدد المستخدمين (الافتراضي حسب الحجم).')
+        parser.add_argument('--products', type=int, help='عدد المنتجات (الافتراضي حسب الحجم).')
+        parser.add_argument('--carts', type=int, help='عدد بنود السلال (الافتراضي حسب الحجم).')
+        parser.add_argument('--orders', type=int, help='عدد الطلبات (الافتراضي حسب الحجم).')
+        parser.add_argument('--days', type=int, default=365, help='طول الفترة الزمنية للطلبات والاستهلاك بالأيام.')
+        parser.add_argument('--seed', type=int, default=0, help='بذرة المولد العشوائي.')
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE, help='عدد الصفوف في كل دفعة.')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='عدم إعادة بناء جداول التجميع والتقارير وفهرس البحث.')
+        parser.add_argument('--force', action='store_true', help='التوليد حتى لو كان DEBUG معطلاً.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('يبدو أن هذه بيئة إنتاج (DEBUG معطل)؛ استخدم --force للتوليد فعلاً.')
+        if options['size'] < 1 or options['days'] < 1:
+            raise CommandError('--size و --days يجب أن يكونا موجبين.')
+
+        started = time.perf_counter()
+
+        def progress(table, done, total):
+            self.stdout.write(f'{table}: {done}/{total} ({time.perf_counter() - started:.1f} ث)')
+
+        counts = seeding.seed(
+            options['size'], days=options['days'], seed=options['seed'], batch_size=options['batch_size'],
+            derived=not options['skip_derived'], progress=progress,
+            users=options['users'], products=options['products'], carts=options['carts'], orders=options['orders'],
+        )
+        summary = '، '.join(f'{table}: {count}' for table, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'تم التوليد في {time.perf_counter() - started:.1f} ث ({summary}). '
+            f'الدخول بـ {seeding.ADMIN_USERNAME} أو {seeding.USER_PREFIX}0000000 وكلمة المرور "{seeding.PASSWORD}".'))
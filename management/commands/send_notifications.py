@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import notifications
+
+
+class Command(BaseCommand):
+    help = 'يرسل رسائل الصندوق الصادر المستحقة على دفعات (مرة واحدة، أو باستمرار مع --loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='عدد الرسائل في كل دفعة (اتصال بريد واحد لكل دفعة).')
+        parser.add_argument('--loop', action='store_true', help='الاستمرار في العمل وانتظار رسائل جديدة.')
+        parser.add_argument('--interval', type=float, default=5.0, help='ثوانٍ الانتظار عندما لا توجد رسائل (مع --loop).')
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        while True:
+            sent, retried, dead = notifications.deliver(options['batch_size'])
+            for i, count in enumerate((sent, retried, dead)):
+                totals[i] += count
+            if sent or retried or dead:
+                self.stdout.write(f'أُرسلت {sent}، أُجلت {retried}، فشلت نهائياً {dead}.')
+                # الدفعة كانت ممتلئة على الأرجح؛ تابع مباشرة
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'المجموع: أُرسلت {totals[0]}، أُجلت {totals[1]}، فشلت نهائياً {totals[2]}.'))
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory import ledger
+
+
+class Command(BaseCommand):
+    help = ('يأخذ لقطة لكميات المخزون من دفتر الحركات (يُشغّل دورياً، مثلاً يومياً من cron) '
+            'ويرقق اللقطات الأقدم من INVENTORY_SNAPSHOT_RETAIN_DAYS إلى لقطة شهرية.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help='وقت اللقطة بصيغة ISO (الافتراضي: الآن).')
+        parser.add_argument('--backfill-days', type=int, default=0,
+                            help='يأخذ لقطات للأيام السابقة أيضاً (لدفتر قديم بلا لقطات).')
+        parser.add_argument('--every-hours', type=int, default=24, help='الفاصل بين لقطات --backfill-days.')
+        parser.add_argument('--retain-days', type=int, default=ledger.RETAIN_DAYS,
+                            help='اللقطات الأحدث من هذا تبقى كلها (0 يوقف الترقيق).')
+        parser.add_argument('--check', action='store_true',
+                            help='يتحقق فقط من تطابق الدفتر مع الكميات الحالية دون أخذ لقطة.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = ledger.drift()
+            for pk, (level, quantity) in list(drift.items())[:20]:
+                self.stdout.write(f'المنتج {pk}: الدفتر {level}، الكمية الحالية {quantity}')
+            if drift:
+                raise CommandError(f'{len(drift)} منتج لا يطابق دفترها كميتها الحالية.')
+            self.stdout.write(self.style.SUCCESS('الدفتر مطابق للكميات الحالية.'))
+            return
+
+        at = timezone.now()
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None:
+                raise CommandError(f'صيغة الوقت غير صحيحة: {options["at"]}')
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        if options['every_hours'] < 1:
+            raise CommandError('--every-hours يجب أن يكون 1 أو أكثر.')
+
+        if options['backfill_days']:
+            taken = ledger.backfill(at - timedelta(days=options['backfill_days']), at,
+                                    timedelta(hours=options['every_hours']))
+            self.stdout.write(self.style.SUCCESS(f'تم أخذ {taken} لقطة حتى {at:%Y-%m-%d %H:%M}.'))
+        else:
+            with transaction.atomic():
+                products = ledger.take_snapshot(at)
+            self.stdout.write(self.style.SUCCESS(f'لقطة {at:%Y-%m-%d %H:%M}: {products} منتج.'))
+
+        if options['retain_days']:
+            with transaction.atomic():
+                deleted = ledger.compact(timezone.now() - timedelta(days=options['retain_days']))
+            self.stdout.write(f'تم حذف {deleted} لقطة قديمة (تبقى لقطة شهرية).')
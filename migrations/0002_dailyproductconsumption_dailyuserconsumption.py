@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    """تعبئة جداول التجميع من سجلات الاستهلاك الموجودة."""
+    ConsumptionRecord = apps.get_model('inventory', 'ConsumptionRecord')
+    DailyProductConsumption = apps.get_model('inventory', 'DailyProductConsumption')
+    DailyUserConsumption = apps.get_model('inventory', 'DailyUserConsumption')
+
+    rows = (ConsumptionRecord.objects.order_by()
+            .annotate(day=TruncDate('consumed_at', tzinfo=timezone.get_current_timezone()))
+            .values('day', 'user_id', 'product_id').annotate(total=Sum('quantity'))
+            .iterator(chunk_size=2000))
+    per_product = {}
+    batch = []
+    for row in rows:
+        batch.append(DailyUserConsumption(day=row['day'], user_id=row['user_id'],
+                                          product_id=row['product_id'], quantity=row['total']))
+        key = (row['day'], row['product_id'])
+        per_product[key] = per_product.get(key, 0) + row['total']
+        if len(batch) >= 2000:
+            DailyUserConsumption.objects.bulk_create(batch)
+            batch = []
+    DailyUserConsumption.objects.bulk_create(batch)
+    DailyProductConsumption.objects.bulk_create(
+        [DailyProductConsumption(day=day, product_id=product_id, quantity=quantity)
+         for (day, product_id), quantity in per_product.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='الكمية المستهلكة')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'استهلاك يومي لمنتج',
+                'verbose_name_plural': 'الاستهلاك اليومي للمنتجات',
+                'unique_together': {('day', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyUserConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='الكمية المستهلكة')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product', verbose_name='المنتج')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'استهلاك يومي لمستخدم',
+                'verbose_name_plural': 'الاستهلاك اليومي للمستخدمين',
+                'unique_together': {('day', 'user', 'product')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
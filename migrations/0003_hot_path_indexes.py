@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_dailyproductconsumption_dailyuserconsumption'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consumptionrecord',
+            index=models.Index(fields=['-consumed_at', '-id'], name='consumption_consumed_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consumptionrecord',
+            index=models.Index(fields=['product', 'consumed_at'], name='consumption_product_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consumptionrecord',
+            index=models.Index(fields=['user', 'consumed_at'], name='consumption_user_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name'], name='product_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['quantity', 'name'], name='product_quantity_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['-created_at', '-id'], name='report_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['month', 'product'], name='report_month_product_idx'),
+        ),
+    ]
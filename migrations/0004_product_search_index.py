@@ -0,0 +1,67 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# نسخة مجمدة من تطبيع search.py كما كان عند إنشاء الفهرس، حتى لا يتغير ناتج الترحيل مع تعديل الوحدة لاحقاً
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_TOKEN = re.compile(r'\w+')
+_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+
+def document(text):
+    """النص كما يُخزن في الفهرس (مطابق لـ search.document وقت كتابة الترحيل)."""
+    text = _DIACRITICS.sub('', unicodedata.normalize('NFKC', text or '').lower()).translate(_LETTERS)
+    tokens = []
+    for token in _TOKEN.findall(text):
+        for article in _ARTICLES:
+            if token.startswith(article) and len(token) - len(article) >= 3:
+                token = token[len(article):]
+                break
+        tokens.append(token)
+    return ' '.join(tokens)
+
+
+def create_fts_table(apps, schema_editor):
+    """جدول FTS5 لفهرس البحث في المنتجات (SQLite فقط؛ PostgreSQL يبحث بـ tsvector مباشرة)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_fts USING fts5('
+        'name, description, category, '
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    Product = apps.get_model('inventory', 'Product')
+    products = Product.objects.order_by('pk').values_list('pk', 'name', 'description', 'category')
+    insert = 'INSERT INTO inventory_product_fts (rowid, name, description, category) VALUES (%s, %s, %s, %s)'
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for pk, name, description, category in products.iterator(chunk_size=2000):
+            batch.append((pk, document(name), document(description), document(category)))
+            if len(batch) >= 2000:
+                cursor.executemany(insert, batch)
+                batch = []
+        cursor.executemany(insert, batch)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS inventory_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
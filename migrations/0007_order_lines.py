@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_to_lines(apps, schema_editor):
+    """كل طلب قديم (منتج واحد) يصبح رأس طلب ببند واحد بنفس المنتج والكمية."""
+    Order = apps.get_model('inventory', 'Order')
+    OrderLine = apps.get_model('inventory', 'OrderLine')
+    rows = Order.objects.order_by('pk').values_list('pk', 'product_id', 'quantity').iterator(chunk_size=2000)
+    batch = []
+    for order_id, product_id, quantity in rows:
+        batch.append(OrderLine(order_id=order_id, product_id=product_id, quantity=quantity))
+        if len(batch) >= 2000:
+            OrderLine.objects.bulk_create(batch)
+            batch = []
+    OrderLine.objects.bulk_create(batch)
+
+
+def copy_from_lines(apps, schema_editor):
+    """للتراجع: يعيد المنتج والكمية إلى رأس الطلب من أول بنوده (الطلبات متعددة البنود تفقد بقية البنود)."""
+    Order = apps.get_model('inventory', 'Order')
+    OrderLine = apps.get_model('inventory', 'OrderLine')
+    seen = set()
+    for line in OrderLine.objects.order_by('order_id', 'pk').iterator(chunk_size=2000):
+        if line.order_id not in seen:
+            seen.add(line.order_id)
+            Order.objects.filter(pk=line.order_id).update(product_id=line.product_id, quantity=line.quantity)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='الكمية المطلوبة')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.order', verbose_name='الطلب')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'بند طلب',
+                'verbose_name_plural': 'بنود الطلبات',
+                'unique_together': {('order', 'product')},
+            },
+        ),
+        # الحقول تصبح اختيارية قبل النسخ حتى يمكن التراجع عن الحذف ثم إعادة تعبئتها
+        migrations.AlterField(
+            model_name='order',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.product', verbose_name='المنتج'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='quantity',
+            field=models.PositiveIntegerField(null=True, verbose_name='الكمية المطلوبة'),
+        ),
+        migrations.RunPython(copy_to_lines, copy_from_lines),
+        migrations.RemoveField(
+            model_name='order',
+            name='product',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='quantity',
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def disambiguate_duplicates(apps, schema_editor):
+    """
+    المنتجات المكررة بنفس الاسم والفئة تمنع إضافة القيد الفريد؛ يبقى أقدمها باسمه،
+    ويُضاف لاسم البقية رقم المعرف (دون حذف أي منتج، فلها طلبات وسجلات مرتبطة).
+    """
+    Product = apps.get_model('inventory', 'Product')
+    duplicates = (Product.objects.values('category', 'name').annotate(n=Count('pk')).filter(n__gt=1)
+                  .values_list('category', 'name'))
+    for category, name in duplicates:
+        for product in Product.objects.filter(category=category, name=name).order_by('pk')[1:]:
+            suffix = f' ({product.pk})'
+            product.name = name[:100 - len(suffix)] + suffix
+            product.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_order_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, verbose_name='الملف')),
+                ('uploaded', models.BooleanField(default=False, verbose_name='مرفوع من اللوحة')),
+                ('checksum', models.CharField(db_index=True, max_length=64, verbose_name='بصمة المحتوى')),
+                ('format', models.CharField(max_length=10, verbose_name='الصيغة')),
+                ('status', models.CharField(choices=[('Running', 'قيد التنفيذ'), ('Done', 'اكتمل'), ('Failed', 'فشل')], default='Running', max_length=10, verbose_name='الحالة')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='الصفوف المعالجة')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='منتجات جديدة')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='منتجات محدثة')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='صفوف مرفوضة')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='الأخطاء')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الانتهاء')),
+            ],
+            options={
+                'verbose_name': 'استيراد منتجات',
+                'verbose_name_plural': 'عمليات استيراد المنتجات',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.RunPython(disambiguate_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_category_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('category', 'name'), name='product_category_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_balances(apps, schema_editor):
+    """الكميات الحالية تدخل الدفتر كحركة افتتاحية لكل منتج (التاريخ قبلها غير معروف فيُعد صفراً)."""
+    Product = apps.get_model('inventory', 'Product')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pk, kind='adjustment', delta=quantity, created_at=now, note='رصيد افتتاحي')
+        for pk, quantity in Product.objects.exclude(quantity=0).values_list('pk', 'quantity').iterator()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_product_import'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'استلام'), ('adjustment', 'تعديل'), ('consumption', 'استهلاك')], max_length=12, verbose_name='النوع')),
+                ('delta', models.IntegerField(verbose_name='التغير في الكمية')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='التاريخ')),
+                ('note', models.CharField(blank=True, max_length=200, verbose_name='ملاحظة')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.order', verbose_name='الطلب')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.product', verbose_name='المنتج')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'حركة مخزون',
+                'verbose_name_plural': 'حركات المخزون',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='movement_product_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='وقت اللقطة')),
+                ('quantity', models.IntegerField(verbose_name='الكمية')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'لقطة مخزون',
+                'verbose_name_plural': 'لقطات المخزون',
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='snapshot_product_taken_uniq')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
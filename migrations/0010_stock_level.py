@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def initial_levels(apps, schema_editor):
+    """مستوى لكل منتج بلا معدل استهلاك (الحد الأدنى فقط)؛ check_stock --rebuild يحسب المعدلات من التاريخ."""
+    Product = apps.get_model('inventory', 'Product')
+    StockLevel = apps.get_model('inventory', 'StockLevel')
+    threshold = getattr(settings, 'INVENTORY_LOW_STOCK_THRESHOLD', 5)
+    StockLevel.objects.bulk_create([
+        StockLevel(product_id=pk, threshold=threshold, is_low=quantity <= threshold,
+                   days_of_cover=0.0 if quantity <= 0 else None)
+        for pk, quantity in Product.objects.values_list('pk', 'quantity').iterator()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_level', serialize=False, to='inventory.product', verbose_name='المنتج')),
+                ('reorder_point', models.PositiveIntegerField(blank=True, null=True, verbose_name='حد إعادة الطلب')),
+                ('lead_time_days', models.PositiveIntegerField(blank=True, null=True, verbose_name='مدة التوريد (أيام)')),
+                ('velocity', models.FloatField(default=0, verbose_name='معدل الاستهلاك اليومي')),
+                ('window_day', models.DateField(blank=True, null=True, verbose_name='يوم الاستهلاك الجاري')),
+                ('window_units', models.PositiveIntegerField(default=0, verbose_name='استهلاك اليوم الجاري')),
+                ('threshold', models.PositiveIntegerField(default=0, verbose_name='الحد الفعلي')),
+                ('days_of_cover', models.FloatField(blank=True, null=True, verbose_name='أيام التغطية')),
+                ('is_low', models.BooleanField(default=False, verbose_name='مخزون منخفض')),
+                ('low_since', models.DateTimeField(blank=True, null=True, verbose_name='منخفض منذ')),
+                ('alerted_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر تنبيه')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+            ],
+            options={
+                'verbose_name': 'مستوى مخزون',
+                'verbose_name_plural': 'مستويات المخزون',
+                'indexes': [models.Index(condition=models.Q(('is_low', True)), fields=['days_of_cover'], name='stocklevel_low_cover_idx')],
+            },
+        ),
+        migrations.RunPython(initial_levels, migrations.RunPython.noop),
+    ]
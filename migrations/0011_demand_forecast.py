@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stock_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7, verbose_name='الشهر')),
+                ('quantity', models.FloatField(verbose_name='الاستهلاك المتوقع')),
+                ('method', models.CharField(choices=[('moving_average', 'متوسط متحرك'), ('seasonal', 'موسمي')], max_length=20, verbose_name='الطريقة')),
+                ('error', models.FloatField(verbose_name='متوسط الخطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ التنبؤ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='inventory.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'تنبؤ بالطلب',
+                'verbose_name_plural': 'التنبؤات بالطلب',
+                'indexes': [models.Index(fields=['month', '-quantity'], name='forecast_month_quantity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'month'), name='forecast_product_month_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('approve_orders', 'موافقة جماعية على الطلبات'), ('import_products', 'استيراد منتجات'), ('export', 'تصدير'), ('generate_thumbnails', 'توليد الصور المصغرة'), ('rebuild_reports', 'إعادة بناء التقارير الشهرية'), ('rebuild_analytics', 'إعادة بناء تحليلات الاستهلاك'), ('forecast_demand', 'التنبؤ بالطلب')], max_length=30, verbose_name='النوع')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='المعطيات')),
+                ('status', models.CharField(choices=[('Pending', 'بالانتظار'), ('Running', 'قيد التنفيذ'), ('Done', 'اكتملت'), ('Failed', 'فشلت'), ('Cancelled', 'أُلغيت')], default='Pending', max_length=10, verbose_name='الحالة')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='المنجز')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='الإجمالي')),
+                ('message', models.CharField(blank=True, max_length=200, verbose_name='المرحلة الحالية')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='النتيجة')),
+                ('error', models.TextField(blank=True, verbose_name='الخطأ')),
+                ('idempotency_key', models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='مفتاح منع التكرار')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='طُلب الإلغاء')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='محجوزة حتى')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الانتهاء')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='طلبها')),
+            ],
+            options={
+                'verbose_name': 'مهمة في الخلفية',
+                'verbose_name_plural': 'المهام في الخلفية',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='job_status_created_idx'), models.Index(fields=['-created_at', '-id'], name='job_recent_idx')],
+            },
+        ),
+    ]
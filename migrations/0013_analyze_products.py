@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def analyze_products(apps, schema_editor):
+    """
+    إحصاءات جدول المنتجات لمخطط SQLite: البحث يربط فهرس FTS بجدول المنتجات،
+    وبدون sqlite_stat1 يبدأ الاستعلام المصفّى بالفئة من فهرس الفئة ويطبّق MATCH على كل صف.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('ANALYZE inventory_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_background_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(analyze_products, migrations.RunPython.noop),
+    ]
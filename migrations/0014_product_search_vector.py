@@ -0,0 +1,49 @@
+from importlib import import_module
+
+from django.db import migrations
+
+# نفس النسخة المجمدة من التطبيع التي ملأت جدول FTS في SQLite
+document = import_module('inventory.migrations.0004_product_search_index').document
+
+VECTOR = ("setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+          "setweight(to_tsvector('simple', %s), 'C')")
+
+
+def add_search_vector(apps, schema_editor):
+    """
+    عمود tsvector مع فهرس GIN لبحث PostgreSQL (SQLite يستخدم جدول FTS5 من الترحيل 0004).
+    يُملأ من النص المطبّع (بلا أداة التعريف) كما يفعل PostgresSearchBackend.index عند كل حفظ.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE inventory_product ADD COLUMN search_vector tsvector')
+    Product = apps.get_model('inventory', 'Product')
+    products = Product.objects.order_by('pk').values_list('pk', 'name', 'category', 'description')
+    update = f'UPDATE inventory_product SET search_vector = {VECTOR} WHERE id = %s'
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for pk, name, category, description in products.iterator(chunk_size=2000):
+            batch.append((document(name), document(category), document(description), pk))
+            if len(batch) >= 2000:
+                cursor.executemany(update, batch)
+                batch = []
+        cursor.executemany(update, batch)
+    # الفهرس بعد التعبئة أسرع من تحديثه مع كل صف
+    schema_editor.execute(
+        'CREATE INDEX inventory_product_search_vector ON inventory_product USING GIN (search_vector)')
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE inventory_product DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_analyze_products'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -1,5 +1,8 @@
+import math
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     """
@@ -39,12 +42,32 @@ class Product(models.Model):
     description = models.TextField(blank=True, verbose_name="الوصف")
     quantity = models.IntegerField(default=0, verbose_name="الكمية المتاحة")
     image = models.ImageField(upload_to='products/', null=True, blank=True, verbose_name="صورة المنتج")
+    # الصور المصغرة المولدة من image (انظر images.py): {"200": {"webp": "...", "jpeg": "..."}}
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False, verbose_name="الصور المصغرة")
     category = models.CharField(max_length=50, default='medical_tools', verbose_name="الفئة")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإضافة")
 
     class Meta:
         verbose_name = "منتج"
         verbose_name_plural = "المنتجات"
+        constraints = [
+            # مفتاح الاستيراد الجماعي (upsert بالاسم والفئة، انظر imports.py)؛ فهرسه يخدم أيضاً
+            # تصفية لوحة المستخدم حسب الفئة مع الترتيب بالاسم
+            models.UniqueConstraint(fields=['category', 'name'], name='product_category_name_uniq'),
+        ]
+        indexes = [
+            # ترتيب قسم المنتجات في لوحة المدير حسب الاسم
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            # قائمة المخزون المنخفض (quantity <= الحد، مرتبة بالكمية)
+            models.Index(fields=['quantity', 'name'], name='product_quantity_name_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # الكمية كما قُرئت، حتى يُسجل فرقها في دفتر الحركات عند الحفظ (signals.py)
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
 
     def __str__(self):
         return self.name
@@ -68,7 +91,8 @@ class Cart(models.Model):
 
 class Order(models.Model):
     """
-    نموذج الطلب لتتبع الطلبات المقدمة من قبل المستخدمين.
+    رأس الطلب لتتبع الطلبات المقدمة من قبل المستخدمين.
+    المنتجات والكميات في بنود الطلب (OrderLine)؛ الموافقة والرفض والتتبع تتم على الطلب كاملاً.
     """
     STATUS_CHOICES = [
         ('Pending', 'معلق'),
@@ -77,8 +101,6 @@ class Order(models.Model):
     ]
 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="المستخدم")
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
-    quantity = models.PositiveIntegerField(verbose_name="الكمية المطلوبة")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending', verbose_name="حالة الطلب")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الطلب")
     approved_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الموافقة")
@@ -87,9 +109,38 @@ class Order(models.Model):
         verbose_name = "طلب"
         verbose_name_plural = "الطلبات"
         ordering = ['-created_at'] # ترتيب الطلبات من الأحدث للأقدم
+        indexes = [
+            # تتبع طلبات المستخدم: filter(user=...).order_by('-created_at')
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # الطلبات حسب الحالة (المعلقة أولاً في لوحة Django والموافقة الجماعية)
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            # قسم الطلبات في لوحة المدير (ترقيم بالمؤشر على created_at ثم id)
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"طلب #{self.id} من {self.user.username}"
+
+    @property
+    def total_quantity(self):
+        """مجموع كميات البنود (يستخدم البنود المجلوبة مسبقاً بـ prefetch_related إن وجدت)."""
+        return sum(line.quantity for line in self.lines.all())
+
+class OrderLine(models.Model):
+    """
+    بند في طلب: منتج واحد وكميته.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines', verbose_name="الطلب")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
+    quantity = models.PositiveIntegerField(verbose_name="الكمية المطلوبة")
+
+    class Meta:
+        verbose_name = "بند طلب"
+        verbose_name_plural = "بنود الطلبات"
+        unique_together = ('order', 'product')
 
     def __str__(self):
-        return f"طلب #{self.id} من {self.user.username} لـ {self.product.name}"
+        return f"{self.product.name} × {self.quantity}"
 
 class Report(models.Model):
     """
@@ -106,6 +157,11 @@ class Report(models.Model):
         verbose_name = "تقرير"
         verbose_name_plural = "التقارير"
         unique_together = ('user', 'month', 'product')
+        indexes = [
+            # قسم التقارير في لوحة المدير، وإعادة بناء شهر كامل
+            models.Index(fields=['-created_at', '-id'], name='report_created_id_idx'),
+            models.Index(fields=['month', 'product'], name='report_month_product_idx'),
+        ]
 
     def __str__(self):
         return f"تقرير {self.month} لـ {self.product.name} بواسطة {self.user.username}"
@@ -123,6 +179,305 @@ class ConsumptionRecord(models.Model):
         verbose_name = "سجل استهلاك"
         verbose_name_plural = "سجلات الاستهلاك"
         ordering = ['-consumed_at']
+        indexes = [
+            # قسم سجلات الاستهلاك في لوحة المدير ونطاقات التاريخ في إعادة بناء التجميعات
+            models.Index(fields=['-consumed_at', '-id'], name='consumption_consumed_id_idx'),
+            # التجميع حسب المنتج أو المستخدم خلال فترة
+            models.Index(fields=['product', 'consumed_at'], name='consumption_product_at_idx'),
+            models.Index(fields=['user', 'consumed_at'], name='consumption_user_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} استهلك {self.quantity} من {self.product.name}"
+
+class DailyProductConsumption(models.Model):
+    """
+    تجميع يومي للاستهلاك لكل منتج (لجميع المستخدمين).
+    يُحدّث تراكمياً عند كل موافقة، فاستعلامات التحليل تقرأ صفاً لكل يوم بدلاً من كل سجل استهلاك.
+    """
+    day = models.DateField(verbose_name="اليوم")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="الكمية المستهلكة")
+
+    class Meta:
+        verbose_name = "استهلاك يومي لمنتج"
+        verbose_name_plural = "الاستهلاك اليومي للمنتجات"
+        unique_together = ('day', 'product')
+
+    def __str__(self):
+        return f"{self.day} - {self.product.name}: {self.quantity}"
+
+class DailyUserConsumption(models.Model):
+    """
+    تجميع يومي للاستهلاك لكل (مستخدم، منتج).
+    """
+    day = models.DateField(verbose_name="اليوم")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, verbose_name="المستخدم")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="الكمية المستهلكة")
+
+    class Meta:
+        verbose_name = "استهلاك يومي لمستخدم"
+        verbose_name_plural = "الاستهلاك اليومي للمستخدمين"
+        unique_together = ('day', 'user', 'product')
+
+    def __str__(self):
+        return f"{self.day} - {self.user.username} - {self.product.name}: {self.quantity}"
+
+class Notification(models.Model):
+    """
+    صندوق صادر للرسائل (transactional outbox): يُكتب الصف داخل نفس معاملة التغيير الذي يسببه،
+    ويرسله أمر send_notifications لاحقاً، فلا ينتظر طلب المدير خادم البريد.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'بانتظار الإرسال'),
+        ('Sent', 'أُرسلت'),
+        ('Dead', 'فشلت نهائياً'),
+    ]
+
+    recipient = models.EmailField(verbose_name="المستلم")
+    subject = models.CharField(max_length=200, verbose_name="الموضوع")
+    body = models.TextField(verbose_name="النص")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending', verbose_name="الحالة")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="عدد المحاولات")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="موعد المحاولة التالية")
+    last_error = models.TextField(blank=True, verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الإرسال")
+
+    class Meta:
+        verbose_name = "إشعار"
+        verbose_name_plural = "الإشعارات"
+        indexes = [
+            # الرسائل المستحقة للإرسال: status='Pending' و next_attempt_at <= الآن
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.recipient} ({self.status})"
+
+class ProductImport(models.Model):
+    """
+    عملية استيراد منتجات جماعية (أمر import_products أو الرفع من لوحة Django).
+    rows_done يُحدّث في نفس معاملة كل دفعة، فالاستئناف يبدأ بعد آخر دفعة محفوظة.
+    """
+    STATUS_CHOICES = [
+        ('Running', 'قيد التنفيذ'),
+        ('Done', 'اكتمل'),
+        ('Failed', 'فشل'),
+    ]
+
+    source = models.CharField(max_length=500, verbose_name="الملف")
+    # الملف المرفوع يُحفظ في التخزين الافتراضي، وملف الأمر يُقرأ من مساره على الخادم
+    uploaded = models.BooleanField(default=False, verbose_name="مرفوع من اللوحة")
+    checksum = models.CharField(max_length=64, db_index=True, verbose_name="بصمة المحتوى")
+    format = models.CharField(max_length=10, verbose_name="الصيغة")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Running', verbose_name="الحالة")
+    rows_done = models.PositiveIntegerField(default=0, verbose_name="الصفوف المعالجة")
+    created = models.PositiveIntegerField(default=0, verbose_name="منتجات جديدة")
+    updated = models.PositiveIntegerField(default=0, verbose_name="منتجات محدثة")
+    failed = models.PositiveIntegerField(default=0, verbose_name="صفوف مرفوضة")
+    # أول الأخطاء فقط: [{"row": رقم صف البيانات (بدون سطر العناوين) أو null، "errors": ...}]
+    errors = models.JSONField(default=list, blank=True, verbose_name="الأخطاء")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ البدء")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الانتهاء")
+
+    class Meta:
+        verbose_name = "استيراد منتجات"
+        verbose_name_plural = "عمليات استيراد المنتجات"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()})"
+
+
+class StockMovement(models.Model):
+    """
+    دفتر حركات المخزون (إضافة فقط، لا تعديل ولا حذف): كل تغيير على Product.quantity حركة بإشارة الفرق.
+    الكمية في أي لحظة = آخر لقطة قبلها (StockSnapshot) + مجموع الحركات بعد اللقطة (انظر ledger.py).
+    """
+    RECEIPT = 'receipt'
+    ADJUSTMENT = 'adjustment'
+    CONSUMPTION = 'consumption'
+    KIND_CHOICES = [
+        (RECEIPT, 'استلام'),
+        (ADJUSTMENT, 'تعديل'),
+        (CONSUMPTION, 'استهلاك'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements', verbose_name="المنتج")
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES, verbose_name="النوع")
+    delta = models.IntegerField(verbose_name="التغير في الكمية")
+    # ليس auto_now_add حتى يمكن تسجيل حركات بتاريخها (الاستيراد، التعبئة الأولية)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="التاريخ")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="الطلب")
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="المستخدم")
+    note = models.CharField(max_length=200, blank=True, verbose_name="ملاحظة")
+
+    class Meta:
+        verbose_name = "حركة مخزون"
+        verbose_name_plural = "حركات المخزون"
+        indexes = [
+            # مجموع حركات منتج بين لقطة وتاريخ (ledger.levels_at)
+            models.Index(fields=['product', 'created_at'], name='movement_product_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.delta:+d} ({self.get_kind_display()})"
+
+
+class StockSnapshot(models.Model):
+    """لقطة مضغوطة: كمية المنتج عند taken_at كما يحسبها دفتر الحركات (أمر snapshot_stock)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='snapshots', verbose_name="المنتج")
+    taken_at = models.DateTimeField(verbose_name="وقت اللقطة")
+    quantity = models.IntegerField(verbose_name="الكمية")
+
+    class Meta:
+        verbose_name = "لقطة مخزون"
+        verbose_name_plural = "لقطات المخزون"
+        constraints = [
+            # فهرسه يخدم البحث عن آخر لقطة للمنتج قبل تاريخ
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='snapshot_product_taken_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
+
+
+class StockLevel(models.Model):
+    """
+    حالة إعادة الطلب لكل منتج (reorder.py): معدل الاستهلاك اليومي بمتوسط متحرك أسي (EWMA) يُحدّث
+    تراكمياً مع كل موافقة، وأيام التغطية وعلامة المخزون المنخفض محسوبة مسبقاً لقراءتها باستعلام واحد.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='stock_level', verbose_name="المنتج")
+    # حدود خاصة بالمنتج؛ الفارغ يعني الحساب من معدل الاستهلاك والإعدادات العامة
+    reorder_point = models.PositiveIntegerField(null=True, blank=True, verbose_name="حد إعادة الطلب")
+    lead_time_days = models.PositiveIntegerField(null=True, blank=True, verbose_name="مدة التوريد (أيام)")
+    # المتوسط حتى نهاية اليوم السابق لـ window_day، واستهلاك window_day نفسه حتى الآن
+    velocity = models.FloatField(default=0, verbose_name="معدل الاستهلاك اليومي")
+    window_day = models.DateField(null=True, blank=True, verbose_name="يوم الاستهلاك الجاري")
+    window_units = models.PositiveIntegerField(default=0, verbose_name="استهلاك اليوم الجاري")
+    threshold = models.PositiveIntegerField(default=0, verbose_name="الحد الفعلي")
+    # فارغ عندما لا يوجد استهلاك (تغطية غير محدودة)
+    days_of_cover = models.FloatField(null=True, blank=True, verbose_name="أيام التغطية")
+    is_low = models.BooleanField(default=False, verbose_name="مخزون منخفض")
+    low_since = models.DateTimeField(null=True, blank=True, verbose_name="منخفض منذ")
+    alerted_at = models.DateTimeField(null=True, blank=True, verbose_name="آخر تنبيه")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    class Meta:
+        verbose_name = "مستوى مخزون"
+        verbose_name_plural = "مستويات المخزون"
+        indexes = [
+            # لوحة المدير والتنبيهات: فهرس جزئي للمنخفضة فقط (قليلة) بترتيب أيام التغطية
+            models.Index(fields=['days_of_cover'], name='stocklevel_low_cover_idx', condition=models.Q(is_low=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.days_of_cover if self.days_of_cover is not None else '∞'} يوم"
+
+
+class DemandForecast(models.Model):
+    """
+    الاستهلاك المتوقع لمنتج في شهر قادم (أمر forecast_demand، انظر forecasting.py).
+    الجدول يحمل نتيجة آخر تشغيل فقط؛ error متوسط الخطأ المطلق للطريقة المختارة على آخر أشهر التاريخ.
+    """
+    MOVING_AVERAGE = 'moving_average'
+    SEASONAL = 'seasonal'
+    METHOD_CHOICES = [
+        (MOVING_AVERAGE, 'متوسط متحرك'),
+        (SEASONAL, 'موسمي'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='forecasts', verbose_name="المنتج")
+    month = models.CharField(max_length=7, verbose_name="الشهر")  # Format: YYYY-MM
+    quantity = models.FloatField(verbose_name="الاستهلاك المتوقع")
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, verbose_name="الطريقة")
+    error = models.FloatField(verbose_name="متوسط الخطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ التنبؤ")
+
+    class Meta:
+        verbose_name = "تنبؤ بالطلب"
+        verbose_name_plural = "التنبؤات بالطلب"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'month'], name='forecast_product_month_uniq'),
+        ]
+        indexes = [
+            # لوحة المدير: الأعلى طلباً في الشهر
+            models.Index(fields=['month', '-quantity'], name='forecast_month_quantity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} {self.month}: {self.quantity:.1f}"
+
+    @property
+    def shortfall(self):
+        """ما يلزم شراؤه لتغطية الشهر بالكمية الحالية (صفر إن كانت كافية)."""
+        return max(0, math.ceil(self.quantity) - self.product.quantity)
+
+
+class Job(models.Model):
+    """
+    مهمة في الخلفية (jobs.py): عملية ثقيلة يطلبها المدير وينفذها أمر run_workers خارج الطلب.
+    locked_until مهلة حجز العامل المنفذ، تُجدد مع كل تقدم؛ بعد انتهائها تُستعاد المهمة من عامل آخر.
+    """
+    KIND_CHOICES = [
+        ('approve_orders', 'موافقة جماعية على الطلبات'),
+        ('import_products', 'استيراد منتجات'),
+        ('export', 'تصدير'),
+        ('generate_thumbnails', 'توليد الصور المصغرة'),
+        ('rebuild_reports', 'إعادة بناء التقارير الشهرية'),
+        ('rebuild_analytics', 'إعادة بناء تحليلات الاستهلاك'),
+        ('forecast_demand', 'التنبؤ بالطلب'),
+    ]
+    STATUS_CHOICES = [
+        ('Pending', 'بالانتظار'),
+        ('Running', 'قيد التنفيذ'),
+        ('Done', 'اكتملت'),
+        ('Failed', 'فشلت'),
+        ('Cancelled', 'أُلغيت'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="النوع")
+    params = models.JSONField(default=dict, blank=True, verbose_name="المعطيات")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending', verbose_name="الحالة")
+    progress = models.PositiveIntegerField(default=0, verbose_name="المنجز")
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name="الإجمالي")
+    message = models.CharField(max_length=200, blank=True, verbose_name="المرحلة الحالية")
+    result = models.JSONField(default=dict, blank=True, verbose_name="النتيجة")
+    error = models.TextField(blank=True, verbose_name="الخطأ")
+    # نفس المفتاح (مثل إعادة إرسال النموذج نفسه) يعيد المهمة الموجودة ولا ينشئ أخرى
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name="مفتاح منع التكرار")
+    cancel_requested = models.BooleanField(default=False, verbose_name="طُلب الإلغاء")
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='jobs', verbose_name="طلبها")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="عدد المحاولات")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="محجوزة حتى")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="تاريخ الإنشاء")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ البدء")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الانتهاء")
+
+    class Meta:
+        verbose_name = "مهمة في الخلفية"
+        verbose_name_plural = "المهام في الخلفية"
+        indexes = [
+            # العمال: المنتظرة بترتيب الوصول، والجارية التي انتهت مهلة حجزها
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            # لوحة المدير: الأحدث أولاً
+            models.Index(fields=['-created_at', '-id'], name='job_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_kind_display()} ({self.get_status_display()})"
+
+    @property
+    def active(self):
+        return self.status in ('Pending', 'Running')
+
+    @property
+    def percent(self):
+        """نسبة الإنجاز، أو None إن كان الإجمالي غير معروف."""
+        if not self.total:
+            return 100 if self.status == 'Done' else None
+        return min(100, self.progress * 100 // self.total)
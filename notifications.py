@@ -0,0 +1,136 @@
+"""
+إشعارات البريد عبر صندوق صادر (Notification).
+العروض وخدمة المخزون تضيف الرسائل بـ enqueue داخل معاملتها، فإما أن يُحفظ التغيير والرسالة معاً أو لا شيء.
+أمر send_notifications يرسل الرسائل المستحقة على دفعات عبر اتصال SMTP واحد لكل دفعة،
+والرسالة الفاشلة يُعاد جدولتها بتأخير متزايد حتى MAX_ATTEMPTS ثم تُعلّم كفاشلة نهائياً (Dead).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+MAX_ATTEMPTS = getattr(settings, 'INVENTORY_NOTIFICATION_MAX_ATTEMPTS', 5)
+# التأخير قبل المحاولة n هو BACKOFF * 2^(n-1) ثوانٍ، بحد أقصى MAX_BACKOFF
+BACKOFF = getattr(settings, 'INVENTORY_NOTIFICATION_BACKOFF', 60)
+MAX_BACKOFF = getattr(settings, 'INVENTORY_NOTIFICATION_MAX_BACKOFF', 3600)
+# مدة حجز الدفعة لعامل واحد حتى لا يرسلها عامل آخر في نفس الوقت
+LEASE = getattr(settings, 'INVENTORY_NOTIFICATION_LEASE', 300)
+
+SIGNATURE = "\n\nمع خالص التقدير,\nفريق إدارة المخزون"
+
+
+def _message(recipient, subject, body):
+    return Notification(recipient=recipient, subject=subject, body=body + SIGNATURE)
+
+
+def enqueue(messages):
+    """يحفظ الرسائل (قائمة Notification غير محفوظة) في الصندوق الصادر باستعلام واحد، متجاهلاً من ليس له بريد."""
+    messages = [message for message in messages if message.recipient]
+    if messages:
+        Notification.objects.bulk_create(messages)
+    return messages
+
+
+def user_approved(user):
+    return _message(
+        user.email, 'تمت الموافقة على حسابك ✅',
+        f"مرحباً {user.username},\n\nتهانينا، تمت الموافقة على حسابك في نظام إدارة المخزون. "
+        "يمكنك الآن تسجيل الدخول والبدء في استخدام النظام.")
+
+
+def user_rejected(username, email):
+    return _message(
+        email, 'طلب حسابك مرفوض ❌',
+        f"مرحباً {username},\n\nنأسف لإبلاغك أن طلب حسابك في نظام إدارة المخزون قد تم رفضه.")
+
+
+def _lines(order):
+    return '\n'.join(f"- {line.product.name}: {line.quantity}" for line in order.lines.all())
+
+
+def order_approved(order):
+    return _message(
+        order.user.email, 'طلبك تمت الموافقة عليه ✅',
+        f"مرحباً {order.user.username},\n\nتمت الموافقة على طلبك رقم {order.pk}:\n{_lines(order)}\n\n"
+        "يمكنك الآن استلام طلبك من المخزن. يرجى التنسيق مع إدارة المخزن لتحديد موعد الاستلام.")
+
+
+def order_rejected(order):
+    return _message(
+        order.user.email, 'طلبك مرفوض ❌',
+        f"مرحباً {order.user.username},\n\nنأسف لإبلاغك أن طلبك رقم {order.pk} قد تم رفضه:\n{_lines(order)}\n\n"
+        "لأي استفسارات، يرجى التواصل مع إدارة المخزون.")
+
+
+def low_stock(admin, levels, total):
+    """رسالة واحدة بالمنتجات التي انخفض مخزونها (levels: StockLevel مع product، وtotal عددها الكلي)."""
+    cover = lambda level: 'نفد' if level.days_of_cover == 0 else (
+        'بلا استهلاك' if level.days_of_cover is None else f'{level.days_of_cover:g} يوم')
+    rows = '\n'.join(f"- {level.product.name}: {level.product.quantity} (الحد {level.threshold}، التغطية {cover(level)})"
+                     for level in levels)
+    more = f"\n... و{total - len(levels)} منتج آخر." if total > len(levels) else ''
+    return _message(
+        admin.email, f'تنبيه مخزون منخفض: {total} منتج ⚠️',
+        f"مرحباً {admin.username},\n\nالمنتجات التالية وصلت إلى حد إعادة الطلب أو أقل:\n{rows}{more}")
+
+
+def backoff(attempts):
+    """التأخير قبل المحاولة التالية بعد attempts محاولة فاشلة."""
+    return timedelta(seconds=min(MAX_BACKOFF, BACKOFF * 2 ** (attempts - 1)))
+
+
+def _claim(batch_size, now):
+    """يحجز دفعة من الرسائل المستحقة بتأجيل موعدها مدة LEASE، ويعيدها."""
+    with transaction.atomic():
+        due = Notification.objects.filter(status='Pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'pk')
+        ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return []
+        Notification.objects.filter(pk__in=ids).update(next_attempt_at=now + timedelta(seconds=LEASE))
+    return list(Notification.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def deliver(batch_size=100):
+    """
+    يرسل دفعة واحدة من الرسائل المستحقة ويعيد (عدد المرسلة، عدد المؤجلة، عدد الفاشلة نهائياً).
+    اتصال البريد يُفتح مرة واحدة للدفعة كلها.
+    """
+    now = timezone.now()
+    batch = _claim(batch_size, now)
+    if not batch:
+        return 0, 0, 0
+
+    sent, failed = [], []
+    from_email = getattr(settings, 'EMAIL_HOST_USER', None) or settings.DEFAULT_FROM_EMAIL
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for notification in batch:
+                try:
+                    EmailMessage(notification.subject, notification.body, from_email, [notification.recipient],
+                                 connection=connection).send()
+                    sent.append(notification)
+                except Exception as exc:
+                    failed.append((notification, exc))
+    except Exception as exc: # تعذر فتح الاتصال (أو إغلاقه) فكل ما لم يُرسل يُعاد جدولته
+        done = {n.pk for n in sent} | {n.pk for n, _ in failed}
+        failed.extend((notification, exc) for notification in batch if notification.pk not in done)
+
+    if sent:
+        Notification.objects.filter(pk__in=[n.pk for n in sent]).update(
+            status='Sent', sent_at=timezone.now(), last_error='')
+    dead = 0
+    for notification, exc in failed:
+        notification.attempts += 1
+        notification.last_error = f'{type(exc).__name__}: {exc}'
+        if notification.attempts >= MAX_ATTEMPTS:
+            notification.status = 'Dead'
+            dead += 1
+        else:
+            notification.next_attempt_at = now + backoff(notification.attempts)
+        notification.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return len(sent), len(failed) - dead, dead
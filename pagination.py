@@ -0,0 +1,90 @@
+"""
+ترقيم الصفحات بطريقة المؤشر (keyset) بدلاً من OFFSET.
+المؤشر يحمل قيم أعمدة الترتيب لآخر صف في الصفحة، فتبقى كلفة جلب أي صفحة ثابتة مهما كبر الجدول.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """يُرفع عند تمرير مؤشر تالف أو لا يطابق أعمدة الترتيب."""
+
+
+def _split(field):
+    """يفصل اسم الحقل عن اتجاه الترتيب ('-created_at' -> ('created_at', True))."""
+    if field.startswith('-'):
+        return field[1:], True
+    return field, False
+
+
+def encode_cursor(values):
+    """يحول قيم أعمدة الترتيب إلى نص آمن للاستخدام في الروابط."""
+    raw = json.dumps([str(v) for v in values], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    """يعيد قيم المؤشر بعد تحويلها إلى أنواع حقول النموذج المناسبة."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError) as exc:
+        raise InvalidCursor('مؤشر غير صالح.') from exc
+    if not isinstance(raw, list) or len(raw) != len(ordering):
+        raise InvalidCursor('المؤشر لا يطابق أعمدة الترتيب.')
+    values = []
+    for field, value in zip(ordering, raw):
+        name, _ = _split(field)
+        try:
+            values.append(model._meta.get_field(name).to_python(value))
+        except ValidationError as exc:
+            raise InvalidCursor('مؤشر غير صالح.') from exc
+    return values
+
+
+def _after(ordering, values):
+    """يبني شرط "بعد هذا الصف" لترتيب متعدد الأعمدة."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name, descending = _split(field)
+        step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{_split(prev_field)[0]: prev_value})
+        condition |= step
+    return condition
+
+
+def _page_queryset(queryset, ordering, cursor, page_size):
+    """الاستعلام الذي يجلب صفحة واحدة وصفاً إضافياً يكشف وجود صفحة تالية."""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(queryset.model, ordering, cursor)
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset[:page_size + 1]
+
+
+def _paginate(items, ordering, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, _split(f)[0]) for f in ordering])
+    return items, next_cursor
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=25):
+    """
+    يعيد (items, next_cursor) لصفحة واحدة من queryset مرتبة حسب ordering.
+    يجب أن ينتهي ordering بحقل فريد (عادة id) حتى يكون الترتيب حتمياً.
+    """
+    return _paginate(list(_page_queryset(queryset, ordering, cursor, page_size)), ordering, page_size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=25):
+    """نسخة keyset_page للعروض غير المتزامنة (تجلب الصفحة بـ async for دون حجب حلقة الأحداث)."""
+    page = _page_queryset(queryset, ordering, cursor, page_size)
+    return _paginate([item async for item in page], ordering, page_size)
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.instrumentation.InstrumentationMiddleware', # قياس كل طلب (أولاً حتى يشمل بقية الوسطاء)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,7 +45,7 @@ ROOT_URLCONF = 'project.urls' # تأكد أن هذا يشير إلى ملف urls
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'inventory.instrumentation.InstrumentedTemplates', # DjangoTemplates مع قياس زمن الرسم
         'DIRS': [BASE_DIR /'templates'], # تم تحديث هذا السطر ليشير إلى مجلد القوالب الرئيسي
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,13 +65,66 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# ضبط SQLite للكتابة المتزامنة (انظر inventory/database.py): BEGIN IMMEDIATE لكل معاملة، مهلة انتظار القفل،
+# واتصالات دائمة بين الطلبات. PRAGMAS (WAL و synchronous=NORMAL ...) تُطبق عند فتح كل اتصال.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20, # ثوانٍ
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+INVENTORY_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'memory',
+}
+
+
+# Cache
+# ذاكرة الكتالوج (catalogue.py) تعمل مع أي واجهة تدعم add/incr؛ locmem لكل عملية،
+# ولعدة عمليات استخدم ذاكرة مشتركة، مثلاً:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory',
+    }
+}
+
+INVENTORY_CATALOGUE_TIMEOUT = 300
+
+
+# قياس الطلبات (inventory/instrumentation.py): المقاييس على /inventory/metrics/ بصيغة Prometheus،
+# وسطر JSON لكل طلب في العينة في سجل inventory.instrumentation.
+INVENTORY_METRICS_SAMPLE_RATE = 0.1
+INVENTORY_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'inventory.instrumentation': {'handlers': ['console'], 'level': 'WARNING'}},
+}
+
+
+# الجلسات من الذاكرة المؤقتة (مع حفظها في قاعدة البيانات)، والمستخدم المسجل من الذاكرة المؤقتة (inventory/auth.py):
+# الطلب المسجل لا يحتاج أي استعلام قبل العرض. مع عدة عمليات استخدم ذاكرة مشتركة (انظر CACHES).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['inventory.auth.CachedModelBackend']
+INVENTORY_USER_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,6 +173,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # إعدادات البريد الإلكتروني (لاستخدام Gmail كمثال)
 # ستحتاج إلى تمكين "Less secure app access" في حساب Gmail الخاص بك
 # أو استخدام "App Passwords" إذا كنت تستخدم التحقق بخطوتين.
+# الرسائل لا تُرسل من العروض مباشرة: تُكتب في جدول Notification ويرسلها `manage.py send_notifications --loop`.
+# للتطوير يمكن استخدام 'django.core.mail.backends.console.EmailBackend'.
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
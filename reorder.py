@@ -0,0 +1,201 @@
+"""
+محرك إعادة الطلب: معدل استهلاك كل منتج، أيام التغطية، والمخزون المنخفض في جدول StockLevel.
+
+- المعدل متوسط متحرك أسي (EWMA) للاستهلاك اليومي بنصف عمر HALF_LIFE_DAYS، يُحدّث تراكمياً:
+  الموافقة تضيف الكمية لاستهلاك اليوم الجاري (window_units)، وعند أول تحديث في يوم لاحق يُدمج اليوم
+  المكتمل في المتوسط وتُخفض قيمته للأيام التي مرت بلا استهلاك. لا يُقرأ السجل التاريخي إلا في rebuild
+  (التهيئة الأولى أو بعد تعديل البيانات يدوياً) ومن جداول التجميع اليومية.
+- الحد الفعلي = reorder_point الخاص بالمنتج إن وُجد، وإلا المعدل × (مدة التوريد + أيام الأمان)
+  بحد أدنى MIN_THRESHOLD. المنتج منخفض عندما كميته <= الحد.
+- أيام التغطية وعلامة الانخفاض تُحسب عند كل تغيير في الكمية (الموافقة، الحفظ، الاستيراد)
+  وعند refresh اليومي (أمر check_stock)، فلوحة المدير تقرأ المنخفض باستعلام واحد على الفهرس.
+- QuerySet.update على الكمية لا يمر من هنا؛ refresh التالي يصحح الحالة.
+"""
+
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CustomUser, DailyProductConsumption, Product, StockLevel
+from . import notifications
+
+HALF_LIFE_DAYS = getattr(settings, 'INVENTORY_REORDER_HALF_LIFE_DAYS', 14)
+# مدة التوريد الافتراضية وأيام الأمان الإضافية فوقها
+LEAD_TIME_DAYS = getattr(settings, 'INVENTORY_REORDER_LEAD_TIME_DAYS', 7)
+SAFETY_DAYS = getattr(settings, 'INVENTORY_REORDER_SAFETY_DAYS', 3)
+# الحد الأدنى للحد الفعلي (المنتج بلا استهلاك يُعد منخفضاً عند هذه الكمية)
+MIN_THRESHOLD = getattr(settings, 'INVENTORY_LOW_STOCK_THRESHOLD', 5)
+
+# وزن اليوم الأخير في المتوسط (نصف الوزن بعد HALF_LIFE_DAYS يوماً)
+ALPHA = 1 - 0.5 ** (1 / HALF_LIFE_DAYS)
+# المعدل الأصغر من هذا يُعد صفراً (تغطية غير محدودة)
+_MIN_VELOCITY = 1e-3
+_FIELDS = ['velocity', 'window_day', 'window_units', 'threshold', 'days_of_cover', 'is_low', 'low_since', 'alerted_at',
+           'updated_at']
+BATCH_SIZE = 500
+
+
+def advance(level, day):
+    """يدمج الأيام المكتملة قبل day في المتوسط (الأيام بلا استهلاك تخفضه)، ويبدأ يوم day فارغاً."""
+    if level.window_day is None:
+        level.window_day, level.window_units = day, 0
+        return
+    gap = (day - level.window_day).days
+    if gap <= 0:
+        return
+    level.velocity = (ALPHA * level.window_units + (1 - ALPHA) * level.velocity) * (1 - ALPHA) ** (gap - 1)
+    if level.velocity < _MIN_VELOCITY / 100:
+        level.velocity = 0.0
+    level.window_day, level.window_units = day, 0
+
+
+def evaluate(level, quantity, now):
+    """يحسب الحد الفعلي وأيام التغطية وعلامة الانخفاض للكمية quantity."""
+    velocity = level.velocity
+    lead_time = LEAD_TIME_DAYS if level.lead_time_days is None else level.lead_time_days
+    if level.reorder_point is not None:
+        level.threshold = level.reorder_point
+    else:
+        level.threshold = max(MIN_THRESHOLD, math.ceil(velocity * (lead_time + SAFETY_DAYS)))
+    if quantity <= 0:
+        level.days_of_cover = 0.0
+    else:
+        level.days_of_cover = round(quantity / velocity, 2) if velocity >= _MIN_VELOCITY else None
+    was_low = level.is_low
+    level.is_low = quantity <= level.threshold
+    if level.is_low and not was_low:
+        level.low_since = now
+    elif not level.is_low:
+        # المنتج الذي عاد فوق الحد يُنبه عنه من جديد إن انخفض مرة أخرى
+        level.low_since = level.alerted_at = None
+    level.updated_at = now
+
+
+def _save(levels):
+    """
+    يحفظ حقول _FIELDS للمستويات بجملة UPDATE واحدة مُعادة بـ executemany. bulk_update يبني تعبير
+    CASE لكل صف في كل حقل، وبناؤه في Python أبطأ بمئات المرات من التنفيذ نفسه لآلاف المنتجات.
+    """
+    fields = [StockLevel._meta.get_field(name) for name in _FIELDS]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(StockLevel._meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(StockLevel._meta.pk.column))
+    rows = [[field.get_db_prep_save(getattr(level, field.attname), connection) for field in fields] + [level.pk]
+            for level in levels]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _levels(product_ids):
+    """مستويات المنتجات (مقفلة للتعديل)، مع إنشاء الناقص منها."""
+    StockLevel.objects.bulk_create([StockLevel(product_id=pk) for pk in product_ids], ignore_conflicts=True)
+    return StockLevel.objects.select_for_update().in_bulk(product_ids)
+
+
+def record_consumption(now, consumed, remaining):
+    """
+    يضيف استهلاك الموافقة إلى المعدلات ويعيد تقييم المنتجات. consumed: {product_id: الكمية}،
+    remaining: {product_id: الكمية بعد الخصم}. يُستدعى داخل معاملة الموافقة نفسها.
+    """
+    today = timezone.localdate(now)
+    levels = _levels(list(consumed))
+    for product_id, quantity in consumed.items():
+        level = levels[product_id]
+        advance(level, today)
+        level.window_units += quantity
+        evaluate(level, remaining[product_id], now)
+    _save(levels.values())
+
+
+def update(quantities, now=None, reset=None):
+    """
+    يعيد تقييم المنتجات بكمياتها الجديدة ({product_id: الكمية}) بعد الحفظ أو الاستيراد. يعيد مستوياتها.
+    يُستدعى داخل معاملة (التعديل أو الاستيراد نفسه، أو refresh). reset(level) يضبط المعدل قبل التقييم (rebuild).
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    levels = _levels(list(quantities))
+    for product_id, quantity in quantities.items():
+        level = levels[product_id]
+        if reset:
+            reset(level)
+        advance(level, today)
+        evaluate(level, quantity, now)
+    _save(levels.values())
+    return levels
+
+
+def refresh(product_ids=None, now=None, batch_size=BATCH_SIZE, reset=None):
+    """
+    يقدّم المعدلات إلى اليوم ويعيد تقييم المنتجات (أو كلها) بكمياتها الحالية، على دفعات في معاملات قصيرة.
+    يعيد عدد المنتجات المنخفضة بينها.
+    """
+    now = now or timezone.now()
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    rows = products.order_by('pk').values_list('pk', 'quantity')
+    low = 0
+    last = 0
+    while True:
+        batch = dict(rows.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return low
+        with transaction.atomic():
+            low += sum(level.is_low for level in update(batch, now, reset).values())
+        last = max(batch)
+
+
+def rebuild(days=None, now=None):
+    """
+    يعيد حساب المعدلات من جداول التجميع اليومية لآخر days يوماً (الافتراضي ثمانية أنصاف عمر،
+    ما قبلها وزنه أقل من 0.4%)، ثم refresh. للتهيئة الأولى فقط؛ بعدها التحديث تراكمي.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    days = days or HALF_LIFE_DAYS * 8
+    velocity, window = {}, {}
+    daily = (DailyProductConsumption.objects.filter(day__gte=today - timedelta(days=days), day__lte=today)
+             .values_list('product_id', 'day', 'quantity'))
+    for product_id, day, quantity in daily.iterator(chunk_size=5000):
+        if day == today:
+            window[product_id] = window.get(product_id, 0) + quantity
+        else:
+            # اليوم المكتمل day وزنه ALPHA × (1 - ALPHA)^عدد الأيام بعده حتى أمس
+            age = (today - day).days - 1
+            velocity[product_id] = velocity.get(product_id, 0.0) + ALPHA * quantity * (1 - ALPHA) ** age
+
+    def reset(level):
+        level.velocity = velocity.get(level.pk, 0.0)
+        level.window_day, level.window_units = today, window.get(level.pk, 0)
+
+    return refresh(now=now, reset=reset)
+
+
+def low_stock(limit=10):
+    """المنتجات المنخفضة، الأقرب للنفاد أولاً (باستعلام واحد على الفهرس الجزئي للمنخفضة)."""
+    return (StockLevel.objects.filter(is_low=True).select_related('product')
+            .only('product_id', 'threshold', 'days_of_cover', 'velocity', 'product__name', 'product__quantity')
+            .order_by(F('days_of_cover').asc(nulls_last=True), 'product__quantity', 'product_id')[:limit])
+
+
+def alert(now=None, limit=200):
+    """
+    يرسل لكل مدير رسالة واحدة بالمنتجات التي أصبحت منخفضة منذ آخر تنبيه لها، ويعلّمها.
+    يعيد عدد المنتجات المنبه عنها.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        pending = StockLevel.objects.select_for_update().filter(is_low=True, alerted_at__isnull=True)
+        levels = list(pending.select_related('product').order_by(F('days_of_cover').asc(nulls_last=True), 'product_id'))
+        if not levels:
+            return 0
+        admins = CustomUser.objects.filter(is_admin=True, is_active=True).exclude(email='')
+        notifications.enqueue([notifications.low_stock(admin, levels[:limit], len(levels)) for admin in admins])
+        ids = [level.pk for level in levels]
+        for start in range(0, len(ids), BATCH_SIZE):
+            StockLevel.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(alerted_at=now)
+    return len(levels)
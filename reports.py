@@ -0,0 +1,104 @@
+"""
+تجميع التقارير الشهرية (Report) تراكمياً.
+صف واحد لكل (مستخدم، شهر، منتج) يُحدّث عند كل موافقة بـ consumed = consumed + n
+بدلاً من إنشاء صف جديد لكل موافقة.
+"""
+
+from datetime import date, datetime, time
+
+from django.db.models import Case, When, Value, F, Q, Sum, Exists, OuterRef, IntegerField, PositiveIntegerField
+from django.utils import timezone
+
+from .models import Product, Report, ConsumptionRecord
+
+# عدد المفاتيح في كل تحديث جماعي (يبقي عدد متغيرات SQL تحت حدود SQLite)
+UPSERT_CHUNK = 500
+
+
+def month_key(when=None):
+    """يعيد الشهر بصيغة YYYY-MM حسب التوقيت المحلي."""
+    return timezone.localdate(when).strftime('%Y-%m')
+
+
+def month_bounds(month):
+    """يعيد بداية الشهر وبداية الشهر التالي (بالتوقيت المحلي) لشهر بصيغة YYYY-MM."""
+    year, number = (int(part) for part in month.split('-'))
+    start = date(year, number, 1)
+    end = date(year + number // 12, number % 12 + 1, 1)
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.combine(start, time.min), tz),
+            timezone.make_aware(datetime.combine(end, time.min), tz))
+
+
+def record_consumption(month, consumed, remaining):
+    """
+    يضيف الاستهلاك إلى صفوف التقرير للشهر المحدد.
+    consumed: {(user_id, product_id): الكمية}، remaining: {product_id: الكمية المتبقية بعد الخصم}.
+    يجب استدعاؤها داخل معاملة الموافقة نفسها.
+    """
+    keys = list(consumed)
+    for i in range(0, len(keys), UPSERT_CHUNK):
+        chunk = keys[i:i + UPSERT_CHUNK]
+        # إنشاء الصفوف الناقصة بقيمة صفر، ثم زيادة الجميع بتحديث ذري واحد
+        Report.objects.bulk_create(
+            [Report(user_id=user_id, month=month, product_id=product_id, consumed=0, remaining=remaining[product_id])
+             for user_id, product_id in chunk],
+            ignore_conflicts=True,
+        )
+        match = Q()
+        for user_id, product_id in chunk:
+            match |= Q(user_id=user_id, product_id=product_id)
+        Report.objects.filter(match, month=month).update(
+            consumed=F('consumed') + Case(
+                *[When(user_id=user_id, product_id=product_id, then=Value(consumed[(user_id, product_id)]))
+                  for user_id, product_id in chunk],
+                output_field=PositiveIntegerField(),
+            ),
+            remaining=Case(
+                *[When(product_id=product_id, then=Value(remaining[product_id]))
+                  for product_id in {product_id for _, product_id in chunk}],
+                output_field=IntegerField(),
+            ),
+        )
+
+
+def rebuild_month(month, batch_size=2000):
+    """
+    يعيد بناء تقارير شهر كامل من ConsumptionRecord.
+    المجاميع تُحسب في قاعدة البيانات وتُقرأ وتُكتب على دفعات، فالذاكرة لا تعتمد على حجم السجل.
+    الكمية المتبقية للصفوف الجديدة تؤخذ من المخزون الحالي، والصفوف الموجودة تحتفظ بقيمتها.
+    يعيد عدد الصفوف المكتوبة.
+    """
+    start, end = month_bounds(month)
+    records = ConsumptionRecord.objects.filter(consumed_at__gte=start, consumed_at__lt=end)
+    totals = (records.order_by().values('user_id', 'product_id')
+              .annotate(total=Sum('quantity')).order_by('user_id', 'product_id')
+              .iterator(chunk_size=batch_size))
+
+    written = 0
+    batch = []
+    for row in totals:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            written += _write_batch(month, batch)
+            batch = []
+    if batch:
+        written += _write_batch(month, batch)
+
+    # حذف صفوف لم يعد لها أي استهلاك في هذا الشهر
+    Report.objects.filter(month=month).exclude(Exists(records.filter(
+        user_id=OuterRef('user_id'), product_id=OuterRef('product_id')))).delete()
+    return written
+
+
+def _write_batch(month, rows):
+    stock = dict(Product.objects.filter(pk__in={row['product_id'] for row in rows}).values_list('pk', 'quantity'))
+    Report.objects.bulk_create(
+        [Report(user_id=row['user_id'], month=month, product_id=row['product_id'],
+                consumed=row['total'], remaining=stock.get(row['product_id'], 0))
+         for row in rows],
+        update_conflicts=True,
+        unique_fields=['user', 'month', 'product'],
+        update_fields=['consumed'],
+    )
+    return len(rows)
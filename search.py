@@ -0,0 +1,195 @@
+"""
+البحث في المنتجات (الاسم، الوصف، الفئة) بفهرس نصي كامل.
+الواجهة الخلفية قابلة للاستبدال عبر الإعداد INVENTORY_SEARCH_BACKEND، والافتراضي حسب قاعدة البيانات:
+SQLite FTS5، أو tsvector في PostgreSQL، أو icontains لغيرهما.
+النص يُطبّع قبل الفهرسة وقبل البحث (الهمزات، التاء المربوطة، الألف المقصورة، التشكيل والتطويل، وأداة التعريف).
+"""
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+# التشكيل وعلامات القرآن والتطويل تُحذف
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+# صور الحرف الواحدة تُوحّد
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_TOKEN = re.compile(r'\w+')
+_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+
+def normalize(text):
+    """يطبّع النص العربي (والإنجليزي) للفهرسة والمطابقة."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _DIACRITICS.sub('', text).translate(_LETTERS)
+
+
+def tokenize(text):
+    """يقسم النص المطبّع إلى كلمات بعد حذف أداة التعريف ("ال" وما يسبقها) من الكلمات الطويلة."""
+    tokens = []
+    for token in _TOKEN.findall(normalize(text)):
+        for article in _ARTICLES:
+            if token.startswith(article) and len(token) - len(article) >= 3:
+                token = token[len(article):]
+                break
+        tokens.append(token)
+    return tokens
+
+
+def document(text):
+    """النص كما يُخزن في الفهرس."""
+    return ' '.join(tokenize(text))
+
+
+def _batches(batch_size):
+    """المنتجات بالحقول المفهرسة على دفعات بنطاقات المعرف (لا مؤشر قراءة مفتوح أثناء الكتابة في نفس الاتصال)."""
+    products = Product.objects.only('id', 'name', 'description', 'category').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+class SearchBackend:
+    """الواجهة المشتركة لكل واجهات البحث."""
+
+    def search(self, queryset, query):
+        """يعيد queryset مقيداً بالمنتجات المطابقة ومرتباً حسب الصلة."""
+        raise NotImplementedError
+
+    def index(self, products):
+        """يضيف المنتجات المعطاة إلى الفهرس أو يحدثها."""
+
+    def remove(self, product_ids):
+        """يحذف المنتجات من الفهرس."""
+
+    def rebuild(self):
+        """يعيد بناء الفهرس بالكامل من جدول المنتجات."""
+
+
+class IContainsBackend(SearchBackend):
+    """بحث بسيط بدون فهرس (مسح كامل للجدول)؛ للقواعد التي لا تدعم البحث النصي."""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for token in query.split():
+            condition &= Q(name__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token)
+        return queryset.filter(condition)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    فهرس FTS5 في جدول inventory_product_fts (rowid = معرف المنتج) يحوي النص بعد التطبيع.
+    الترتيب بـ bm25 مع وزن أعلى للاسم ثم الفئة ثم الوصف.
+    الفهرس يُربط بجدول المنتجات في نفس الاستعلام، فتصفية queryset (الفئة مثلاً) تسبق الترتيب ولا حد لعدد النتائج.
+    """
+
+    table = 'inventory_product_fts'
+    weights = (10.0, 2.0, 4.0) # name, description, category
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        # كل كلمة مطلوبة، وتطابق البادئة حتى يجد "قفا" كلمة "قفازات"
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        products = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {products}.id', f'{self.table} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({self.table}, {weights})'},
+        ).order_by('search_rank', 'pk')
+
+    def index(self, products, replace=True):
+        rows = [(p.pk, document(p.name), document(p.description), document(p.category)) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            if replace:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, name, description, category) VALUES (%s, %s, %s, %s)', rows)
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def rebuild(self, batch_size=2000):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        for batch in _batches(batch_size):
+            self.index(batch, replace=False)
+        # إحصاءات sqlite_stat1: بدونها قد يبدأ المخطط من فهرس الفئة ويطبّق MATCH على كل صف
+        # فيصير البحث المصفّى بالفئة أبطأ بألف مرة
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    بحث tsvector بإعداد 'simple' (بدون تجذيع) في العمود search_vector المفهرس بـ GIN (انظر الترحيل 0014).
+    العمود يُملأ من document() كجدول FTS في SQLite، فالنص المخزن والاستعلام مطبّعان بنفس الطريقة
+    (بما في ذلك حذف أداة التعريف)، وحفظ المنتج يحدّثه عبر index().
+    """
+
+    vector = ("setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+              "setweight(to_tsvector('simple', %s), 'C')")
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        # العمود ليس حقلاً في النموذج (قواعد أخرى لا تعرفه)، والمطابقة @@ عليه تستخدم الفهرس
+        vector = RawSQL(f'{queryset.model._meta.db_table}.search_vector', [], output_field=SearchVectorField())
+        search_query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple')
+        return (queryset.alias(search_vector=vector).filter(search_vector=search_query)
+                .annotate(search_rank=SearchRank('search_vector', search_query)).order_by('-search_rank', 'pk'))
+
+    def index(self, products):
+        rows = [(document(p.name), document(p.category), document(p.description), p.pk) for p in products]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {Product._meta.db_table} SET search_vector = {self.vector} WHERE id = %s', rows)
+
+    def rebuild(self, batch_size=2000):
+        for batch in _batches(batch_size):
+            self.index(batch)
+
+
+_backend = None
+
+
+def get_backend():
+    """يعيد واجهة البحث المهيأة (مرة واحدة لكل عملية)."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'INVENTORY_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = IContainsBackend()
+    return _backend
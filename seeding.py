@@ -0,0 +1,264 @@
+"""
+توليد بيانات تجريبية واقعية بأحجام كبيرة (من ألف إلى عشرة ملايين صف) لأمر seed_inventory وسيناريوهات القياس.
+
+- الأعداد تُشتق من حجم إجمالي تقريبي (plan) ويمكن تحديد عدد كل جدول منفرداً.
+- كل شيء يُكتب بـ bulk_create على دفعات في معاملات، والطلبات تُولد دفعة دفعة، فالذاكرة لا تعتمد على الحجم.
+- التواريخ موزعة على آخر days يوماً بترتيب زمني (الطلب الأحدث معرفه أكبر كما في التشغيل الفعلي)،
+  وشعبية المنتجات غير متساوية (قليل منها يستحوذ على أغلب الطلبات).
+- كل بند في طلب موافق عليه له سجل استهلاك وحركة مخزون بتاريخ الموافقة، ولكل منتج حركة استلام افتتاحية
+  قبل أول طلب؛ ثم يُعاد بناء جداول التجميع والتقارير وفهرس البحث ومعدلات إعادة الطلب ولقطات المخزون
+  من البيانات المولدة.
+- المولد عشوائي ببذرة ثابتة (seed)، فنفس الأمر ينتج نفس البيانات.
+"""
+
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import analytics, catalogue, ledger, reorder, reports, search
+from .models import CustomUser, Product, Cart, Order, OrderLine, ConsumptionRecord, StockMovement
+
+# كلمة مرور كل المستخدمين المولدين (بيانات تجريبية فقط)
+PASSWORD = 'password'
+ADMIN_USERNAME = 'seed-admin'
+USER_PREFIX = 'seed-user-'
+
+BATCH_SIZE = 5000
+
+_PRODUCTS = {
+    'medical_tools': ['مقص جراحي', 'ملقط', 'سماعة طبية', 'جهاز ضغط', 'ميزان حرارة', 'مشرط', 'حامل إبر',
+                      'منظار أذن', 'جهاز قياس سكر', 'كرسي متحرك', 'عكاز', 'جبيرة'],
+    'consumables': ['قفازات', 'كمامات', 'شاش معقم', 'حقن', 'قطن طبي', 'لاصق جروح', 'كحول معقم',
+                    'أنابيب تحليل', 'شرائط سكر', 'ضمادات', 'أكياس محلول', 'مناديل معقمة'],
+}
+_VARIANTS = ['صغير', 'متوسط', 'كبير', 'مقاس 5', 'مقاس 7', 'عبوة 10', 'عبوة 50', 'عبوة 100', 'نوع أ', 'نوع ب']
+_FIRST_NAMES = ['أحمد', 'محمد', 'سارة', 'فاطمة', 'علي', 'مريم', 'خالد', 'نور', 'يوسف', 'ليلى', 'عمر', 'هدى']
+_LAST_NAMES = ['العلي', 'الحسن', 'السعيد', 'الخطيب', 'النجار', 'الحداد', 'المصري', 'الشامي', 'العمر']
+
+# (عدد البنود، الوزن) و(الكمية، الوزن): أغلب الطلبات صغيرة
+_LINES_PER_ORDER = ([1, 2, 3, 4, 5], [35, 30, 20, 10, 5])
+_QUANTITIES = ([1, 2, 3, 5, 10, 20], [40, 25, 15, 10, 7, 3])
+# متوسط عدد البنود في الطلب (لتقدير عدد الطلبات من الحجم)
+_MEAN_LINES = 2.2
+
+
+def plan(size):
+    """
+    عدد الصفوف لكل جدول لحجم إجمالي تقريبي size. الطلبات وبنودها وسجلات الاستهلاك هي الأغلب،
+    كما في قاعدة بيانات مستخدمة فعلاً؛ بنود الطلبات وسجلات الاستهلاك تتبع عدد الطلبات.
+    """
+    return {
+        'users': max(5, size // 200),
+        'products': max(10, size // 100),
+        'carts': max(5, size // 100),
+        'orders': max(10, int(size / (2 * _MEAN_LINES + 1))),
+    }
+
+
+@contextmanager
+def _backdated(*models):
+    """
+    يوقف auto_now_add مؤقتاً لحقول النماذج المعطاة حتى تُكتب التواريخ المولدة كما هي.
+    يغير تعريف الحقل نفسه، فلا يُستخدم إلا في أمر أو قياس (لا أثناء خدمة الطلبات).
+    """
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _bulk(model, objects, batch_size):
+    with transaction.atomic():
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def seed_users(count, rng, now, days, batch_size=BATCH_SIZE):
+    """مدير واحد (ADMIN_USERNAME) و count مستخدماً (90% منهم موافق عليهم). يعيد معرفات الموافق عليهم."""
+    password = make_password(PASSWORD) # التجزئة مكلفة، فتُحسب مرة واحدة للجميع
+    if not CustomUser.objects.filter(username=ADMIN_USERNAME).exists():
+        CustomUser.objects.create(username=ADMIN_USERNAME, password=password, email='admin@example.com',
+                                  is_admin=True, is_approved=True, is_staff=True, is_superuser=True)
+    offset = CustomUser.objects.filter(username__startswith=USER_PREFIX).count()
+    approved = []
+    for start in range(0, count, batch_size):
+        users = []
+        for i in range(offset + start, offset + min(count, start + batch_size)):
+            users.append(CustomUser(
+                username=f'{USER_PREFIX}{i:07d}', password=password, email=f'user{i}@example.com',
+                first_name=rng.choice(_FIRST_NAMES), last_name=rng.choice(_LAST_NAMES),
+                is_approved=rng.random() < 0.9, date_joined=now - timedelta(days=rng.uniform(0, days)),
+            ))
+        approved += [user.pk for user in _bulk(CustomUser, users, batch_size) if user.is_approved]
+    return approved
+
+
+def seed_products(count, rng, now, days, batch_size=BATCH_SIZE):
+    """count منتجاً بأسماء فريدة في كل فئة؛ نحو 10% منها بمخزون منخفض. يعيد معرفاتها."""
+    offset = Product.objects.count()
+    categories = list(_PRODUCTS)
+    ids = []
+    for start in range(0, count, batch_size):
+        products = []
+        for i in range(offset + start, offset + min(count, start + batch_size)):
+            category = categories[i % len(categories)]
+            base = rng.choice(_PRODUCTS[category])
+            products.append(Product(
+                name=f'{base} {rng.choice(_VARIANTS)} {i:07d}', category=category,
+                description=f'{base} للاستخدام في العيادات والمختبرات.',
+                quantity=rng.randint(0, 5) if rng.random() < 0.1 else rng.randint(20, 500),
+                created_at=now - timedelta(days=rng.uniform(0, days)),
+            ))
+        ids += [product.pk for product in _bulk(Product, products, batch_size)]
+    return ids
+
+
+def seed_carts(count, rng, now, users, pick_product, batch_size=BATCH_SIZE):
+    """count بنداً في سلال المستخدمين الموافق عليهم (بلا تكرار منتج في نفس السلة)."""
+    if not users:
+        return 0
+    existing = set(Cart.objects.filter(user_id__in=users).values_list('user_id', 'product_id'))
+    written = 0
+    while written < count:
+        pairs = {(rng.choice(users), pick_product()) for _ in range(min(batch_size, count - written))} - existing
+        if not pairs:
+            break
+        existing |= pairs
+        _bulk(Cart, [Cart(user_id=user, product_id=product, quantity=rng.choices(*_QUANTITIES)[0],
+                          created_at=now - timedelta(hours=rng.uniform(0, 72)))
+                     for user, product in pairs], batch_size)
+        written += len(pairs)
+    return written
+
+
+def _status(rng, age):
+    # الطلبات القديمة حُسمت في الغالب، والحديثة أغلبها معلق
+    if age > timedelta(days=2):
+        return rng.choices(['Approved', 'Rejected', 'Pending'], [85, 10, 5])[0]
+    return rng.choices(['Approved', 'Rejected', 'Pending'], [40, 5, 55])[0]
+
+
+def seed_orders(count, rng, now, days, users, pick_product, batch_size=BATCH_SIZE, progress=None):
+    """
+    count طلباً موزعة بالتساوي على آخر days يوماً بترتيب زمني، ببنودها وسجلات استهلاك الموافق عليها.
+    يعيد (عدد البنود، عدد سجلات الاستهلاك).
+    """
+    first = now - timedelta(days=days)
+    step = timedelta(days=days) / max(1, count)
+    lines_written = consumed_written = 0
+    for start in range(0, count, batch_size):
+        orders = []
+        for i in range(start, min(count, start + batch_size)):
+            created = first + step * (i + rng.random())
+            status = _status(rng, now - created)
+            approved_at = None
+            if status == 'Approved':
+                approved_at = min(now, created + timedelta(hours=rng.uniform(0.5, 48)))
+            orders.append(Order(user_id=rng.choice(users), status=status, created_at=created,
+                                approved_at=approved_at))
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(orders, batch_size=batch_size)
+            lines, records, movements = [], [], []
+            for order in orders:
+                products = {pick_product() for _ in range(rng.choices(*_LINES_PER_ORDER)[0])}
+                for product in products:
+                    quantity = rng.choices(*_QUANTITIES)[0]
+                    lines.append(OrderLine(order=order, product_id=product, quantity=quantity))
+                    if order.status == 'Approved':
+                        records.append(ConsumptionRecord(user_id=order.user_id, product_id=product,
+                                                         quantity=quantity, consumed_at=order.approved_at))
+                        movements.append(StockMovement(product_id=product, kind=StockMovement.CONSUMPTION,
+                                                       delta=-quantity, created_at=order.approved_at,
+                                                       order=order, user_id=order.user_id))
+            OrderLine.objects.bulk_create(lines, batch_size=batch_size)
+            ConsumptionRecord.objects.bulk_create(records, batch_size=batch_size)
+            StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        lines_written += len(lines)
+        consumed_written += len(records)
+        if progress:
+            progress('orders', start + len(orders), count)
+    return lines_written, consumed_written
+
+
+def seed_receipts(products, at, batch_size=BATCH_SIZE):
+    """
+    حركة استلام لكل منتج عند at (قبل كل الطلبات) بكميته الحالية مضافاً إليها ما استُهلك منه،
+    فيطابق الدفتر الكميات الحالية.
+    """
+    consumed = dict(StockMovement.objects.filter(product_id__in=products, kind=StockMovement.CONSUMPTION)
+                    .order_by().values('product').annotate(total=Sum('delta')).values_list('product', 'total'))
+    for start in range(0, len(products), batch_size):
+        chunk = products[start:start + batch_size]
+        quantities = Product.objects.filter(pk__in=chunk).values_list('pk', 'quantity')
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=pk, kind=StockMovement.RECEIPT, delta=quantity - consumed.get(pk, 0),
+                          created_at=at, note='رصيد افتتاحي')
+            for pk, quantity in quantities
+        ], batch_size=batch_size)
+
+
+def rebuild_derived(start, end):
+    """
+    يعيد بناء جداول التجميع اليومية والتقارير الشهرية بين يومي start و end، وفهرس البحث،
+    ومعدلات إعادة الطلب، ولقطات المخزون الأسبوعية.
+    """
+    with transaction.atomic():
+        analytics.rebuild(start, end)
+    month = start.replace(day=1)
+    while month <= end:
+        with transaction.atomic():
+            reports.rebuild_month(f'{month:%Y-%m}')
+        month = (month + timedelta(days=32)).replace(day=1)
+    with transaction.atomic():
+        search.get_backend().rebuild()
+    catalogue.bump()
+    reorder.rebuild()
+    tz = timezone.get_current_timezone()
+    ledger.backfill(datetime.combine(start, time.min, tz), datetime.combine(end, time.min, tz), timedelta(days=7))
+
+
+def seed(size=10_000, days=365, seed=0, batch_size=BATCH_SIZE, derived=True, progress=None, **counts):
+    """
+    يولد بيانات لحجم إجمالي تقريبي size (انظر plan)؛ counts (users, products, carts, orders) تتجاوز التقدير.
+    derived=False يتخطى إعادة بناء الجداول المشتقة (التجميع والتقارير والبحث).
+    progress(table, done, total) يُستدعى بعد كل مرحلة. يعيد عدد الصفوف المولدة لكل جدول.
+    """
+    rng = random.Random(seed)
+    counts = {**plan(size), **{name: value for name, value in counts.items() if value is not None}}
+    now = timezone.now()
+
+    with _backdated(Product, Cart, Order, ConsumptionRecord):
+        users = seed_users(counts['users'], rng, now, days, batch_size)
+        if progress:
+            progress('users', counts['users'], counts['users'])
+        products = seed_products(counts['products'], rng, now, days, batch_size)
+        if progress:
+            progress('products', len(products), counts['products'])
+        if not users or not products:
+            return {'users': counts['users'], 'products': len(products)}
+
+        # شعبية تتناقص مع الترتيب (قريبة من توزيع Zipf)
+        weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(products))))
+        pick_product = lambda: rng.choices(products, cum_weights=weights)[0]
+
+        carts = seed_carts(counts['carts'], rng, now, users, pick_product, batch_size)
+        if progress:
+            progress('carts', carts, counts['carts'])
+        lines, consumption = seed_orders(counts['orders'], rng, now, days, users, pick_product,
+                                         batch_size, progress)
+        seed_receipts(products, now - timedelta(days=days + 1), batch_size)
+
+    if derived:
+        rebuild_derived(timezone.localdate(now - timedelta(days=days)), timezone.localdate(now))
+    return {'users': counts['users'], 'products': len(products), 'carts': carts, 'orders': counts['orders'],
+            'order_lines': lines, 'consumption_records': consumption}
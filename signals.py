@@ -0,0 +1,68 @@
+"""
+إشارات (signals) التطبيق: تُربط في InventoryConfig.ready.
+"""
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomUser, Product, StockMovement
+from . import auth, catalogue, database, instrumentation, ledger, reorder, search
+
+
+@receiver(post_save, sender=Product, dispatch_uid='inventory_product_search_index')
+def index_product(sender, instance, raw=False, **kwargs):
+    """يحدّث فهرس البحث ويُبطل ذاكرة الكتالوج عند إضافة منتج أو تعديله."""
+    if not raw:
+        search.get_backend().index([instance])
+    catalogue.bump_on_commit()
+
+
+@receiver(post_save, sender=Product, dispatch_uid='inventory_product_stock_movement')
+def record_movement(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """يسجل فرق الكمية في دفتر الحركات: استلام عند الإضافة، وتعديل بالفرق عن الكمية المقروءة عند الحفظ."""
+    if raw or (update_fields is not None and 'quantity' not in update_fields):
+        return
+    if created:
+        ledger.record([ledger.movement(instance, instance.quantity, StockMovement.RECEIPT)])
+    elif getattr(instance, '_loaded_quantity', None) is not None:
+        ledger.record([ledger.movement(instance, instance.quantity - instance._loaded_quantity,
+                                       StockMovement.ADJUSTMENT)])
+    instance._loaded_quantity = instance.quantity
+
+
+@receiver(post_save, sender=Product, dispatch_uid='inventory_product_stock_level')
+def update_stock_level(sender, instance, raw=False, update_fields=None, **kwargs):
+    """يعيد حساب أيام التغطية وعلامة المخزون المنخفض بالكمية الجديدة."""
+    if raw or (update_fields is not None and 'quantity' not in update_fields):
+        return
+    with transaction.atomic():
+        reorder.update({instance.pk: instance.quantity})
+
+
+@receiver(post_delete, sender=Product, dispatch_uid='inventory_product_search_remove')
+def remove_product(sender, instance, **kwargs):
+    """يحذف المنتج من فهرس البحث ويُبطل ذاكرة الكتالوج."""
+    search.get_backend().remove([instance.pk])
+    catalogue.bump_on_commit()
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='inventory_user_cache_save')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='inventory_user_cache_delete')
+def invalidate_user(sender, instance, **kwargs):
+    """يحذف نسخة المستخدم المخزنة (الصلاحيات والموافقة) عند أي تعديل عليه أو حذفه."""
+    auth.invalidate(instance.pk)
+
+
+@receiver(connection_created, dispatch_uid='inventory_tune_sqlite')
+def tune_sqlite(sender, connection, **kwargs):
+    """يطبق ضبط SQLite (database.PRAGMAS) على كل اتصال جديد."""
+    database.configure(connection)
+
+
+@receiver(connection_created, dispatch_uid='inventory_instrument_connection')
+def instrument_connection(sender, connection, **kwargs):
+    """يركّب غلاف قياس الاستعلامات على كل اتصال جديد بقاعدة البيانات."""
+    if instrumentation.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrumentation.record_query)
@@ -0,0 +1,186 @@
+"""
+خدمة دفتر المخزون: كل مسارات الموافقة على الطلبات (لوحة المدير ولوحة Django الإدارية) تمر من هنا.
+الخصم يتم بتحديث شرطي واحد باستخدام F() داخل transaction.atomic، فلا تضيع التحديثات
+ولا يُصرف أكثر من المتاح حتى مع الموافقات المتزامنة.
+
+الموافقة تتم على دفعات وعلى الطلب كاملاً (كل بنوده أو لا شيء): كميات كل المنتجات تُقرأ مرة واحدة،
+ويُخصم مجموع البنود المقبولة بتحديث واحد لكل منتج،
+ثم تُكتب الحالات وسجلات الاستهلاك ورسائل الإشعار بعمليات جماعية، ويُحدّث تجميع التقارير الشهرية (reports.py)، داخل معاملة واحدة،
+فيبقى عدد الاستعلامات ثابتاً مهما زاد عدد الطلبات.
+"""
+
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction, OperationalError
+from django.db.models import F, Prefetch
+from django.utils import timezone
+
+from . import analytics, catalogue, events, ledger, notifications, reorder, reports
+from .models import Product, Order, OrderLine, ConsumptionRecord, StockMovement
+
+APPROVED = 'approved'
+NOT_PENDING = 'not_pending'
+INSUFFICIENT_STOCK = 'insufficient_stock'
+MISSING = 'missing'
+
+# SQLite قد يرفض الكتابة المتزامنة بخطأ "locked" بدلاً من الانتظار (نادر مع ضبط database.py)؛ نعيد المحاولة بمهلة متزايدة
+LOCK_RETRIES = 20
+LOCK_BACKOFF = 0.005
+
+
+class ApprovalResult:
+    """نتيجة محاولة الموافقة على طلب واحد: تم الالتزام بها أو رُفضت مع السبب."""
+
+    def __init__(self, order_id, outcome, order=None, shortages=()):
+        self.order_id = order_id
+        self.outcome = outcome
+        self.order = order
+        self.shortages = list(shortages) # [(البند، الكمية المتاحة له وقت الرفض)] عند نقص المخزون
+
+    @property
+    def approved(self):
+        return self.outcome == APPROVED
+
+    def shortage_message(self):
+        """رسالة للمدير تشرح سبب رفض الموافقة لنقص المخزون."""
+        details = '، '.join(
+            f'{line.product.name} (المطلوب {line.quantity}، المتاح {available})' for line, available in self.shortages)
+        return f'لا يمكن الموافقة على الطلب #{self.order_id} لأن الكمية المطلوبة أكبر من المتاح: {details}.'
+
+    def __repr__(self):
+        return f'<ApprovalResult #{self.order_id} {self.outcome}>'
+
+
+class _Conflict(OperationalError):
+    """تغيرت الطلبات أو الكميات أثناء المعاملة (معالج آخر سبقنا)؛ تُلغى الدفعة وتُعاد."""
+
+    def __init__(self):
+        super().__init__('approval batch locked by a concurrent writer')
+
+
+def _allocate(orders, available):
+    """
+    يوزع الكميات المتاحة {معرف المنتج: الكمية} على الطلبات بالترتيب (الأقدم أولاً).
+    الطلب يُقبل كاملاً إذا كفى المخزون كل بنوده، وإلا يُرفض كاملاً.
+    يعيد (المقبولة، [(المرفوض، النواقص)]، المخصوم لكل منتج).
+    """
+    accepted, rejected = [], []
+    taken = defaultdict(int)
+    for order in orders:
+        needed = defaultdict(int)
+        for line in order.lines.all():
+            needed[line.product_id] += line.quantity
+        shortages = [
+            (line, available[line.product_id] - taken[line.product_id])
+            for line in order.lines.all()
+            if needed[line.product_id] > available[line.product_id] - taken[line.product_id]
+        ]
+        if shortages:
+            rejected.append((order, shortages))
+            continue
+        for product_id, quantity in needed.items():
+            taken[product_id] += quantity
+        accepted.append(order)
+    return accepted, rejected, taken
+
+
+def _approve_batch(order_ids):
+    with transaction.atomic():
+        orders = {
+            order.pk: order
+            for order in Order.objects.select_for_update().select_related('user').filter(pk__in=order_ids)
+            .prefetch_related(Prefetch('lines', queryset=OrderLine.objects.select_related('product').order_by('pk')))
+        }
+        results = {}
+        pending = []
+        for order in sorted(orders.values(), key=lambda o: (o.created_at, o.pk)):
+            if order.status != 'Pending':
+                results[order.pk] = ApprovalResult(order.pk, NOT_PENDING, order)
+            else:
+                pending.append(order)
+
+        # الكميات الحالية مقروءة ومقفلة مرة واحدة لكل المنتجات؛ كل بنود المنتج تشير لنفس الكائن
+        product_ids = {line.product_id for order in pending for line in order.lines.all()}
+        products = Product.objects.select_for_update().in_bulk(product_ids)
+        for order in pending:
+            for line in order.lines.all():
+                line.product = products[line.product_id]
+
+        now = timezone.now()
+        month = reports.month_key(now)
+        approved, rejected, taken = _allocate(pending, {pk: p.quantity for pk, p in products.items()})
+        for order, shortages in rejected:
+            results[order.pk] = ApprovalResult(order.pk, INSUFFICIENT_STOCK, order, shortages=shortages)
+        for order in approved:
+            order.status = 'Approved'
+            order.approved_at = now
+            results[order.pk] = ApprovalResult(order.pk, APPROVED, order)
+
+        if approved:
+            # خصم شرطي واحد لكل منتج؛ الفشل يعني أن الكمية تغيرت منذ قراءتها (قواعد بلا قفل صفوف)
+            for product_id, total in taken.items():
+                if not Product.objects.filter(pk=product_id, quantity__gte=total).update(quantity=F('quantity') - total):
+                    raise _Conflict()
+                products[product_id].quantity -= total
+            # الحالة تتغير فقط إن كانت ما زالت "معلق"؛ أي فرق يعني أن معالجاً آخر سبقنا
+            claimed = Order.objects.filter(pk__in=[o.pk for o in approved], status='Pending').update(
+                status='Approved', approved_at=now)
+            if claimed != len(approved):
+                raise _Conflict()
+
+            lines = [(order, line) for order in approved for line in order.lines.all()]
+            consumed = defaultdict(int)
+            for order, line in lines:
+                consumed[(order.user_id, line.product_id)] += line.quantity
+            remaining = {product_id: products[product_id].quantity for product_id in taken}
+            # تحديث التقارير الشهرية التراكمية (يمكن تعطيله وإعادة البناء لاحقاً بـ rebuild_reports)
+            if getattr(settings, 'INVENTORY_REPORT_ROLLUP', True):
+                reports.record_consumption(month, consumed, remaining)
+            ConsumptionRecord.objects.bulk_create([
+                ConsumptionRecord(user_id=order.user_id, product_id=line.product_id, quantity=line.quantity)
+                for order, line in lines
+            ])
+            ledger.record([
+                ledger.movement(line.product_id, -line.quantity, StockMovement.CONSUMPTION,
+                                user=order.user, order=order, created_at=now)
+                for order, line in lines
+            ])
+            analytics.record_consumption(timezone.localdate(now), consumed)
+            # معدلات الاستهلاك وأيام التغطية وعلامة المخزون المنخفض (reorder.py)
+            reorder.record_consumption(now, taken, remaining)
+            # رسائل الموافقة تُكتب في الصندوق الصادر ضمن نفس المعاملة (تُرسل لاحقاً بـ send_notifications)
+            notifications.enqueue([notifications.order_approved(order) for order in approved])
+            events.order_status_changed(approved)
+            # الكميات المعروضة في الكتالوج تغيرت (التحديث الجماعي لا يطلق إشارات post_save)
+            catalogue.bump_on_commit()
+
+    return [results.get(order_id) or ApprovalResult(order_id, MISSING) for order_id in order_ids]
+
+
+def approve_orders(order_ids):
+    """
+    يوافق على الطلبات المعطاة دفعة واحدة ويعيد قائمة ApprovalResult بنفس الترتيب.
+    الطلب يُقبل بكل بنوده أو لا يُقبل؛ الطلب الذي لا يكفيه المخزون يُرفض وحده ولا يلغي الموافقة على بقية الدفعة.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        return []
+    return _retry_on_lock(_approve_batch, order_ids)
+
+
+def _retry_on_lock(func, *args):
+    """يعيد تنفيذ المعاملة كاملة إذا فشلت بسبب قفل قاعدة البيانات (المعاملة أُلغيت فلا أثر جزئي)."""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return func(*args)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_BACKOFF * (attempt + 1))
+
+
+def approve_order(order_id):
+    """اختصار للموافقة على طلب واحد."""
+    return approve_orders([order_id])[0]
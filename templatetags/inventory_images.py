@@ -0,0 +1,27 @@
+"""
+وسوم القوالب لعرض صور المنتجات بصورها المصغرة (srcset) بدلاً من الصورة الأصلية.
+"""
+
+from django import template
+
+from .. import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('inventory/product_image.html')
+def product_image(product, width, css_class='', style=''):
+    """
+    يعرض صورة المنتج في عنصر <picture> بصيغتي WebP وJPEG، والمتصفح يختار المقاس المناسب لعرض width
+    وكثافة الشاشة. المنتجات التي لم تُولد لها صور مصغرة بعد تعرض الأصل.
+    """
+    thumbnails = product.thumbnails or {}
+    return {
+        'product': product,
+        'webp': images.srcset(thumbnails, 'webp'),
+        'jpeg': images.srcset(thumbnails, 'jpeg'),
+        'src': images.closest(thumbnails, width) or product.image.url,
+        'sizes': f'{width}px',
+        'css_class': css_class,
+        'style': style,
+    }
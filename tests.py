@@ -1,3 +1,1416 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.utils import timezone
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import analytics, auth, cart, catalogue, database, events, exports, forecasting, images, imports, instrumentation, jobs, ledger, notifications, reorder, reports, search, seeding, stock
+from .forms import ProductForm
+from .dashboard import SECTIONS
+from .models import (CustomUser, Product, Cart, Order, OrderLine, Report, ConsumptionRecord, DailyProductConsumption, DailyUserConsumption,
+                     Notification, ProductImport, StockLevel, StockMovement, StockSnapshot, DemandForecast, Job)
+
+
+def make_user(username='user', **extra):
+    extra.setdefault('is_approved', True)
+    return CustomUser.objects.create_user(username=username, **extra)
+
+
+def make_order(user, product, quantity, *more, status='Pending'):
+    """طلب معلق ببند (product, quantity) وبنود إضافية اختيارية بنفس الترتيب: make_order(u, p1, 2, p2, 1)."""
+    order = Order.objects.create(user=user, status=status)
+    items = (product, quantity) + more
+    OrderLine.objects.bulk_create([
+        OrderLine(order=order, product=items[i], quantity=items[i + 1]) for i in range(0, len(items), 2)
+    ])
+    return order
+
+
+class AdminDashboardSectionTests(TestCase):
+    """أقسام لوحة المدير: عدد استعلامات ثابت وترقيم بالمؤشر بدون تكرار."""
+
+    def setUp(self):
+        self.admin = make_user('admin', is_admin=True)
+        self.client.force_login(self.admin)
+
+    def seed(self, n):
+        start = CustomUser.objects.count()
+        for i in range(start, start + n):
+            user = make_user(f'u{i}', is_approved=False)
+            product = Product.objects.create(name=f'p{i}', quantity=10)
+            make_order(user, product, 1)
+            Report.objects.create(user=user, product=product, month='2025-07', consumed=1, remaining=9)
+            ConsumptionRecord.objects.create(user=user, product=product, quantity=1)
+
+    def section_url(self, section):
+        return reverse('inventory:admin_dashboard_section', args=[section])
+
+    def test_query_count_is_constant(self):
+        self.client.get(self.section_url('orders'))
+        for n in (3, 40):
+            self.seed(n)
+            for section in SECTIONS:
+                # صفحة القسم (+ بنود الطلبات) فقط، مهما كان عدد الصفوف؛ الجلسة والمستخدم من الذاكرة المؤقتة
+                with self.assertNumQueries(2 if section == 'orders' else 1):
+                    response = self.client.get(self.section_url(section))
+                self.assertEqual(response.status_code, 200)
+
+    def test_cursor_walks_every_row_once(self):
+        self.seed(60)
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(self.section_url('orders'), {'cursor': cursor} if cursor else {})
+            seen.extend(order.id for order in response.context['items'])
+            cursor = response['X-Next-Cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_invalid_cursor_and_section(self):
+        self.assertEqual(self.client.get(self.section_url('orders'), {'cursor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.section_url('nope')).status_code, 404)
+
+    def test_dashboard_page_renders(self):
+        self.seed(3)
+        response = self.client.get(reverse('inventory:admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+class StockApprovalTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.product = Product.objects.create(name='gloves', quantity=5)
+
+    def test_approve_decrements_and_records(self):
+        order = make_order(self.user, self.product, 3)
+        result = stock.approve_order(order.pk)
+        self.assertTrue(result.approved)
+        self.product.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(self.product.quantity, 2)
+        self.assertEqual(order.status, 'Approved')
+        self.assertEqual(ConsumptionRecord.objects.get().quantity, 3)
+
+    def test_insufficient_stock_rolls_back_claim(self):
+        order = make_order(self.user, self.product, 6)
+        result = stock.approve_order(order.pk)
+        self.assertEqual(result.outcome, stock.INSUFFICIENT_STOCK)
+        [(line, available)] = result.shortages
+        self.assertEqual((line.quantity, available), (6, 5))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'Pending')
+        self.assertFalse(ConsumptionRecord.objects.exists())
+
+    def test_multi_line_order_is_all_or_nothing(self):
+        other = Product.objects.create(name='masks', quantity=1)
+        order = make_order(self.user, self.product, 2, other, 3)
+        result = stock.approve_order(order.pk)
+        self.assertEqual(result.outcome, stock.INSUFFICIENT_STOCK)
+        self.assertEqual([(line.product.name, available) for line, available in result.shortages], [('masks', 1)])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+
+        Product.objects.filter(pk=other.pk).update(quantity=3)
+        self.assertTrue(stock.approve_order(order.pk).approved)
+        self.assertEqual(dict(Product.objects.values_list('name', 'quantity')), {'gloves': 3, 'masks': 0})
+        self.assertEqual(sorted(ConsumptionRecord.objects.values_list('quantity', flat=True)), [2, 3])
+
+    def test_second_approval_is_not_pending(self):
+        order = make_order(self.user, self.product, 1)
+        stock.approve_order(order.pk)
+        self.assertEqual(stock.approve_order(order.pk).outcome, stock.NOT_PENDING)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 4)
+
+
+class BulkApprovalTests(TestCase):
+    def setUp(self):
+        self.products = [Product.objects.create(name=f'p{i}', quantity=1000) for i in range(3)]
+
+    def pending_orders(self, n, prefix='bulk'):
+        return [
+            make_order(make_user(f'{prefix}{i}'), self.products[i % 3], 2).pk
+            for i in range(n)
+        ]
+
+    def test_query_count_is_constant_in_orders(self):
+        counts = []
+        for n in (6, 60):
+            order_ids = self.pending_orders(n, prefix=f'batch{n}-')
+            with CaptureQueriesContext(connection) as ctx:
+                results = stock.approve_orders(order_ids)
+            self.assertTrue(all(result.approved for result in results))
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_aggregate_stock_check_per_product(self):
+        product = Product.objects.create(name='masks', quantity=5)
+        ids = [make_order(make_user(f'm{i}'), product, 2).pk for i in range(4)]
+        results = stock.approve_orders(ids)
+        self.assertEqual([r.outcome for r in results], [stock.APPROVED, stock.APPROVED,
+                                                         stock.INSUFFICIENT_STOCK, stock.INSUFFICIENT_STOCK])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 1)
+        self.assertEqual(Order.objects.filter(lines__product=product, status='Pending').count(), 2)
+
+    def test_dashboard_endpoint(self):
+        self.client.force_login(make_user('admin', is_admin=True))
+        ids = self.pending_orders(4)
+        response = self.client.post(reverse('inventory:approve_orders_bulk'), {'order_ids': ids, 'job_token': 'abc'})
+        self.assertRedirects(response, reverse('inventory:admin_dashboard'), fetch_redirect_response=False)
+        # الموافقة تُجدول في مهمة بالخلفية، وإعادة إرسال النموذج نفسه لا تكررها
+        self.client.post(reverse('inventory:approve_orders_bulk'), {'order_ids': ids, 'job_token': 'abc'})
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.status, Order.objects.filter(status='Approved').count()),
+                         ('approve_orders', 'Pending', 0))
+        self.assertEqual(jobs.work(), 1)
+        self.assertEqual(Order.objects.filter(status='Approved').count(), 4)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result['approved'], job.progress, job.total), ('Done', 4, 4, 4))
+
+
+class StockApprovalStressTests(TransactionTestCase):
+    """موافقات متزامنة من عدة خيوط على نفس المنتج: لا صرف أكثر من المخزون."""
+
+    THREADS = 8
+    ORDERS_PER_THREAD = 15
+    STOCK = 50
+
+    def test_concurrent_approvals_never_oversell(self):
+        users = [make_user(f'user{i}') for i in range(self.THREADS)]
+        product = Product.objects.create(name='syringes', quantity=self.STOCK)
+        batches = [
+            [make_order(user, product, 1).pk for _ in range(self.ORDERS_PER_THREAD)]
+            for user in users
+        ]
+        results = []
+        lock = threading.Lock()
+
+        def worker(order_ids):
+            try:
+                outcome = stock.approve_orders(order_ids)
+                with lock:
+                    results.extend(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(batch,)) for batch in batches]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        approved = sum(1 for result in results if result.approved)
+        product.refresh_from_db()
+        self.assertEqual(len(results), self.THREADS * self.ORDERS_PER_THREAD)
+        self.assertEqual(approved, self.STOCK)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Order.objects.filter(status='Approved').count(), self.STOCK)
+        self.assertEqual(ConsumptionRecord.objects.count(), self.STOCK)
+        self.assertEqual(Report.objects.aggregate(total=Sum('consumed'))['total'], self.STOCK)
+        logging.getLogger(__name__).info('%.0f approvals/sec', len(results) / elapsed)
+
+
+class ReportRollupTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.product = Product.objects.create(name='bandage', quantity=20)
+
+    def approve(self, quantity):
+        order = make_order(self.user, self.product, quantity)
+        return stock.approve_order(order.pk)
+
+    def test_repeat_approvals_accumulate_in_one_row(self):
+        self.assertTrue(self.approve(3).approved)
+        self.assertTrue(self.approve(4).approved)
+        report = Report.objects.get()
+        self.assertEqual((report.month, report.consumed, report.remaining), (reports.month_key(), 7, 13))
+
+    def test_rebuild_month_from_consumption_records(self):
+        self.approve(3)
+        self.approve(2)
+        month = reports.month_key()
+        Report.objects.update(consumed=999)
+        stale = Product.objects.create(name='old', quantity=1)
+        Report.objects.create(user=self.user, month=month, product=stale, consumed=1, remaining=1)
+
+        call_command('rebuild_reports', month, batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(list(Report.objects.values_list('product__name', 'consumed')), [('bandage', 5)])
+
+
+class ConsumptionAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', is_admin=True)
+        self.users = [make_user(f'nurse{i}') for i in range(2)]
+        self.products = [Product.objects.create(name=f'item{i}', quantity=100) for i in range(2)]
+
+    def approve(self, user, product, quantity):
+        order = make_order(user, product, quantity)
+        stock.approve_order(order.pk)
+
+    def test_approvals_update_daily_tables(self):
+        self.approve(self.users[0], self.products[0], 3)
+        self.approve(self.users[1], self.products[0], 2)
+        self.approve(self.users[0], self.products[1], 4)
+        today = timezone.localdate()
+        self.assertEqual(DailyProductConsumption.objects.get(day=today, product=self.products[0]).quantity, 5)
+        self.assertEqual(DailyUserConsumption.objects.filter(day=today).count(), 3)
+        top = list(analytics.top_products(today, today))
+        self.assertEqual(top[0], {'product__name': 'item0', 'total_consumed': 5})
+
+    def test_rebuild_matches_incremental(self):
+        self.approve(self.users[0], self.products[0], 3)
+        self.approve(self.users[0], self.products[0], 2)
+        expected = list(DailyUserConsumption.objects.values_list('day', 'user', 'product', 'quantity'))
+        DailyUserConsumption.objects.update(quantity=0)
+        today = timezone.localdate()
+        analytics.rebuild(today, today, batch_size=1)
+        self.assertEqual(list(DailyUserConsumption.objects.values_list('day', 'user', 'product', 'quantity')), expected)
+
+    def test_dashboard_does_not_scan_consumption_records(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('inventory:admin_dashboard'))
+        counts = []
+        for n in (1, 20):
+            for _ in range(n):
+                self.approve(self.users[0], self.products[0], 1)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('inventory:admin_dashboard'))
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('inventory_consumptionrecord' in q['sql'] for q in ctx.captured_queries))
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(response.context['top_consumed_products_admin'][0]['total_consumed'], 21)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class HotPathIndexTests(TestCase):
+    """الاستعلامات المتكررة في العروض ولوحة المدير تستخدم فهرساً، بلا فرز مؤقت."""
+
+    def test_hot_queries_use_index(self):
+        user = make_user()
+        product = Product.objects.create(name='gauze')
+        queries = {
+            'order_user_created_idx': Order.objects.filter(user=user).order_by('-created_at'),
+            'order_status_created_idx': Order.objects.filter(status='Pending').order_by('-created_at'),
+            'order_created_id_idx': Order.objects.order_by('-created_at', '-id')[:26],
+            'consumption_consumed_id_idx': ConsumptionRecord.objects.order_by('-consumed_at', '-id')[:26],
+            'consumption_product_at_idx': ConsumptionRecord.objects.filter(
+                product=product, consumed_at__gte=timezone.now()),
+            # القيد الفريد (الفئة، الاسم) يُنشأ في SQLite داخل تعريف الجدول فيأخذ فهرسه اسماً تلقائياً
+            'sqlite_autoindex_inventory_product': Product.objects.filter(category='consumables').order_by('name'),
+            'product_quantity_name_idx': Product.objects.filter(quantity__lte=5).order_by('quantity', 'name'),
+            'product_name_id_idx': Product.objects.order_by('name', 'id')[:26],
+            'report_created_id_idx': Report.objects.order_by('-created_at', '-id')[:26],
+        }
+        for index, queryset in queries.items():
+            with self.subTest(index=index):
+                plan = queryset.explain()
+                self.assertIn(f'USING INDEX {index}', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ProductSearchTests(TestCase):
+    def names(self, query, queryset=None):
+        queryset = Product.objects.all() if queryset is None else queryset
+        return [p.name for p in search.get_backend().search(queryset, query)]
+
+    def test_normalize_arabic_variants(self):
+        self.assertEqual(search.normalize('أَدَوَاتُ إسعافٍ مُعقّمة'), 'ادوات اسعاف معقمه')
+        self.assertEqual(search.normalize('مستشفـــى'), 'مستشفي')
+
+    def test_search_matches_normalised_text_across_fields(self):
+        Product.objects.create(name='قُفّازات طبية', description='مقاس متوسط')
+        Product.objects.create(name='شريط لاصق', description='يستخدم مع القفازات')
+        Product.objects.create(name='كمامة', category='consumables')
+        # الاسم أعلى وزناً من الوصف، والبحث بالبادئة وبدون تشكيل أو همزات
+        self.assertEqual(self.names('قفاز'), ['قُفّازات طبية', 'شريط لاصق'])
+        self.assertEqual(self.names('طبيه'), ['قُفّازات طبية'])
+        self.assertEqual(self.names('consumables'), ['كمامة'])
+        self.assertEqual(self.names('قفاز', Product.objects.filter(name='كمامة')), [])
+
+    def test_filter_applies_before_ranking_without_cap(self):
+        # مطابقات أكثر من 200 خارج الفئة المختارة لا تُقصي مطابقات الفئة، والبحث غير المصفّى لا يُقطع
+        Product.objects.bulk_create(
+            [Product(name=f'قفازات {i}', category='consumables') for i in range(250)]
+            + [Product(name=f'قفاز جراحي {i}', category='medical_tools') for i in range(3)])
+        search.get_backend().rebuild()
+        self.assertEqual(
+            self.names('قفاز', Product.objects.filter(category='medical_tools')),
+            ['قفاز جراحي 0', 'قفاز جراحي 1', 'قفاز جراحي 2'])
+        self.assertEqual(search.get_backend().search(Product.objects.all(), 'قفاز').count(), 253)
+
+        self.client.force_login(make_user())
+        response = self.client.get(reverse('inventory:user_dashboard'), {'q': 'قفاز', 'category': 'medical_tools'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'العمود search_vector خاص بـ PostgreSQL')
+    def test_postgres_matches_words_with_article(self):
+        # النص المخزن بلا أداة التعريف كالاستعلام، فالكلمة بأداتها أو بدونها تطابق
+        Product.objects.create(name='القطن المعقّم', description='ﻻصق')
+        self.assertEqual(self.names('المعقم'), ['القطن المعقّم'])
+        self.assertEqual(self.names('قطن'), ['القطن المعقّم'])
+        self.assertEqual(self.names('لاصق'), ['القطن المعقّم'])
+
+    def test_index_follows_save_and_delete(self):
+        product = Product.objects.create(name='gauze')
+        self.assertEqual(self.names('gauze'), ['gauze'])
+        product.name = 'bandage'
+        product.save()
+        self.assertEqual(self.names('gauze'), [])
+        self.assertEqual(self.names('bandage'), ['bandage'])
+        product.delete()
+        self.assertEqual(self.names('bandage'), [])
+
+    def test_user_dashboard_uses_search(self):
+        Product.objects.create(name='مِقصّ جراحي')
+        Product.objects.create(name='شاش')
+        self.client.force_login(make_user())
+        response = self.client.get(reverse('inventory:user_dashboard'), {'q': 'مقص'})
+        self.assertEqual([p.name for p in response.context['products']], ['مِقصّ جراحي'])
+
+
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(make_user())
+        self.url = reverse('inventory:user_dashboard')
+
+    def product_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        return response, [q['sql'] for q in ctx.captured_queries if 'inventory_product' in q['sql']]
+
+    def test_repeated_views_hit_cache(self):
+        Product.objects.create(name='شاش', quantity=3)
+        response, queries = self.product_queries()
+        self.assertTrue(queries)
+        response, queries = self.product_queries()
+        self.assertEqual(queries, [])
+        self.assertEqual([p.name for p in response.context['products']], ['شاش'])
+        self.assertEqual(catalogue.stats()['hits'], 1)
+        self.assertEqual(catalogue.stats()['misses'], 1)
+
+    def test_product_write_invalidates(self):
+        product = Product.objects.create(name='شاش', quantity=3)
+        self.product_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'قطن'
+            product.save()
+        response, queries = self.product_queries()
+        self.assertTrue(queries)
+        self.assertEqual([p.name for p in response.context['products']], ['قطن'])
+
+    def test_approval_invalidates(self):
+        product = Product.objects.create(name='شاش', quantity=3)
+        order = make_order(make_user('buyer'), product, 2)
+        self.product_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.approve_order(order.pk)
+        response, _ = self.product_queries()
+        self.assertEqual(response.context['products'][0].quantity, 1)
+
+    def test_pages_and_filters_are_cached_separately(self):
+        Product.objects.bulk_create([Product(name=f'p{i:02d}', category='consumables') for i in range(30)])
+        first, _ = self.product_queries()
+        second, _ = self.product_queries({'page': 2})
+        self.assertEqual(len(first.context['products']), catalogue.PAGE_SIZE)
+        self.assertEqual(len(second.context['products']), 30 - catalogue.PAGE_SIZE)
+        cached, queries = self.product_queries({'page': 2})
+        self.assertEqual(queries, [])
+        self.assertEqual(cached.context['page_obj'].paginator.num_pages, 2)
+        other, _ = self.product_queries({'category': 'medical_tools'})
+        self.assertEqual(list(other.context['products']), [])
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def upload(self, width=900, height=600):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'JPEG')
+        return SimpleUploadedFile('gauze.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_form_save_generates_hashed_thumbnails(self):
+        form = ProductForm({'name': 'شاش', 'quantity': 3, 'category': 'consumables'}, {'image': self.upload()})
+        self.assertTrue(form.is_valid(), form.errors)
+        product = form.save()
+        product.refresh_from_db()
+        self.assertEqual(set(product.thumbnails), {str(size) for size in images.SIZES})
+        for size, variants in product.thumbnails.items():
+            self.assertEqual(set(variants), {'webp', 'jpeg', 'width'})
+            self.assertRegex(variants['webp'], rf'^products/thumbs/gauze\.{size}\.[0-9a-f]{{12}}\.webp$')
+            with default_storage.open(variants['jpeg']) as f:
+                from PIL import Image
+                self.assertEqual(Image.open(f).width, int(size))
+
+    def test_dashboard_emits_srcset(self):
+        form = ProductForm({'name': 'شاش', 'quantity': 3, 'category': 'consumables'}, {'image': self.upload()})
+        form.is_valid()
+        form.save()
+        self.client.force_login(make_user())
+        content = self.client.get(reverse('inventory:user_dashboard')).content.decode()
+        self.assertIn('type="image/webp"', content)
+        self.assertIn('/media/products/thumbs/gauze.200.', content)
+        self.assertIn('200w', content)
+
+    def test_srcset_uses_actual_widths(self):
+        # صورة طولية: عرض كل نسخة ربع مقاسها، والصورة الأصغر من كل المقاسات تظهر في srcset مرة واحدة
+        name = default_storage.save('products/tall.jpg', self.upload(150, 600))
+        thumbnails = images.generate(name)
+        self.assertEqual({size: variants['width'] for size, variants in thumbnails.items()},
+                         {'70': 18, '140': 35, '200': 50, '400': 100})
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in images.srcset(thumbnails, 'jpeg').split(', ')],
+                         ['18w', '35w', '50w', '100w'])
+        small = images.generate(default_storage.save('products/small.jpg', self.upload(50, 40)))
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in images.srcset(small, 'webp').split(', ')],
+                         ['50w'])
+        self.assertEqual(images.closest(thumbnails, 60), default_storage.url(thumbnails['400']['jpeg']))
+
+    def test_backfill_command(self):
+        product = Product.objects.create(name='شاش', image=default_storage.save('products/old.jpg', self.upload()))
+        self.assertEqual(product.thumbnails, {})
+        call_command('generate_thumbnails', workers=0, stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertIn('200', product.thumbnails)
+        # صورة أصغر من كل المقاسات لا تُكبّر
+        small = Product.objects.create(name='قطن', image=default_storage.save('products/small.jpg', self.upload(50, 40)))
+        call_command('generate_thumbnails', workers=0, stdout=io.StringIO())
+        small.refresh_from_db()
+        with default_storage.open(small.thumbnails['200']['jpeg']) as f:
+            from PIL import Image
+            self.assertEqual(Image.open(f).size, (50, 40))
+
+
+class CountingEmailBackend(LocMemEmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(LocMemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('smtp down')
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.client.force_login(make_user('admin', is_admin=True))
+        self.product = Product.objects.create(name='شاش', quantity=10)
+
+    def order(self, username='buyer'):
+        user = make_user(username, email=f'{username}@example.com')
+        return make_order(user, self.product, 1)
+
+    def test_views_enqueue_instead_of_sending(self):
+        approved, rejected = self.order('a'), self.order('b')
+        pending = make_user('c', is_approved=False, email='c@example.com')
+        self.client.get(reverse('inventory:approve_order', args=[approved.pk]))
+        self.client.get(reverse('inventory:reject_order', args=[rejected.pk]))
+        self.client.get(reverse('inventory:user_approve', args=[pending.pk]))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(sorted(Notification.objects.values_list('recipient', flat=True)),
+                         ['a@example.com', 'b@example.com', 'c@example.com'])
+
+    @override_settings(EMAIL_BACKEND='inventory.tests.CountingEmailBackend')
+    def test_deliver_uses_one_connection_per_batch(self):
+        stock.approve_orders([self.order(f'u{i}').pk for i in range(5)])
+        CountingEmailBackend.opened = 0
+        self.assertEqual(notifications.deliver(batch_size=10), (5, 0, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(Notification.objects.exclude(status='Sent').exists())
+        self.assertEqual(notifications.deliver(), (0, 0, 0))
+
+    @override_settings(EMAIL_BACKEND='inventory.tests.FailingEmailBackend')
+    def test_failures_back_off_then_dead_letter(self):
+        notifications.enqueue([notifications.order_rejected(self.order())])
+        self.assertEqual(notifications.deliver(), (0, 1, 0))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.attempts, 1)
+        self.assertIn('smtp down', notification.last_error)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        # غير مستحقة الآن
+        self.assertEqual(notifications.deliver(), (0, 0, 0))
+        for _ in range(notifications.MAX_ATTEMPTS - 1):
+            Notification.objects.update(next_attempt_at=timezone.now())
+            notifications.deliver()
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'Dead')
+        self.assertEqual(notification.attempts, notifications.MAX_ATTEMPTS)
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        self.user = make_user('buyer')
+        self.client.force_login(self.user)
+        self.products = Product.objects.bulk_create([Product(name=f'p{i}', quantity=5) for i in range(200)])
+        Cart.objects.bulk_create([Cart(user=self.user, product=p, quantity=2) for p in self.products])
+
+    def post(self, data):
+        return self.client.post(reverse('inventory:cart'), data)
+
+    def test_checkout_of_large_cart_uses_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({'action': 'confirm_order'})
+        self.assertRedirects(response, reverse('inventory:order_tracking_view'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.user, status='Pending')
+        self.assertEqual(order.lines.count(), 200)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+
+    def test_checkout_rejects_whole_cart_on_shortage(self):
+        Product.objects.filter(pk=self.products[3].pk).update(quantity=1)
+        response = self.post({'action': 'confirm_order'})
+        self.assertRedirects(response, reverse('inventory:cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 200)
+
+    def test_update_applies_diff_in_bulk(self):
+        items = list(Cart.objects.filter(user=self.user).order_by('pk'))
+        data = {'action': 'update_cart'}
+        for item in items[:100]:
+            data[f'quantity_{item.pk}'] = 3
+        for item in items[100:150]:
+            data[f'quantity_{item.pk}'] = 0
+        data[f'quantity_{items[150].pk}'] = 99
+        with CaptureQueriesContext(connection) as ctx:
+            self.post(data)
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+        quantities = dict(Cart.objects.filter(user=self.user).values_list('pk', 'quantity'))
+        self.assertEqual(len(quantities), 150)
+        self.assertEqual(quantities[items[0].pk], 3)
+        self.assertEqual(quantities[items[150].pk], 2)
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('ward')
+        self.client.force_login(self.user)
+        self.products = [Product.objects.create(name=f'p{i:02d}', quantity=i) for i in range(5)]
+
+    def test_products_pagination_and_fields(self):
+        url = reverse('inventory:api_products')
+        response = self.client.get(url, {'limit': 3, 'fields': 'id,name'})
+        data = response.json()
+        self.assertEqual(data['results'], [{'id': p.pk, 'name': p.name} for p in self.products[:3]])
+        data = self.client.get(url, {'limit': 3, 'fields': 'id,name', 'cursor': data['next_cursor']}).json()
+        self.assertEqual([r['name'] for r in data['results']], ['p03', 'p04'])
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.client.get(url, {'fields': 'id,secret'}).status_code, 400)
+
+    def test_products_not_modified_without_queries(self):
+        url = reverse('inventory:api_products')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('inventory_product' in q['sql'] for q in ctx.captured_queries))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_orders_etag_and_last_modified(self):
+        order = make_order(self.user, self.products[4], 2)
+        make_order(make_user('other'), self.products[4], 1)
+        url = reverse('inventory:api_orders')
+        response = self.client.get(url)
+        [row] = response.json()['results']
+        self.assertEqual(row['lines'], [{'product_id': self.products[4].pk, 'product': 'p04', 'quantity': 2}])
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # الرفض لا يغير أي تاريخ لكنه يغير ETag
+        Order.objects.filter(pk=order.pk).update(status='Rejected')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cart_and_auth(self):
+        Cart.objects.create(user=self.user, product=self.products[3], quantity=2)
+        url = reverse('inventory:api_cart')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['results'][0]['available'], 3)
+        etag = response['ETag']
+        Cart.objects.filter(user=self.user).update(quantity=1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_cart_etag_changes_when_quantities_move_between_items(self):
+        first = Cart.objects.create(user=self.user, product=self.products[3], quantity=2)
+        second = Cart.objects.create(user=self.user, product=self.products[4], quantity=1)
+        url = reverse('inventory:api_cart')
+        etag = self.client.get(url)['ETag']
+        # نفس العدد والمجموع وأحدث عنصر، لكن التمثيل تغير
+        cart.update(self.user, {first.pk: 1, second.pk: 2})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class AsyncViewTests(TestCase):
+    """العروض غير المتزامنة عبر AsyncClient: لا قراءة متزامنة من قاعدة البيانات داخل حلقة الأحداث (الجلسة، المستخدم، الرسائل)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('ward')
+        self.client = AsyncClient()
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name='شاش', quantity=5)
+
+    async def test_dashboard_post_then_get_shows_message(self):
+        url = reverse('inventory:user_dashboard')
+        response = await self.client.post(url, {'product_id': self.product.pk, 'quantity': 2})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        response = await self.client.get(url)
+        self.assertContains(response, 'تمت إضافة المنتج إلى السلة.')
+        self.assertEqual([p.name for p in response.context['products']], ['شاش'])
+        self.assertEqual((await Cart.objects.aget(user=self.user)).quantity, 2)
+        response = await self.client.get(url, {'page': 'x'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        await self.client.get(url)
+        self.assertEqual(catalogue.stats()['hits'], 1)
+
+    async def test_cart_and_tracking(self):
+        await Cart.objects.acreate(user=self.user, product=self.product, quantity=3)
+        response = await self.client.get(reverse('inventory:cart'))
+        self.assertEqual([item.product.name for item in response.context['cart_items']], ['شاش'])
+        response = await self.client.post(reverse('inventory:cart'), {'action': 'confirm_order'})
+        self.assertRedirects(response, reverse('inventory:order_tracking_view'), fetch_redirect_response=False)
+        response = await self.client.get(reverse('inventory:order_tracking_view'))
+        self.assertContains(response, 'تم تأكيد الطلب')
+        [order] = response.context['orders']
+        self.assertEqual(order.total_quantity, 3)
+
+    async def test_admin_section_and_access(self):
+        response = await self.client.get(reverse('inventory:admin_dashboard_section', args=['products']))
+        self.assertEqual(response.status_code, 302)
+        admin = await sync_to_async(make_user)('admin', is_admin=True)
+        await self.client.aforce_login(admin)
+        response = await self.client.get(reverse('inventory:admin_dashboard_section', args=['products']))
+        self.assertEqual([p.name for p in response.context['items']], ['شاش'])
+        self.assertEqual(response['X-Next-Cursor'], '')
+        self.assertEqual((await self.client.get(reverse('inventory:cart'))).status_code, 302)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', is_admin=True, is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.user = make_user('ward')
+        self.product = Product.objects.create(name='=HYPERLINK("x")', quantity=10)
+        self.records = ConsumptionRecord.objects.bulk_create(
+            [ConsumptionRecord(user=self.user, product=self.product, quantity=i + 1) for i in range(1200)])
+
+    def download(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_streams_every_row(self):
+        url = reverse('inventory:export_data', args=['consumption_records', 'csv'])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            content = self.download(response)
+        self.assertIn('attachment; filename="consumption_records-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(rows[0], exports.EXPORTS['consumption_records'].headers)
+        self.assertEqual(len(rows), 1201)
+        self.assertEqual(rows[1][:4], [str(self.records[0].pk), 'ward', "'=HYPERLINK(\"x\")", '1'])
+        # جلسة + مستخدم + استعلام التصدير
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_orders_and_access(self):
+        order = make_order(self.user, self.product, 2, Product.objects.create(name='قطن', quantity=1), 1)
+        rows = list(csv.reader(io.StringIO(self.download(
+            self.client.get(reverse('inventory:export_data', args=['orders', 'csv']))))))
+        self.assertEqual([row[0] for row in rows[1:]], [str(order.pk)] * 2)
+        self.assertEqual(rows[2][2], 'معلق')
+        self.assertEqual(self.client.get(reverse('inventory:export_data', args=['nope', 'csv'])).status_code, 404)
+        if 'xlsx' not in exports.formats():
+            self.assertEqual(self.client.get(reverse('inventory:export_data', args=['orders', 'xlsx'])).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('inventory:export_data', args=['orders', 'csv'])).status_code, 302)
+
+    def test_admin_action_exports_selection(self):
+        response = self.client.post(reverse('admin:inventory_consumptionrecord_changelist'), {
+            'action': 'export_csv', '_selected_action': [self.records[5].pk, self.records[7].pk],
+        })
+        rows = list(csv.reader(io.StringIO(self.download(response))))
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.records[5].pk), str(self.records[7].pk)])
+
+    async def test_asgi_response_is_async(self):
+        client = AsyncClient()
+        await client.aforce_login(self.admin)
+        response = await client.get(reverse('inventory:export_data', args=['reports', 'csv']))
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(b''.join(chunks).decode('utf-8').lstrip('\ufeff').splitlines(),
+                         [','.join(exports.EXPORTS['reports'].headers)])
+
+    @unittest.skipUnless(exports.openpyxl, 'openpyxl غير مثبتة')
+    def test_xlsx(self):
+        response = self.client.get(reverse('inventory:export_data', args=['consumption_records', 'xlsx']))
+        workbook = exports.openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(len(list(workbook.active.rows)), 1201)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, content):
+        path = f'{self.media}/{name}'
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        return path
+
+    def test_csv_upsert_with_local_images(self):
+        from PIL import Image
+        Image.new('RGB', (50, 50), (0, 90, 200)).save(f'{self.media}/gauze.png')
+        Product.objects.create(name='شاش', category='consumables', quantity=1, description='قديم')
+        rows = ['name,description,quantity,category,image', 'شاش,معقم,40,consumables,gauze.png',
+                'قطن طبي,,12,consumables,', 'مقص,,x,medical_tools,', 'ميزان,,3,medical_tools,missing.png']
+        rows += [f'منتج {i},,{i},consumables,' for i in range(300)]
+        path = self.write('catalogue.csv', '\n'.join(rows))
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('import_products', path, '--chunk-size', '100', stdout=io.StringIO(), stderr=io.StringIO())
+        job = ProductImport.objects.get()
+        self.assertEqual((job.status, job.rows_done, job.created, job.updated, job.failed), ('Done', 304, 302, 1, 1))
+        # عدد الاستعلامات يتبع عدد الدفعات (4) لا عدد الصفوف
+        self.assertLess(len(ctx.captured_queries), 80)
+        gauze = Product.objects.get(name='شاش')
+        self.assertEqual((gauze.quantity, gauze.description, gauze.thumbnails), (40, 'معقم', {}))
+        self.assertTrue(default_storage.exists(gauze.image.name))
+        self.assertFalse(Product.objects.get(name='ميزان').image)
+        self.assertEqual(job.errors[0]['row'], 3)
+        self.assertIn('missing.png', str(job.errors))
+        self.assertEqual([p.name for p in search.get_backend().search(Product.objects.all(), 'قطن')], ['قطن طبي'])
+
+    def test_resume_after_interrupted_chunk(self):
+        path = self.write('items.jsonl', '\n'.join(
+            json.dumps({'name': f'p{i}', 'quantity': i, 'category': 'consumables'}) for i in range(5)))
+        with open(path, 'rb') as stream:
+            job = imports.start(path, imports.checksum(stream), 'jsonl')
+
+            def crash(job, rate):
+                raise KeyboardInterrupt
+
+            with self.assertRaises(KeyboardInterrupt):
+                imports.run(job, stream, chunk_size=2, progress=crash)
+        with open(path, 'rb') as stream:
+            resumed = imports.start(path, imports.checksum(stream), 'jsonl')
+            self.assertEqual((resumed.pk, resumed.rows_done), (job.pk, 2))
+            imports.run(resumed, stream, chunk_size=2)
+        self.assertEqual(sorted(Product.objects.values_list('name', flat=True)), [f'p{i}' for i in range(5)])
+        self.assertEqual((resumed.created, resumed.status), (5, 'Done'))
+
+    def test_json_array_is_read_incrementally(self):
+        rows = [{'name': f'منتج "{i}"', 'quantity': i} for i in range(20)]
+        text = io.StringIO(' ' + json.dumps(rows, ensure_ascii=False, indent=1))
+        self.assertEqual(list(imports._json_array(text, block_size=7)), rows)
+        with self.assertRaises(imports.ImportFailed):
+            list(imports._json_array(io.StringIO('[{"name": "x"'), block_size=4))
+
+    def test_add_and_edit_product_respect_category_name_constraint(self):
+        # مفتاح الـ upsert قيد فريد، فالإضافة والتعديل من لوحة المدير يرفضان التكرار داخل الفئة
+        gauze = Product.objects.create(name='شاش', category='consumables', quantity=1)
+        scissors = Product.objects.create(name='مقص', category='consumables', quantity=1)
+        self.client.force_login(make_user('admin', is_admin=True))
+        data = {'name': 'شاش', 'description': '', 'quantity': 5, 'category': 'consumables'}
+        response = self.client.post(reverse('inventory:add_product'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        form = ProductForm(data, instance=scissors)
+        self.assertFalse(form.is_valid())
+        self.assertTrue(form.non_field_errors())
+        # نفس الاسم في فئة أخرى، أو حفظ المنتج باسمه الحالي، مقبولان
+        self.assertEqual(self.client.post(reverse('inventory:add_product'),
+                                          {**data, 'category': 'medical_tools'}).status_code, 302)
+        self.assertEqual(self.client.post(reverse('inventory:edit_product', args=[gauze.pk]), data).status_code, 302)
+        self.assertEqual(Product.objects.filter(name='شاش').count(), 2)
+
+    def test_admin_upload(self):
+        admin = make_user('root', is_admin=True, is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('items.json', json.dumps(
+            [{'name': 'شاش', 'quantity': 4, 'category': 'consumables', 'image': '/etc/passwd'}]).encode())
+        response = self.client.post(reverse('admin:inventory_product_import'), {'file': upload})
+        job = ProductImport.objects.get()
+        self.assertRedirects(response, reverse('admin:inventory_productimport_change', args=[job.pk]),
+                             fetch_redirect_response=False)
+        # الاستيراد نفسه في مهمة بالخلفية
+        self.assertEqual((job.rows_done, Job.objects.get().params), (0, {'import_id': job.pk}))
+        jobs.work()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created, job.uploaded), ('Done', 1, True))
+        # الصور المحلية غير مسموحة في الرفع من اللوحة
+        self.assertFalse(Product.objects.get().image)
+        self.assertIn('http', str(job.errors))
+
+
+class SeedingTests(TestCase):
+    def test_seed_is_consistent_and_backdated(self):
+        counts = seeding.seed(2000, days=60, seed=1)
+        self.assertEqual(CustomUser.objects.filter(username__startswith=seeding.USER_PREFIX).count(), counts['users'])
+        self.assertEqual(Order.objects.count(), counts['orders'])
+        self.assertEqual(OrderLine.objects.count(), counts['order_lines'])
+        # سجل استهلاك لكل بند في طلب موافق عليه، بتاريخ الموافقة
+        self.assertEqual(ConsumptionRecord.objects.count(),
+                         OrderLine.objects.filter(order__status='Approved').count())
+        self.assertEqual(ConsumptionRecord.objects.aggregate(n=Sum('quantity'))['n'],
+                         DailyProductConsumption.objects.aggregate(n=Sum('quantity'))['n'])
+        self.assertTrue(Report.objects.exists())
+        # دفتر الحركات يطابق الكميات المولدة، واللقطات الأسبوعية مأخوذة منه
+        self.assertEqual(ledger.drift(), {})
+        self.assertTrue(StockSnapshot.objects.exists())
+        oldest = Order.objects.order_by('pk').first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(days=50))
+        self.assertLessEqual(oldest.created_at, Order.objects.order_by('-pk').first().created_at)
+        # auto_now_add يعود بعد التوليد
+        self.assertTrue(Order._meta.get_field('created_at').auto_now_add)
+        self.assertTrue(self.client.login(username=seeding.ADMIN_USERNAME, password=seeding.PASSWORD))
+
+    def test_url_benchmark_covers_every_url(self):
+        from . import benchmarks, urls
+        logger = logging.getLogger('django.request')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.CRITICAL)
+        result = benchmarks.url_suite(size=1000, repeat=2)
+        covered = {key.split('[')[0] for key in result['urls']} | set(result['skipped'])
+        self.assertEqual(covered, {pattern.name for pattern in urls.urlpatterns})
+        dashboard = result['urls']['user_dashboard[get]']
+        self.assertEqual((dashboard['status'], dashboard['latency']['count']), ([200], 2))
+        self.assertGreater(dashboard['peak_memory_kb'], 0)
+        self.assertEqual(result['urls']['approve_order[get]']['status'], [302])
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.registry.clear()
+        patcher = unittest.mock.patch.object(instrumentation, 'SAMPLE_RATE', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = make_user('ali')
+        self.product = Product.objects.create(name='شاش', quantity=5)
+
+    def metrics(self):
+        response = self.client.get(reverse('inventory:metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_sampled_request_metrics_by_url_name(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('inventory.instrumentation', 'INFO') as logs:
+            self.client.get(reverse('inventory:cart'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['view'], line['status']), ('inventory:cart', 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+        text = self.metrics()
+        self.assertIn('inventory_requests_total{method="GET",status="200",view="inventory:cart"} 1', text)
+        self.assertIn('inventory_request_duration_seconds_bucket{view="inventory:cart",le="+Inf"} 1', text)
+        self.assertIn(f'inventory_db_queries_sum{{view="inventory:cart"}} {line["queries"]}', text)
+
+    async def test_async_view_queries_are_counted(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with self.assertLogs('inventory.instrumentation', 'INFO') as logs:
+            await client.get(reverse('inventory:user_dashboard'))
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['view'], 'inventory:user_dashboard')
+        self.assertGreater(line['queries'], 0)
+
+    def test_duplicate_queries_are_flagged(self):
+        def view(request):
+            for _ in range(6):
+                Product.objects.filter(pk=self.product.pk).first()
+            return HttpResponse()
+
+        middleware = instrumentation.InstrumentationMiddleware(view)
+        with self.assertLogs('inventory.instrumentation', 'WARNING') as logs:
+            middleware(RequestFactory().get('/x/'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['duplicate_queries']['count'], 6)
+        self.assertIn('inventory_duplicate_query_requests_total{view="unresolved"} 1', self.metrics())
+
+    def test_unsampled_requests_skip_details(self):
+        with unittest.mock.patch.object(instrumentation, 'SAMPLE_RATE', 0):
+            self.client.get(reverse('inventory:login'))
+        text = self.metrics()
+        self.assertIn('view="inventory:login"', text)
+        self.assertNotIn('inventory_sampled_requests_total{view="inventory:login"}', text)
+
+    def test_catalogue_cache_counters_are_published(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.client.get(reverse('inventory:user_dashboard'))
+        self.client.get(reverse('inventory:user_dashboard'))
+        text = self.metrics()
+        self.assertIn('inventory_catalogue_hits_total 1\n', text)
+        self.assertIn('inventory_catalogue_misses_total 1\n', text)
+
+    def test_metrics_endpoint_is_local_only(self):
+        response = self.client.get(reverse('inventory:metrics'), REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(response.status_code, 404)
+
+
+class SqliteTuningTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        values = database.pragmas(connection)
+        self.assertEqual(values['synchronous'], 1) # NORMAL
+        self.assertEqual(values['busy_timeout'], database.PRAGMAS['busy_timeout'])
+
+    def test_file_database_switches_to_wal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        default = connections['default']
+        wrapper = type(default)({**default.settings_dict, 'NAME': f'{directory}/db.sqlite3'}, 'tuning')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        self.assertEqual(database.pragmas(wrapper)['journal_mode'], 'wal')
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('root', is_admin=True)
+
+    def test_authenticated_request_needs_no_queries_before_view(self):
+        self.client.force_login(self.admin)
+        url = reverse('inventory:add_product') # عرض بلا استعلامات في جسمه
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    async def test_async_lookup_is_cached(self):
+        backend = auth.CachedModelBackend()
+        await backend.aget_user(self.admin.pk)
+        # update() لا يرسل إشارات، فالنسخة المخزنة تبقى حتى invalidate
+        await CustomUser.objects.filter(pk=self.admin.pk).aupdate(is_admin=False)
+        self.assertTrue((await backend.aget_user(self.admin.pk)).is_admin)
+        await sync_to_async(auth.invalidate)(self.admin.pk)
+        self.assertFalse((await backend.aget_user(self.admin.pk)).is_admin)
+
+    def test_approval_and_admin_changes_invalidate(self):
+        pending = make_user('nour', is_approved=False)
+        client = self.client_class()
+        client.force_login(pending)
+        dashboard = reverse('inventory:user_dashboard')
+        self.assertEqual(client.get(dashboard).status_code, 302)
+
+        self.client.force_login(self.admin)
+        self.client.get(reverse('inventory:user_approve', args=[pending.pk]))
+        self.assertEqual(client.get(dashboard).status_code, 200)
+
+        # تعديل من لوحة Django (حفظ النموذج) يسحب الموافقة فوراً
+        pending.refresh_from_db()
+        pending.is_approved = False
+        pending.save()
+        self.assertEqual(client.get(dashboard).status_code, 302)
+
+        self.client.get(reverse('inventory:user_reject', args=[pending.pk]))
+        self.assertIsNone(auth.CachedModelBackend().get_user(pending.pk))
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.user = make_user('sara')
+
+    def test_quantity_changes_are_recorded(self):
+        product = Product.objects.create(name='شاش', category='consumables', quantity=10)
+        product = Product.objects.get(pk=product.pk)
+        product.quantity = 15
+        product.save()
+        product.description = 'معقم'
+        product.save(update_fields=['description'])
+        stock.approve_order(make_order(self.user, product, 4).pk)
+        movements = list(StockMovement.objects.order_by('pk').values_list('kind', 'delta'))
+        self.assertEqual(movements, [(StockMovement.RECEIPT, 10), (StockMovement.ADJUSTMENT, 5),
+                                     (StockMovement.CONSUMPTION, -4)])
+        self.assertEqual(StockMovement.objects.get(kind=StockMovement.CONSUMPTION).user, self.user)
+        self.assertEqual(ledger.drift(), {})
+        # التعديل بـ update لا يمر بالدفتر ويظهر في التحقق
+        Product.objects.filter(pk=product.pk).update(quantity=1)
+        self.assertEqual(ledger.drift(), {product.pk: (11, 1)})
+        with self.assertRaises(CommandError):
+            call_command('snapshot_stock', '--check', stdout=io.StringIO())
+
+    def test_import_records_receipts_and_adjustments(self):
+        Product.objects.create(name='قطن طبي', category='consumables', quantity=30)
+        job = ProductImport.objects.create(source='catalogue.csv', format='csv', checksum='x')
+        imports.run(job, io.BytesIO('name,quantity,category\nقطن طبي,12,consumables\nحقن,7,consumables\n'.encode()))
+        movements = StockMovement.objects.filter(note=f'استيراد #{job.pk}').order_by('product__name')
+        self.assertEqual(list(movements.values_list('product__name', 'kind', 'delta')),
+                         [('حقن', StockMovement.RECEIPT, 7), ('قطن طبي', StockMovement.ADJUSTMENT, -18)])
+        self.assertEqual(ledger.drift(), {})
+
+    def test_history_from_snapshots_matches_replay(self):
+        product = Product.objects.bulk_create([Product(name='حقن', quantity=0)])[0]
+        start = timezone.now() - timedelta(days=200)
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, kind=StockMovement.RECEIPT if i % 5 == 0 else StockMovement.CONSUMPTION,
+                          delta=20 if i % 5 == 0 else -3, created_at=start + timedelta(hours=12 * i))
+            for i in range(400)
+        ])
+        points = [start + timedelta(days=d, hours=5) for d in (0, 3, 45, 90, 150, 199)]
+        expected = [ledger.replay_at(product, when) for when in points]
+        self.assertEqual(expected[1], 20 - 3 * 4 + 20 - 3) # 7 حركات حتى اليوم الثالث
+
+        ledger.backfill(start, start + timedelta(days=200))
+        self.assertEqual(StockSnapshot.objects.count(), 201)
+        deleted = ledger.compact(start + timedelta(days=120))
+        self.assertEqual(StockSnapshot.objects.count(), 201 - deleted)
+        self.assertLessEqual(StockSnapshot.objects.filter(taken_at__lt=start + timedelta(days=120)).count(), 6)
+        self.assertEqual([ledger.stock_at(product, when) for when in points], expected)
+        with CaptureQueriesContext(connection) as ctx:
+            levels = ledger.levels_at(points[-1])
+        self.assertEqual((len(ctx.captured_queries), levels), (1, {product.pk: expected[-1]}))
+
+
+class ReorderEngineTests(TestCase):
+    def setUp(self):
+        self.user = make_user('sara')
+        self.admin = make_user('root', is_admin=True, email='root@example.com')
+        self.product = Product.objects.create(name='قفازات', category='consumables', quantity=1000)
+
+    def test_incremental_velocity_matches_rebuild_from_history(self):
+        start = timezone.now() - timedelta(days=30)
+        remaining = self.product.quantity
+        StockLevel.objects.all().delete() # يبدأ المعدل من أول استهلاك قبل 30 يوماً
+        for day, quantity in [(0, 10), (0, 5), (1, 20), (4, 8), (9, 30), (20, 12), (29, 7), (30, 3)]:
+            now = start + timedelta(days=day)
+            remaining -= quantity
+            reorder.record_consumption(now, {self.product.pk: quantity}, {self.product.pk: remaining})
+            analytics.record_consumption(timezone.localdate(now), {(self.user.pk, self.product.pk): quantity})
+        Product.objects.filter(pk=self.product.pk).update(quantity=remaining)
+        end = start + timedelta(days=35)
+        reorder.refresh(now=end)
+        incremental = StockLevel.objects.get(pk=self.product.pk)
+        reorder.rebuild(now=end)
+        rebuilt = StockLevel.objects.get(pk=self.product.pk)
+        self.assertGreater(incremental.velocity, 0)
+        self.assertAlmostEqual(incremental.velocity, rebuilt.velocity, places=6)
+        self.assertAlmostEqual(incremental.days_of_cover, remaining / incremental.velocity, places=1)
+
+    def test_approval_flags_low_stock_and_alerts_once(self):
+        level = StockLevel.objects.get(pk=self.product.pk)
+        level.velocity, level.window_day = 40.0, timezone.localdate() # 40 وحدة يومياً، الحد 40 × (7 + 3)
+        level.save()
+        stock.approve_order(make_order(self.user, self.product, 700).pk)
+        level.refresh_from_db()
+        self.assertEqual((level.threshold, level.is_low), (400, True))
+        self.assertAlmostEqual(level.days_of_cover, 7.5)
+        with CaptureQueriesContext(connection) as ctx:
+            low = list(reorder.low_stock())
+        self.assertEqual(([item.product.name for item in low], len(ctx.captured_queries)), (['قفازات'], 1))
+
+        out = io.StringIO()
+        call_command('check_stock', stdout=out)
+        call_command('check_stock', stdout=out)
+        alerts = Notification.objects.filter(recipient='root@example.com')
+        self.assertEqual(alerts.count(), 1)
+        self.assertIn('قفازات', alerts.get().body)
+        # إعادة التعبئة تزيل العلامة، والانخفاض التالي يُنبه عنه من جديد
+        product = Product.objects.get(pk=self.product.pk)
+        product.quantity = 900
+        product.save()
+        level.refresh_from_db()
+        self.assertEqual((level.is_low, level.alerted_at), (False, None))
+
+    def test_dashboard_lists_precomputed_low_stock(self):
+        Product.objects.create(name='كمامات', category='consumables', quantity=2)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('inventory:admin_dashboard'))
+        self.assertEqual([level.product.name for level in response.context['low_stock_products_admin']], ['كمامات'])
+        self.assertContains(response, 'كمامات')
+
+
+@unittest.skipUnless(forecasting.available(), 'numpy غير مثبتة')
+class DemandForecastTests(TestCase):
+    def test_fit_picks_method_per_product(self):
+        import numpy as np
+        months = 36
+        first = forecasting.month_index('2023-01')
+        calendar = np.arange(months) % 12
+        history = np.array([
+            np.full(months, 10.0),                          # ثابت
+            np.where(calendar < 2, 40.0, 4.0),              # ذروة في يناير وفبراير
+            np.linspace(0, 35, months),                     # متزايد
+        ])
+        forecast, seasonal, error = forecasting.fit(history, first, horizon=3) # يناير-مارس 2026
+        self.assertEqual(seasonal.tolist(), [False, True, False])
+        np.testing.assert_allclose(forecast[0], [10, 10, 10])
+        self.assertGreater(forecast[1, 0], 30)
+        self.assertLess(forecast[1, 2], 10)
+        np.testing.assert_allclose(forecast[2], [34, 34, 34])
+        self.assertEqual(error[0], 0)
+
+    def test_command_writes_forecasts_for_dashboard(self):
+        user = make_user('sara')
+        admin = make_user('root', is_admin=True)
+        gloves = Product.objects.create(name='قفازات', category='consumables', quantity=5)
+        masks = Product.objects.create(name='كمامات', category='consumables', quantity=500)
+        current = forecasting.month_index(reports.month_key())
+        Report.objects.bulk_create([
+            Report(user=user, product=product, month=forecasting.month_key(current - age), consumed=consumed, remaining=0)
+            for age in range(1, 13) for product, consumed in ((gloves, 30), (masks, 6))
+        ] + [Report(user=admin, product=gloves, month=forecasting.month_key(current - 1), consumed=15, remaining=0)])
+        with CaptureQueriesContext(connection) as ctx:
+            forecasting.load(current - 36, current - 1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        call_command('forecast_demand', stdout=io.StringIO())
+        self.assertEqual(DemandForecast.objects.count(), 6)
+        current_month = {f.product_id: f for f in DemandForecast.objects.filter(month=reports.month_key())}
+        self.assertEqual((current_month[gloves.pk].quantity, current_month[masks.pk].quantity), (35, 6))
+        self.client.force_login(admin)
+        response = self.client.get(reverse('inventory:admin_dashboard'))
+        rows = [(f.product.name, f.shortfall) for f in response.context['demand_forecast_admin']]
+        self.assertEqual(rows, [('قفازات', 30), ('كمامات', 0)])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', is_admin=True)
+        self.product = Product.objects.create(name='gloves', quantity=100)
+        self.order_ids = [make_order(make_user(f'u{i}'), self.product, 1).pk for i in range(5)]
+
+    def test_idempotency_key_and_pending_cancel(self):
+        job, created = jobs.enqueue('approve_orders', {'order_ids': self.order_ids}, key='approve:1')
+        again, created_again = jobs.enqueue('approve_orders', {'order_ids': self.order_ids[:1]}, key='approve:1')
+        self.assertEqual((created, created_again, again.pk), (True, False, job.pk))
+        with self.assertRaises(ValueError):
+            jobs.enqueue('unknown')
+        self.assertTrue(jobs.cancel(job.pk))
+        self.assertEqual(jobs.work(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Cancelled')
+        self.assertFalse(jobs.cancel(job.pk))
+        self.assertEqual(Order.objects.filter(status='Approved').count(), 0)
+
+    def test_running_job_stops_at_next_progress_after_cancel(self):
+        job, _ = jobs.enqueue('approve_orders', {'order_ids': self.order_ids})
+        approve = stock.approve_orders
+
+        def approve_then_cancel(order_ids):
+            results = approve(order_ids)
+            jobs.cancel(job.pk)
+            return results
+
+        with unittest.mock.patch.object(jobs, 'APPROVAL_BATCH', 2), \
+                unittest.mock.patch.object(stock, 'approve_orders', approve_then_cancel):
+            jobs.work()
+        job.refresh_from_db()
+        # الدفعة الأولى التزمت قبل طلب الإلغاء وتبقى، والتقدم يسجلها
+        self.assertEqual((job.status, job.progress, job.total), ('Cancelled', 2, 5))
+        self.assertEqual(Order.objects.filter(status='Approved').count(), 2)
+
+    def test_expired_lease_is_reclaimed_then_failed(self):
+        job, _ = jobs.enqueue('rebuild_reports')
+        first = jobs.claim()
+        self.assertEqual((first.pk, first.attempts, jobs.claim()), (job.pk, 1, None))
+        # العامل توقف: تنتهي مهلة حجزه فيستعيدها عامل آخر، والأول يفقد ملكيتها
+        later = timezone.now() + timedelta(seconds=jobs.LEASE + 1)
+        second = jobs.claim(later)
+        self.assertEqual(second.attempts, 2)
+        with self.assertRaises(jobs.Cancelled):
+            jobs.Progress(first)(1)
+        with unittest.mock.patch.object(jobs, 'MAX_ATTEMPTS', 2):
+            self.assertIsNone(jobs.claim(later + timedelta(seconds=jobs.LEASE + 1)))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Failed')
+
+    def test_handler_error_fails_job(self):
+        job, _ = jobs.enqueue('export', {'name': 'missing', 'fmt': 'csv'})
+        with self.assertLogs('inventory.jobs', 'ERROR'):
+            jobs.work()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Failed')
+        self.assertIn('KeyError', job.error)
+
+    def test_eager_runs_after_commit(self):
+        with unittest.mock.patch.object(jobs, 'EAGER', True), self.captureOnCommitCallbacks(execute=True):
+            job, _ = jobs.enqueue('approve_orders', {'order_ids': self.order_ids})
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Done')
+        self.assertEqual(Order.objects.filter(status='Approved').count(), 5)
+
+    def test_dashboard_export_job_and_download(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.client.force_login(self.admin)
+        with override_settings(MEDIA_ROOT=media):
+            response = self.client.post(reverse('inventory:export_data', args=['orders', 'csv']), {'job_token': 't'})
+            self.assertRedirects(response, reverse('inventory:admin_dashboard'), fetch_redirect_response=False)
+            jobs.work()
+            job = Job.objects.get()
+            self.assertEqual((job.kind, job.status, job.result['rows']), ('export', 'Done', 5))
+            section = self.client.get(reverse('inventory:admin_dashboard_section', args=['jobs'])).content.decode()
+            self.assertIn(reverse('inventory:download_job', args=[job.pk]), section)
+            response = self.client.get(reverse('inventory:download_job', args=[job.pk]))
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual((rows[0], len(rows)), (exports.EXPORTS['orders'].headers, 6))
+        self.assertNotIn(media, job.result['path'])
+
+    def test_purge_deletes_export_files(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with override_settings(MEDIA_ROOT=media):
+            job, _ = jobs.enqueue('export', {'name': 'orders', 'fmt': 'csv'})
+            jobs.work()
+            job.refresh_from_db()
+            self.assertTrue(default_storage.exists(job.result['path']))
+            self.assertEqual(jobs.purge(timezone.now() - timedelta(days=1)), 0)
+            self.assertEqual(jobs.purge(timezone.now() + timedelta(seconds=1)), 1)
+            self.assertFalse(default_storage.exists(job.result['path']))
+
+    def test_dashboard_maintenance_buttons(self):
+        self.client.force_login(self.admin)
+        content = self.client.get(reverse('inventory:admin_dashboard')).content.decode()
+        self.assertIn(reverse('inventory:start_job', args=['rebuild_reports']), content)
+        for _ in range(2):
+            self.client.post(reverse('inventory:start_job', args=['rebuild_reports']), {'job_token': 'x'})
+        self.assertEqual(Job.objects.filter(kind='rebuild_reports').count(), 1)
+        self.assertEqual(self.client.post(reverse('inventory:start_job', args=['export'])).status_code, 404)
+        job = Job.objects.get()
+        self.client.post(reverse('inventory:cancel_job', args=[job.pk]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Cancelled')
+        self.client.force_login(make_user('plain'))
+        self.assertEqual(self.client.get(reverse('inventory:download_job', args=[job.pk])).status_code, 302)
+
+
+class RunWorkersCommandTests(TransactionTestCase):
+    def test_thread_pool_drains_queue(self):
+        product = Product.objects.create(name='gloves', quantity=100)
+        for i in range(4):
+            orders = [make_order(make_user(f'u{i}-{j}'), product, 1).pk for j in range(3)]
+            jobs.enqueue('approve_orders', {'order_ids': orders})
+        jobs.enqueue('rebuild_reports')
+        out = io.StringIO()
+        # خيط واحد: قاعدة الاختبار في الذاكرة (shared cache) لا تنتظر الأقفال بين الاتصالات كما يفعل ملف SQLite
+        call_command('run_workers', workers=1, stdout=out)
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'Done'})
+        self.assertEqual(Order.objects.filter(status='Approved').count(), 12)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 88)
+        self.assertIn('5', out.getvalue())
+
+
+class OrderEventTests(TransactionTestCase):
+    """بث الأحداث: النشر بعد الالتزام فقط، والاتصال يستقبل الأحداث عبر تطبيق ASGI."""
+
+    def test_publish_after_commit(self):
+        broker = events.InProcessBroker()
+
+        def publish_in_transactions():
+            with unittest.mock.patch.object(events, '_broker', broker), \
+                    unittest.mock.patch.object(broker, 'publish', wraps=broker.publish) as publish:
+                with transaction.atomic():
+                    events.publish_on_commit(events.ADMINS, {'type': 'order.created', 'order_id': 1})
+                    # محجوز حتى الالتزام
+                    held = publish.call_count
+                with transaction.atomic():
+                    events.publish_on_commit(events.ADMINS, {'type': 'order.created', 'order_id': 2})
+                    transaction.set_rollback(True)
+                return held, publish.call_count
+
+        async def scenario():
+            subscription = broker.subscribe([events.ADMINS])
+            published = await sync_to_async(publish_in_transactions)()
+            event = await asyncio.wait_for(subscription.get(), 1)
+            # المعاملة الملغاة لا تنشر شيئاً
+            pending = subscription.queue.qsize()
+            subscription.close()
+            return published, event, pending, broker.subscriber_count()
+
+        published, event, pending, remaining = asyncio.run(scenario())
+        self.assertEqual(published, (0, 1))
+        self.assertEqual((event['type'], event['order_id'], pending, remaining), ('order.created', 1, 0, 0))
+
+    def test_checkout_and_approval_reach_subscribers(self):
+        user = make_user('ward')
+        product = Product.objects.create(name='شاش', quantity=5)
+        Cart.objects.create(user=user, product=product, quantity=2)
+
+        async def scenario():
+            subscription = events.get_broker().subscribe([events.user_channel(user.pk)])
+            result = await sync_to_async(cart.checkout)(user)
+            created = await asyncio.wait_for(subscription.get(), 1)
+            await sync_to_async(stock.approve_order)(result.order.pk)
+            status = await asyncio.wait_for(subscription.get(), 1)
+            subscription.close()
+            return created, status
+
+        created, status = asyncio.run(scenario())
+        self.assertEqual((created['type'], created['lines']), ('order.created', 1))
+        self.assertEqual((status['type'], status['status']), ('order.status', 'Approved'))
+
+    def test_stream_endpoint(self):
+        user = make_user('ward')
+        self.assertEqual(asyncio.run(AsyncClient().get(reverse('inventory:order_events'))).status_code, 401)
+        client = AsyncClient()
+        client.force_login(user)
+
+        async def scenario():
+            response = await client.get(reverse('inventory:order_events'))
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            while not events.get_broker().subscriber_count():
+                await asyncio.sleep(0)
+                await asyncio.sleep(0.01)
+            events.get_broker().publish(events.user_channel(user.pk), {'type': 'order.status', 'order_id': 7})
+            frame = await asyncio.wait_for(anext(chunks), 1)
+            await chunks.aclose()
+            return response, first, frame
+
+        response, first, frame = asyncio.run(scenario())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(first.startswith(b'retry:'))
+        self.assertIn(b'event: order.status', frame)
+        self.assertEqual(events.get_broker().subscriber_count(), 0)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, instrumentation, views
 
 app_name = 'inventory' # هذا هو السطر الجديد الذي يجب إضافته لتحديد الـ namespace
 
@@ -13,18 +13,33 @@ urlpatterns = [
     path('place_order/<int:product_id>/', views.place_order, name='place_order'), # تقديم طلب لمنتج
     path('cart/', views.cart_view, name='cart'), # صفحة السلة
     path('order_tracking/', views.order_tracking_view, name='order_tracking_view'), # صفحة تتبع الطلبات
+    path('events/orders/', views.order_events, name='order_events'), # بث تغيرات الطلبات (SSE)
 
     # روابط لوحة تحكم المدير
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'), # لوحة تحكم المدير
+    path('admin_dashboard/sections/<slug:section>/', views.admin_dashboard_section, name='admin_dashboard_section'), # أقسام لوحة المدير بصفحات
     path('admin/users/<int:user_id>/approve/', views.user_approve, name='user_approve'), # موافقة على مستخدم (تم تغيير الاسم)
     path('admin/users/<int:user_id>/reject/', views.user_reject, name='user_reject'), # رفض مستخدم (تم تغيير الاسم)
     path('admin/orders/<int:order_id>/approve/', views.approve_order, name='approve_order'), # موافقة على طلب (تم تغيير الاسم)
+    path('admin/orders/approve/', views.approve_orders_bulk, name='approve_orders_bulk'), # موافقة جماعية على الطلبات المحددة
     path('admin/orders/<int:order_id>/reject/', views.reject_order, name='reject_order'), # رفض طلب (تم تغيير الاسم)
+    path('admin_dashboard/exports/<slug:name>.<slug:fmt>', views.export_data, name='export_data'), # تصدير CSV/XLSX
+    path('admin_dashboard/jobs/<slug:kind>/start/', views.start_job, name='start_job'), # بدء مهمة صيانة في الخلفية
+    path('admin_dashboard/jobs/<int:job_id>/cancel/', views.cancel_job, name='cancel_job'), # إلغاء مهمة
+    path('admin_dashboard/jobs/<int:job_id>/download/', views.download_job, name='download_job'), # تنزيل ملف مهمة تصدير
     path('admin/products/add/', views.add_product, name='add_product'), # إضافة منتج (تم تغيير الاسم)
     path('admin/products/edit/<int:product_id>/', views.edit_product, name='edit_product'), # تعديل منتج (تم تغيير الاسم)
     path('admin/products/delete/<int:product_id>/', views.delete_product, name='delete_product'), # حذف منتج (تم تغيير الاسم)
 
+    # واجهة JSON للقراءة فقط (انظر api.py)
+    path('api/v1/products/', api.products, name='api_products'), # كتالوج المنتجات
+    path('api/v1/orders/', api.orders, name='api_orders'), # طلبات المستخدم
+    path('api/v1/cart/', api.cart, name='api_cart'), # سلة المستخدم
+
     # روابط الملف الشخصي الجديدة
     path('profile/', views.user_profile_view, name='user_profile_view'), # ملف شخصي للمستخدم العادي
     path('admin/profile/', views.admin_profile_view, name='admin_profile_view'), # ملف شخصي للمدير
+
+    # مقاييس Prometheus (للعناوين المحلية فقط، انظر instrumentation.py)
+    path('metrics/', instrumentation.metrics_view, name='metrics'),
 ]
@@ -1,22 +1,51 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import authenticate, login, logout, get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Sum
 from datetime import datetime, timedelta
+import asyncio
 import calendar
+import secrets
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.utils import timezone
+from django.core.files.storage import default_storage
+from django.db import transaction
 
 # استيراد CustomUser والنماذج الأخرى
-from .models import Product, Order, ConsumptionRecord, CustomUser, Cart, Report
+from .models import Product, Order, CustomUser, Cart, Job
 from .forms import RegisterForm, ProductForm
+from .dashboard import SECTIONS, PAGE_SIZE as DASHBOARD_PAGE_SIZE
+from .pagination import akeyset_page, InvalidCursor
+from . import analytics, cart, catalogue, events, exports, forecasting, jobs, notifications, reorder, search, stock
+
+# الفاصل (بالثواني) بين رسائل الإبقاء على اتصال بث الأحداث حتى لا تغلقه الوسائط
+EVENTS_HEARTBEAT = getattr(settings, 'INVENTORY_EVENTS_HEARTBEAT', 25)
+# عدد الطلبات التي تُجلب (مع بنودها) في كل دفعة من دفعات صفحة تتبع الطلبات
+ORDERS_CHUNK_SIZE = getattr(settings, 'INVENTORY_ORDERS_CHUNK_SIZE', 500)
 
 # دالة مساعدة للتحقق مما إذا كان المستخدم أدمن
 def is_admin(user):
     """يتحقق مما إذا كان المستخدم لديه صلاحيات المدير."""
     return user.is_admin
 
+# نسخ غير متزامنة من شروط الوصول للعروض غير المتزامنة
+async def _ais_admin(user):
+    return user.is_admin
+
+async def _ais_approved(user):
+    return user.is_approved if not user.is_admin else True
+
+async def _auser(request):
+    """
+    يحمّل المستخدم (ومعه الجلسة) بالواجهة غير المتزامنة ويثبته في request.user،
+    فلا تحتاج القوالب ومعالجات السياق والرسائل إلى قراءة متزامنة من قاعدة البيانات داخل حلقة الأحداث.
+    """
+    request.user = await request.auser()
+    return request.user
+
 # 👤 عرض صفحة تسجيل الدخول
 def login_view(request):
     """
@@ -87,111 +116,152 @@ def logout_view(request):
 
 # 🛒 لوحة تحكم المستخدم
 @login_required
-# التحقق من is_approved مباشرة من request.user لغير المديرين
-@user_passes_test(lambda u: u.is_approved if not u.is_admin else True, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
-def user_dashboard(request): # تم تغيير اسم الدالة من dashboard إلى user_dashboard
+# التحقق من is_approved مباشرة من المستخدم لغير المديرين (دالة غير متزامنة فلا يحتاج المزخرف إلى خيط)
+@user_passes_test(_ais_approved, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
+async def user_dashboard(request): # تم تغيير اسم الدالة من dashboard إلى user_dashboard
     """
     يعرض لوحة تحكم المستخدم مع المنتجات المتاحة،
     ويعالج إضافة المنتجات إلى السلة.
     """
+    await _auser(request)
+    if request.method == 'POST':
+        # الإضافة للسلة ورسائلها تستخدم واجهات متزامنة (المعاملات، الجلسة) فتعمل في خيط
+        return await sync_to_async(_add_to_cart)(request)
+
     # إضافة منطق تصفية المنتجات حسب الفئة والبحث
     category = request.GET.get('category', 'all')
     query = request.GET.get('q', '')
-    products = Product.objects.all()
-    if category != 'all':
-        products = products.filter(category=category)
-    if query:
-        products = products.filter(name__icontains=query)
-    
-    if request.method == 'POST':
-        product_id = request.POST['product_id']
-        quantity = int(request.POST['quantity'])
-        product = get_object_or_404(Product, id=product_id)
-        
-        if quantity > 0 and quantity <= product.quantity:
-            # إضافة المنتج إلى سلة التسوق (Cart) أو تحديث الكمية إذا كان موجودًا
-            cart_item, created = Cart.objects.get_or_create(
-                user=request.user, 
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
-            messages.success(request, 'تمت إضافة المنتج إلى السلة.')
-        else:
-            messages.error(request, 'الكمية غير متوفرة أو غير صالحة.')
-        return redirect('inventory:user_dashboard') # تم التحديث لاستخدام الـ namespace
 
-    return render(request, 'inventory/user_dashboard.html', {'products': products, 'category': category, 'query': query})
+    def catalogue_queryset():
+        products = Product.objects.order_by('name', 'id')
+        if category != 'all':
+            products = products.filter(category=category)
+        if query:
+            # بحث نصي مرتب حسب الصلة في الاسم والوصف والفئة (انظر search.py)
+            products = search.get_backend().search(products, query)
+        return products
+
+    # صفحة الكتالوج من الذاكرة المؤقتة؛ تُبطل تلقائياً عند تعديل أي منتج أو كمية (انظر catalogue.py)
+    page_obj = await catalogue.aget_page(catalogue_queryset, category, query, request.GET.get('page', 1))
+    return render(request, 'inventory/user_dashboard.html', {
+        'products': page_obj, 'page_obj': page_obj, 'category': category, 'query': query,
+    })
+
+def _add_to_cart(request):
+    """معالجة POST للوحة المستخدم: إضافة منتج إلى السلة."""
+    product_id = request.POST['product_id']
+    quantity = int(request.POST['quantity'])
+    product = get_object_or_404(Product, id=product_id)
+
+    if quantity > 0 and quantity <= product.quantity:
+        # إضافة المنتج إلى سلة التسوق (Cart) أو تحديث الكمية إذا كان موجودًا
+        cart.add(request.user, product, quantity)
+        messages.success(request, 'تمت إضافة المنتج إلى السلة.')
+    else:
+        messages.error(request, 'الكمية غير متوفرة أو غير صالحة.')
+    return redirect('inventory:user_dashboard') # تم التحديث لاستخدام الـ namespace
 
 # 🛒 عرض صفحة السلة
 @login_required
-def cart_view(request):
+async def cart_view(request):
     """
     يعرض سلة التسوق للمستخدم، ويتيح تحديث الكميات، إزالة المنتجات، وتأكيد الطلب.
     """
-    if request.user.is_admin: # منع المديرين من الوصول إلى سلة التسوق
+    user = await _auser(request)
+    if user.is_admin: # منع المديرين من الوصول إلى سلة التسوق
         return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
-    
-    cart_items = Cart.objects.filter(user=request.user)
-    
+
     if request.method == 'POST':
-        action = request.POST.get('action')
-        
-        if action == 'update_cart':
-            for item in cart_items:
-                quantity_key = f'quantity_{item.id}'
-                if quantity_key in request.POST:
-                    new_quantity = int(request.POST[quantity_key])
-                    if new_quantity > 0 and new_quantity <= item.product.quantity:
-                        item.quantity = new_quantity
-                        item.save()
-                    elif new_quantity <= 0: # إذا كانت الكمية 0 أو أقل، احذف العنصر من السلة
-                        item.delete()
-                    else:
-                        messages.error(request, f'الكمية المطلوبة لـ {item.product.name} غير متوفرة ({item.product.quantity} متاح).')
-            messages.success(request, 'تم تحديث السلة.')
-        
-        elif action == 'confirm_order':
-            if not cart_items.exists(): # منع تأكيد طلب سلة فارغة
-                messages.error(request, 'لا يمكن تأكيد طلب من سلة فارغة.')
-                return redirect('inventory:cart_view') # تم التحديث لاستخدام الـ namespace
-
-            for item in cart_items:
-                # التحقق مرة أخرى من الكمية المتاحة قبل إنشاء الطلب
-                product = item.product
-                if item.quantity > product.quantity:
-                    messages.error(request, f'الكمية المطلوبة لـ {product.name} ({item.quantity}) أكبر من المتاح ({product.quantity}). يرجى تعديل السلة.')
-                    return redirect('inventory:cart_view') # العودة للسلة إذا كانت الكمية غير متوفرة
-
-                # إنشاء طلب جديد لكل عنصر في السلة وتعيين الحالة إلى 'Pending'
-                Order.objects.create(user=request.user, product=product, quantity=item.quantity, status='Pending') # تم إضافة status='Pending'
-                # لا تقم بخصم الكمية من هنا، سيتم خصمها عند الموافقة عليها من قبل المدير
-                item.delete() # حذف العنصر من السلة بعد تأكيد الطلب
-            messages.success(request, 'تم تأكيد الطلب وإرساله إلى الإدارة. حالته قيد الانتظار.')
-            return redirect('inventory:order_tracking_view') # التوجيه إلى صفحة تتبع الطلبات باستخدام الـ namespace
-        
-        elif action and action.startswith('remove_item_'): # معالجة زر الإزالة الفردي
-            item_id = action.split('_')[2]
-            item_to_remove = get_object_or_404(Cart, id=item_id, user=request.user)
-            item_to_remove.delete()
-            messages.success(request, f'تمت إزالة {item_to_remove.product.name} من السلة.')
-            return redirect('inventory:cart_view') # تم التحديث لاستخدام الـ namespace
-        
-        return redirect('inventory:cart_view') # تم التحديث لاستخدام الـ namespace
-    
+        return await sync_to_async(_update_cart)(request)
+
+    cart_items = [item async for item in cart.items(user).aiterator()]
     return render(request, 'cart.html', {'cart_items': cart_items})
 
+def _update_cart(request):
+    """معالجة POST للسلة: تحديث الكميات، تأكيد الطلب، أو إزالة عنصر (في خيط، لأنها تستخدم المعاملات والرسائل)."""
+    action = request.POST.get('action')
+
+    if action == 'update_cart':
+        # كل التعديلات تُطبق معاً (قراءة واحدة وكتابة جماعية) عبر خدمة السلة
+        quantities = {}
+        for key, value in request.POST.items():
+            if key.startswith('quantity_') and key[len('quantity_'):].isdigit():
+                try:
+                    quantities[int(key[len('quantity_'):])] = int(value)
+                except ValueError:
+                    continue
+        result = cart.update(request.user, quantities)
+        for item in result.unavailable:
+            messages.error(request, f'الكمية المطلوبة لـ {item.product.name} غير متوفرة ({item.product.quantity} متاح).')
+        messages.success(request, 'تم تحديث السلة.')
+
+    elif action == 'confirm_order':
+        result = cart.checkout(request.user)
+        if result.empty: # منع تأكيد طلب سلة فارغة
+            messages.error(request, 'لا يمكن تأكيد طلب من سلة فارغة.')
+            return redirect('inventory:cart')
+        if result.shortages:
+            # التحقق مرة أخرى من الكمية المتاحة قبل إنشاء الطلب؛ لا يُنشأ أي طلب إذا نقص أي منتج
+            for item in result.shortages:
+                messages.error(request, f'الكمية المطلوبة لـ {item.product.name} ({item.quantity}) أكبر من المتاح ({item.product.quantity}). يرجى تعديل السلة.')
+            return redirect('inventory:cart') # العودة للسلة إذا كانت الكمية غير متوفرة
+        # لا يتم خصم الكمية هنا، سيتم خصمها عند الموافقة عليها من قبل المدير
+        messages.success(request, 'تم تأكيد الطلب وإرساله إلى الإدارة. حالته قيد الانتظار.')
+        return redirect('inventory:order_tracking_view') # التوجيه إلى صفحة تتبع الطلبات باستخدام الـ namespace
+
+    elif action and action.startswith('remove_item_'): # معالجة زر الإزالة الفردي
+        item_id = action.split('_')[2]
+        item_to_remove = get_object_or_404(Cart.objects.select_related('product'), id=item_id, user=request.user)
+        item_to_remove.delete()
+        messages.success(request, f'تمت إزالة {item_to_remove.product.name} من السلة.')
+        return redirect('inventory:cart')
+
+    return redirect('inventory:cart')
+
 # 🛒 عرض صفحة تتبع الطلبات
 @login_required
-def order_tracking_view(request):
+async def order_tracking_view(request):
     """يعرض الطلبات السابقة للمستخدم وحالتها."""
-    if request.user.is_admin: # منع المديرين من الوصول إلى تتبع الطلبات الخاص بالمستخدمين
+    user = await _auser(request)
+    if user.is_admin: # منع المديرين من الوصول إلى تتبع الطلبات الخاص بالمستخدمين
         return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    # بنود كل الطلبات ومنتجاتها باستعلام واحد إضافي لكل دفعة
+    orders = Order.objects.filter(user=user).order_by('-created_at').prefetch_related('lines__product')
+    orders = [order async for order in orders.aiterator(chunk_size=ORDERS_CHUNK_SIZE)]
     return render(request, 'order_tracking.html', {'orders': orders})
 
+# 📡 بث أحداث الطلبات (Server-Sent Events) — يحتاج خادم ASGI (project/asgi.py)
+async def order_events(request):
+    """
+    اتصال مفتوح يدفع للمستخدم تغيّر حالة طلباته، وللمدير الطلبات الجديدة وكل تغيرات الحالة،
+    بدلاً من إعادة تحميل الصفحات دورياً. الاتصال الخامل لا يحجز خيطاً ولا اتصال قاعدة بيانات.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    channels = [events.user_channel(user.pk)]
+    if user.is_admin:
+        channels.append(events.ADMINS)
+
+    async def stream():
+        subscription = events.get_broker().subscribe(channels)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                else:
+                    yield events.format_sse(event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # منع التخزين المؤقت في nginx
+    return response
+
 # 🛠️ لوحة تحكم المدير
 @login_required
 @user_passes_test(is_admin, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
@@ -201,27 +271,109 @@ def admin_dashboard(request):
     إدارة المنتجات، إدارة الطلبات، وتقارير الاستهلاك.
     ويعالج جميع إجراءات POST المتعلقة بهذه الأقسام.
     """
-    users = CustomUser.objects.filter(is_admin=False) # المستخدمون العاديون
-    products = Product.objects.all()
-    orders = Order.objects.all().order_by('-created_at')
-    reports = Report.objects.all().order_by('-created_at') # جلب جميع التقارير
-    consumption_records = ConsumptionRecord.objects.all().order_by('-consumed_at') # جلب جميع سجلات الاستهلاك
-    
-    # حساب إجمالي الاستهلاك لكل منتج (للوحة تحكم المدير)
-    consumption_data = ConsumptionRecord.objects.values('product__name', 'user__username').annotate(total_consumed=Sum('quantity')).order_by('-total_consumed')
-
-    # تم نقل منطق معالجة الـ POST إلى دوال منفصلة
-    # هذه الدالة الآن تعرض البيانات فقط
+    # الأقسام (المستخدمون، المنتجات، الطلبات، التقارير، سجلات الاستهلاك) تُجلب عند الطلب
+    # من admin_dashboard_section بصفحات صغيرة، لذلك لا تُحمّل هنا
+    # التحليلات تُقرأ من جداول التجميع اليومية، فكلفتها تعتمد على عدد الأيام لا عدد سجلات الاستهلاك
+    today = timezone.localdate()
+    consumption_data = analytics.user_product_totals(today.replace(day=1), today)
+    top_consumed = analytics.top_products(today - timedelta(days=29), today)
+    # المنخفض محسوب مسبقاً في StockLevel (reorder.py): الأقرب للنفاد حسب معدل الاستهلاك أولاً
+    low_stock = reorder.low_stock(10)
+    # التنبؤ بالطلب للشهر الحالي (أمر forecast_demand)
+    forecast = forecasting.top(limit=10)
+
     return render(request, 'inventory/admin_dashboard.html', {
-        'users': users,
-        'products': products,
-        'orders': orders,
-        'reports': reports,
-        'consumption_records': consumption_records,
         'admin_monthly_consumption': consumption_data,
-        'current_month': datetime.now().strftime('%B %Y')
+        'top_consumed_products_admin': top_consumed,
+        'low_stock_products_admin': low_stock,
+        'demand_forecast_admin': forecast,
+        'current_month': datetime.now().strftime('%B %Y'),
+        'export_formats': exports.formats(),
+        'maintenance_jobs': jobs.maintenance(),
+        # رمز لكل عرض للصفحة: إعادة إرسال نماذج المهام منها (نقرة مزدوجة، تحديث الصفحة) لا تكرر المهمة
+        'job_token': secrets.token_hex(16),
     })
 
+# 🛠️ قسم واحد من لوحة تحكم المدير (صفحة بمؤشر)
+@login_required
+@user_passes_test(_ais_admin, login_url='inventory:login')
+async def admin_dashboard_section(request, section):
+    """
+    يعيد صفوف قسم واحد من لوحة تحكم المدير كجزء HTML.
+    المؤشر للصفحة التالية يُرسل في ترويسة X-Next-Cursor (فارغة عند انتهاء البيانات).
+    """
+    spec = SECTIONS.get(section)
+    if spec is None:
+        raise Http404('قسم غير موجود.')
+    await _auser(request)
+    try:
+        items, next_cursor = await akeyset_page(
+            spec.get_queryset(), spec.ordering,
+            cursor=request.GET.get('cursor'), page_size=DASHBOARD_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest('مؤشر غير صالح.')
+    response = render(request, spec.template, {'items': items})
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+# 📤 تصدير التقارير وسجلات الاستهلاك والطلبات (للمدير)
+@login_required
+@user_passes_test(is_admin, login_url='inventory:login')
+def export_data(request, name, fmt):
+    """
+    ينزّل كل صفوف التصدير name بالصيغة fmt (csv، أو xlsx إن كانت openpyxl مثبتة) كملف مبثوث،
+    أو مع POST يكتب الملف في مهمة بالخلفية يُنزّل من لوحة المهام عند اكتماله.
+    """
+    export = exports.EXPORTS.get(name)
+    if export is None or fmt not in exports.formats():
+        raise Http404('تصدير غير موجود.')
+    if request.method == 'POST':
+        job, _ = jobs.enqueue('export', {'name': name, 'fmt': fmt}, request.user, _job_key(request, f'export:{name}.{fmt}'))
+        messages.info(request, f'تمت جدولة التصدير (المهمة #{job.pk})؛ رابط التنزيل يظهر في لوحة المهام عند اكتماله.')
+        return redirect('inventory:admin_dashboard')
+    return exports.response(request, export, fmt)
+
+def _job_key(request, name):
+    """مفتاح منع التكرار لمهمة من نموذج في لوحة المدير (الرمز المرسل مع النموذج + اسم العملية)."""
+    token = request.POST.get('job_token', '')[:32]
+    return f'{name}:{token}' if token else None
+
+# ⚙️ مهام الخلفية (للمدير، انظر jobs.py)
+@login_required
+@user_passes_test(is_admin, login_url='inventory:login')
+@require_POST
+def start_job(request, kind):
+    """يبدأ مهمة صيانة من لوحة المدير (إعادة بناء التقارير، التحليلات، الصور المصغرة، التنبؤ)."""
+    if kind not in dict(jobs.maintenance()):
+        raise Http404('مهمة غير موجودة.')
+    job, created = jobs.enqueue(kind, user=request.user, key=_job_key(request, kind))
+    if created:
+        messages.info(request, f'تمت جدولة المهمة #{job.pk}: {job.get_kind_display()}.')
+    return redirect('inventory:admin_dashboard')
+
+@login_required
+@user_passes_test(is_admin, login_url='inventory:login')
+@require_POST
+def cancel_job(request, job_id):
+    """يلغي مهمة منتظرة، أو يطلب إيقاف مهمة جارية عند تقريرها التالي عن التقدم."""
+    job = get_object_or_404(Job, id=job_id)
+    if jobs.cancel(job.pk):
+        messages.info(request, f'تم طلب إلغاء المهمة #{job.pk}.')
+    else:
+        messages.warning(request, f'المهمة #{job.pk} انتهت بالفعل.')
+    return redirect('inventory:admin_dashboard')
+
+@login_required
+@user_passes_test(is_admin, login_url='inventory:login')
+def download_job(request, job_id):
+    """ينزّل ملف مهمة تصدير مكتملة (الملف في التخزين الافتراضي، لا يُقدم إلا عبر هذا العرض)."""
+    job = get_object_or_404(Job, id=job_id, kind='export', status='Done')
+    path = job.result.get('path')
+    if not path or not default_storage.exists(path):
+        raise Http404('الملف غير موجود.')
+    return FileResponse(default_storage.open(path, 'rb'), as_attachment=True, filename=job.result.get('filename'))
+
 # ➕ إضافة منتج جديد (للمدير)
 @login_required
 @user_passes_test(is_admin, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
@@ -283,15 +435,10 @@ def user_approve(request, user_id):
     user = get_object_or_404(CustomUser, id=user_id)
     user.is_approved = True
     user.is_active = True
-    user.save()
-
-    # send_mail(
-    #     'تمت الموافقة على حسابك ✅',
-    #     f"مرحباً {user.username},\n\nتهانينا، تمت الموافقة على حسابك في نظام إدارة المخزون. يمكنك الآن تسجيل الدخول والبدء في استخدام النظام.\n\nمع خالص التقدير,\nفريق إدارة المخزون",
-    #     settings.EMAIL_HOST_USER,
-    #     [user.email],
-    #     fail_silently=False,
-    # )
+    with transaction.atomic():
+        user.save()
+        # الرسالة تُرسل لاحقاً من الصندوق الصادر (send_notifications)
+        notifications.enqueue([notifications.user_approved(user)])
     messages.success(request, f'تمت الموافقة على المستخدم {user.username}.')
     return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
 
@@ -302,16 +449,9 @@ def user_reject(request, user_id):
     """يرفض طلب تسجيل مستخدم جديد ويحذف المستخدم."""
     user = get_object_or_404(CustomUser, id=user_id)
     username = user.username
-    user_email = user.email
-    user.delete()
-
-    # send_mail(
-    #     'طلب حسابك مرفوض ❌',
-    #     f"مرحباً {username},\n\nنأسف لإبلاغك أن طلب حسابك في نظام إدارة المخزون قد تم رفضه.\n\nمع خالص التقدير,\nفريق إدارة المخزون",
-    #     settings.EMAIL_HOST_USER,
-    #     [user_email],
-    #     fail_silently=False,
-    # )
+    with transaction.atomic():
+        notifications.enqueue([notifications.user_rejected(username, user.email)])
+        user.delete()
     messages.info(request, f'تم رفض حساب المستخدم {username} وحذفه.')
     return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
 
@@ -320,44 +460,37 @@ def user_reject(request, user_id):
 @user_passes_test(is_admin, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
 def approve_order(request, order_id): # تم تغيير اسم الدالة من order_approve إلى approve_order
     """يوافق على طلب منتج."""
-    order = get_object_or_404(Order, id=order_id)
-    if order.status == 'Pending':
-        # التحقق من الكمية المتاحة قبل الموافقة
-        if order.quantity > order.product.quantity:
-            messages.error(request, f'لا يمكن الموافقة على الطلب #{order.id} لمنتج {order.product.name} لأن الكمية المطلوبة ({order.quantity}) أكبر من المتاح ({order.product.quantity}).')
-            return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
-
-        order.status = 'Approved'
-        order.approved_at = datetime.now()
-        order.product.quantity -= order.quantity # خصم الكمية من المخزون
-        order.product.save()
-        order.save()
-
-        Report.objects.create(
-            user=order.user,
-            month=datetime.now().strftime('%Y-%m'),
-            product=order.product,
-            consumed=order.quantity,
-            remaining=order.product.quantity
-        )
-        ConsumptionRecord.objects.create(
-            user=order.user,
-            product=order.product,
-            quantity=order.quantity
-        )
-
-        # send_mail(
-        #     'طلبك تمت الموافقة عليه ✅',
-        #     f"مرحباً {order.user.username},\n\nتمت الموافقة على طلبك لمنتج '{order.product.name}' بكمية {order.quantity}.\n\nيمكنك الآن استلام طلبك من المخزن. يرجى التنسيق مع إدارة المخزن لتحديد موعد الاستلام.\n\nمع خالص التقدير,\nفريق إدارة المخزون",
-        #     settings.EMAIL_HOST_USER,
-        #     [order.user.email],
-        #     fail_silently=False,
-        # )
+    get_object_or_404(Order, id=order_id)
+    # الخصم من المخزون وإنشاء التقرير وسجل الاستهلاك يتم ذرياً داخل خدمة المخزون
+    result = stock.approve_order(order_id)
+    order = result.order
+    if result.approved:
+        # رسالة الموافقة أُضيفت للصندوق الصادر داخل معاملة الموافقة نفسها
         messages.success(request, f'تمت الموافقة على الطلب #{order.id}.')
+    elif result.outcome == stock.INSUFFICIENT_STOCK:
+        messages.error(request, result.shortage_message())
     else:
-        messages.warning(request, f'لا يمكن الموافقة على الطلب #{order.id} لأنه ليس في حالة "معلق".')
+        messages.warning(request, f'لا يمكن الموافقة على الطلب #{order_id} لأنه ليس في حالة "معلق".')
     return redirect('inventory:admin_dashboard') # تم التحديث لاستخدام الـ namespace
 
+# ✅ موافقة المدير على عدة طلبات دفعة واحدة
+@login_required
+@user_passes_test(is_admin, login_url='inventory:login')
+@require_POST
+def approve_orders_bulk(request):
+    """يجدول الموافقة على الطلبات المحددة في لوحة التحكم كمهمة في الخلفية (النتيجة تظهر في لوحة المهام)."""
+    order_ids = [int(pk) for pk in request.POST.getlist('order_ids') if pk.isdigit()]
+    if not order_ids:
+        messages.warning(request, 'لم يتم تحديد أي طلب.')
+        return redirect('inventory:admin_dashboard')
+
+    # الموافقة على مئات الطلبات تتجاوز مهلة العامل، فتُنفذ في مهمة بالخلفية (jobs.py)
+    job, created = jobs.enqueue('approve_orders', {'order_ids': order_ids}, request.user,
+                                _job_key(request, 'approve_orders'))
+    if created:
+        messages.info(request, f'تمت جدولة الموافقة على {len(order_ids)} طلب (المهمة #{job.pk}).')
+    return redirect('inventory:admin_dashboard')
+
 # ❌ رفض المدير للطلب
 @login_required
 @user_passes_test(is_admin, login_url='inventory:login') # تم التحديث لاستخدام الـ namespace
@@ -366,15 +499,10 @@ def reject_order(request, order_id): # تم تغيير اسم الدالة من
     order = get_object_or_404(Order, id=order_id)
     if order.status == 'Pending':
         order.status = 'Rejected'
-        order.save()
-
-        # send_mail(
-        #     'طلبك مرفوض ❌',
-        #     f"مرحباً {order.user.username},\n\nنأسف لإبلاغك أن طلبك لمنتج '{order.product.name}' بكمية {order.quantity} قد تم رفضه.\n\nلأي استفسارات، يرجى التواصل مع إدارة المخزون.\n\nمع خالص التقدير,\nفريق إدارة المخزون",
-        #     settings.EMAIL_HOST_USER,
-        #     [order.user.email],
-        #     fail_silently=False,
-        # )
+        with transaction.atomic():
+            order.save()
+            notifications.enqueue([notifications.order_rejected(order)])
+            events.order_status_changed([order])
         messages.info(request, f'تم رفض الطلب #{order.id}.')
     else:
         messages.warning(request, f'لا يمكن رفض الطلب #{order.id} لأنه ليس في حالة "معلق".')
@@ -393,14 +521,7 @@ def place_order(request, product_id):
             qty = int(request.POST['quantity'])
             if qty > 0 and qty <= product.quantity:
                 # إضافة المنتج إلى سلة التسوق (Cart)
-                cart_item, created = Cart.objects.get_or_create(
-                    user=request.user, 
-                    product=product,
-                    defaults={'quantity': qty}
-                )
-                if not created:
-                    cart_item.quantity += qty
-                    cart_item.save()
+                cart.add(request.user, product, qty)
                 messages.success(request, 'تمت إضافة المنتج إلى السلة.')
                 return redirect('inventory:user_dashboard') # تم التحديث لاستخدام الـ namespace
             else: